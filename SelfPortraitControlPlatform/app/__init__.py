@@ -1,3 +1,7 @@
+import os
+import time
+
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
@@ -6,19 +10,24 @@ from flask_cors import CORS
 db = SQLAlchemy()
 migrate = Migrate()
 
-def create_app():
-    app = Flask(__name__)
+def create_app(test_config=None):
+    # No built-in /static route: /static/... is the React build's (serve_react),
+    # and uploaded artwork has its own route (serve_artwork)
+    app = Flask(__name__, static_folder=None)
 
     CORS(app,
          resources={r"/*": {"origins": "http://localhost:3000"}},
          supports_credentials=True,
-         allow_headers=["Content-Type"],
+         allow_headers=["Content-Type", "Idempotency-Key"],
          methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"]
     )
 
     # Use your Config or ProductionConfig from SelfPortraitControlPlatform/config.py
     app.config.from_object('SelfPortraitControlPlatform.config.Config')
     # or: app.config.from_object('SelfPortraitControlPlatform.config.ProductionConfig')
+    if test_config is not None:
+        # Overrides for the test suite (in-memory database, background threads off, ...)
+        app.config.update(test_config)
 
     db.init_app(app)
     migrate.init_app(app, db)
@@ -27,4 +36,81 @@ def create_app():
     from SelfPortraitControlPlatform.app.routes import main_bp
     app.register_blueprint(main_bp)
 
+    # Rendered-PDF cache (disk + memory)
+    from SelfPortraitControlPlatform.app.pdf_cache import pdf_cache
+    pdf_cache.init_app(app)
+
+    # Stored invoice PDFs
+    from SelfPortraitControlPlatform.app.invoice_store import invoice_store
+    invoice_store.init_app(app)
+
+    # Process pool for batch print runs
+    from SelfPortraitControlPlatform.app.print_runs import print_run_pool
+    print_run_pool.init_app(app)
+
+    # Background pre-rendering of order PDFs into the cache
+    from SelfPortraitControlPlatform.app.prerender import prerenderer
+    prerenderer.init_app(app)
+
+    # Thumbnails / previews for uploaded artwork
+    from SelfPortraitControlPlatform.app.derivatives import derivative_worker
+    derivative_worker.init_app(app)
+
+    # Deletes artwork from disk after commits, and sweeps for orphaned files
+    from SelfPortraitControlPlatform.app.janitor import artwork_janitor
+    artwork_janitor.init_app(app)
+
+    # React build: indexed once here rather than on import. Skipped under
+    # TESTING so the suite never writes .gz/.br files into the real build
+    from SelfPortraitControlPlatform.app.react_build import react_build
+    if not app.config.get('TESTING'):
+        react_build.load(app.config['REACT_BUILD_DIR'])
+
+    # Background dispatcher for the transactional outbox (Trello cards, etc.)
+    from SelfPortraitControlPlatform.app.outbox import outbox_dispatcher
+    outbox_dispatcher.init_app(app)
+
+    @app.cli.command('drain-outbox')
+    def drain_outbox():
+        """Run the outbox dispatcher in the foreground (dedicated worker process)."""
+        outbox_dispatcher.run_forever()
+
+    @app.cli.command('store-invoice-pdfs')
+    def store_invoice_pdfs():
+        """Render and store the PDF of every issued invoice that has none yet."""
+        from SelfPortraitControlPlatform.app.invoice_store import invoice_store
+        from SelfPortraitControlPlatform.app.models import Invoice
+
+        stored = 0
+        for invoice in Invoice.query.filter(Invoice.status != 'Ungenerated').order_by(Invoice.id):
+            if not invoice_store.has_pdf(invoice):
+                invoice_store.persist(invoice)
+                db.session.commit()
+                stored += 1
+        click.echo(f"Stored {stored} invoice PDF(s)")
+
+    @app.cli.command('backfill-artwork-derivatives')
+    @click.option('--force', is_flag=True, help='Re-render derivatives that already exist.')
+    def backfill_artwork_derivatives(force):
+        """Render thumbnails/previews for every artwork file already on disk."""
+        from SelfPortraitControlPlatform.app.derivatives import DERIVATIVE_FOLDER, has_derivatives
+        from SelfPortraitControlPlatform.app.routes import ARTWORK_UPLOAD_FOLDER
+
+        futures = []
+        for root, dirs, files in os.walk(ARTWORK_UPLOAD_FOLDER):
+            # Skip the derivative folders themselves
+            dirs[:] = [d for d in dirs if d != DERIVATIVE_FOLDER]
+            for name in files:
+                if name.startswith('.') or name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                if force or not has_derivatives(path):
+                    while derivative_worker.stats()["queue_depth"] >= derivative_worker.max_queue:
+                        time.sleep(0.1)
+                    futures.append(derivative_worker.submit(path, force=force))
+        for future in futures:
+            if future is not None:
+                future.result()
+        click.echo(derivative_worker.stats())
+
     return app
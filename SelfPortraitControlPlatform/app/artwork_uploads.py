@@ -0,0 +1,264 @@
+# app/artwork_uploads.py
+
+"""
+Chunked, resumable artwork uploads.
+
+Protocol (routes in routes.py):
+  1. POST   /api/orders/<id>/artwork/uploads            {"filename", "size"}
+       -> {"upload_id", "offset", "chunk_size"}
+     Re-initiating the same filename and size returns the existing upload and
+     its current offset, so a client that lost the id can still resume.
+  2. PUT    /api/orders/<id>/artwork/uploads/<upload_id>?offset=N   (raw bytes)
+       -> {"offset"}   409 with the server's offset if N doesn't match it
+  3. POST   /api/orders/<id>/artwork/uploads/<upload_id>/finalize   {"sha256"?}
+       -> {"path", "sha256"}
+  GET returns the current offset; DELETE aborts.
+If the initiate request carries "sha256" and that blob is already stored,
+the file is attached straight away and no bytes are sent at all.
+
+Bytes go straight from the request stream into <order folder>/.upload-<id>.part
+in ARTWORK_UPLOAD_BLOCK_SIZE blocks, and are hashed as they arrive, so memory
+use is bounded by the block size whatever the file size. The running SHA-256
+is kept in process; if a chunk lands on another worker or after a restart,
+the hash is rebuilt once from the partial file. Finalising moves the part file
+into the content-addressed blob store (blob_store.py).
+
+The per-upload lock only serialises chunks within one process; across workers
+`received` is advanced with a conditional UPDATE (WHERE received = offset),
+so of two copies of the same chunk only one is recorded and the other gets
+a 409 with the current offset. If the part file has gone (expired, aborted,
+or removed by hand) chunks get a 410 and the upload row is dropped, so the
+client starts over with a new upload.
+"""
+
+import hashlib
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from SelfPortraitControlPlatform.app import db
+from SelfPortraitControlPlatform.app.blob_store import blob_store
+from SelfPortraitControlPlatform.app.models import ArtworkFile, ArtworkUpload
+
+ARTWORK_UPLOAD_BLOCK_SIZE = 64 * 1024
+ARTWORK_UPLOAD_CHUNK_MAX_BYTES = 8 * 1024 * 1024
+ARTWORK_MAX_BYTES_PER_ORDER = 2 * 1024 * 1024 * 1024
+# Unfinished uploads untouched for this long are discarded
+ARTWORK_UPLOAD_TTL = timedelta(hours=24)
+
+PART_PREFIX = '.upload-'
+PART_SUFFIX = '.part'
+
+
+class UploadError(Exception):
+    """
+    Raised for a request the protocol rejects; routes turn it into a JSON error.
+    """
+
+    def __init__(self, message, status_code=400, **extra):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.extra = extra
+
+
+# upload id -> (sha256 object, bytes hashed so far)
+_hashers = {}
+_locks = {}
+_registry_lock = threading.Lock()
+
+
+def _upload_lock(upload_id):
+    with _registry_lock:
+        return _locks.setdefault(upload_id, threading.Lock())
+
+
+def _forget(upload_id):
+    with _registry_lock:
+        _hashers.pop(upload_id, None)
+        _locks.pop(upload_id, None)
+
+
+def part_path(order_folder, upload):
+    return os.path.join(order_folder, f"{PART_PREFIX}{upload.id}{PART_SUFFIX}")
+
+
+def order_bytes_used(order_id):
+    """
+    Bytes of the order's artwork files plus bytes reserved by its unfinished uploads.
+    """
+    used = db.session.query(db.func.coalesce(db.func.sum(ArtworkFile.size), 0)) \
+        .filter(ArtworkFile.order_id == order_id).scalar()
+    reserved = db.session.query(db.func.coalesce(db.func.sum(ArtworkUpload.size), 0)) \
+        .filter(ArtworkUpload.order_id == order_id).scalar()
+    return int(used) + int(reserved)
+
+
+def purge_expired(order_folder_for):
+    """
+    Drops stale unfinished uploads and their partial files. order_folder_for
+    maps an order id to its folder. The caller commits.
+    """
+    cutoff = datetime.utcnow() - ARTWORK_UPLOAD_TTL
+    for upload in ArtworkUpload.query.filter(ArtworkUpload.updated_at < cutoff).all():
+        try:
+            os.remove(part_path(order_folder_for(upload.order_id), upload))
+        except FileNotFoundError:
+            pass
+        _forget(upload.id)
+        db.session.delete(upload)
+
+
+def initiate(order_id, order_folder, filename, size, max_bytes=ARTWORK_MAX_BYTES_PER_ORDER):
+    """
+    Starts (or resumes) an upload of `size` bytes. filename must already be
+    sanitised. The caller commits.
+    """
+    if size < 0:
+        raise UploadError("size must not be negative")
+
+    existing = ArtworkUpload.query.filter_by(order_id=order_id, filename=filename).first()
+    if existing is not None:
+        if existing.size == size:
+            return existing
+        raise UploadError(f"An upload of {filename} with a different size is in progress",
+                          409, upload_id=existing.id)
+
+    used = order_bytes_used(order_id)
+    if used + size > max_bytes:
+        raise UploadError("Upload would exceed this order's artwork size limit", 413,
+                          limit=max_bytes, used=used)
+
+    os.makedirs(order_folder, exist_ok=True)
+    upload = ArtworkUpload(id=uuid.uuid4().hex, order_id=order_id, filename=filename,
+                           size=size, received=0)
+    open(part_path(order_folder, upload), 'wb').close()
+    db.session.add(upload)
+    return upload
+
+
+def _part_missing(upload):
+    # Caller holds the upload's lock
+    db.session.delete(upload)
+    _forget(upload.id)
+    return UploadError("Partial upload file is gone; start the upload again", 410)
+
+
+def _advance(upload, offset, received):
+    """
+    Records `received` bytes if nobody else has moved the upload past `offset`
+    in the meantime (another worker handling a retry of the same chunk).
+    """
+    result = db.session.execute(
+        update(ArtworkUpload)
+        .where(ArtworkUpload.id == upload.id, ArtworkUpload.received == offset)
+        .values(received=received, updated_at=datetime.utcnow())
+    )
+    db.session.refresh(upload)
+    return result.rowcount == 1
+
+
+def _hasher_at(path, upload_id, offset):
+    # Caller holds the upload's lock
+    hasher, hashed = _hashers.get(upload_id, (None, None))
+    if hasher is not None and hashed == offset:
+        return hasher
+    # Rebuild from the bytes already on disk (other worker, restart, or a retried chunk)
+    hasher = hashlib.sha256()
+    remaining = offset
+    with open(path, 'rb') as f:
+        while remaining:
+            block = f.read(min(ARTWORK_UPLOAD_BLOCK_SIZE, remaining))
+            if not block:
+                raise UploadError("Partial upload file is shorter than recorded", 409, offset=0)
+            hasher.update(block)
+            remaining -= len(block)
+    return hasher
+
+
+def write_chunk(upload, order_folder, offset, stream, length,
+                max_chunk=ARTWORK_UPLOAD_CHUNK_MAX_BYTES):
+    """
+    Appends `length` bytes from `stream` at `offset`, which must equal the
+    bytes received so far. Returns the new offset. The caller commits, also
+    after an UploadError (bytes written before it, or a 410's deleted row).
+    """
+    if length is None:
+        raise UploadError("Content-Length is required", 411)
+    if length > max_chunk:
+        raise UploadError("Chunk too large", 413, max_chunk=max_chunk)
+
+    with _upload_lock(upload.id):
+        db.session.refresh(upload)
+        if offset != upload.received:
+            raise UploadError("Offset mismatch", 409, offset=upload.received)
+        if offset + length > upload.size:
+            raise UploadError("Chunk runs past the declared size", 416, offset=upload.received)
+
+        path = part_path(order_folder, upload)
+        written = 0
+        try:
+            hasher = _hasher_at(path, upload.id, offset)
+            with open(path, 'r+b') as f:
+                # Bytes past the offset (an interrupted chunk) are overwritten, not
+                # truncated: another worker may be writing the next chunk already
+                f.seek(offset)
+                while written < length:
+                    block = stream.read(min(ARTWORK_UPLOAD_BLOCK_SIZE, length - written))
+                    if not block:
+                        break
+                    f.write(block)
+                    hasher.update(block)
+                    written += len(block)
+        except FileNotFoundError:
+            raise _part_missing(upload)
+
+        if not _advance(upload, offset, offset + written):
+            with _registry_lock:
+                _hashers.pop(upload.id, None)
+            raise UploadError("Offset mismatch", 409, offset=upload.received)
+        with _registry_lock:
+            _hashers[upload.id] = (hasher, upload.received)
+        if written < length:
+            raise UploadError("Connection closed mid-chunk", 400, offset=upload.received)
+        return upload.received
+
+
+def finalize(upload, order_folder, expected_sha256=None):
+    """
+    Moves the completed part file into the blob store (or discards it if that
+    content is already stored) and returns its SHA-256. The caller records the
+    entry and deletes the upload row, then commits; it also commits after an
+    UploadError (a 410 has deleted the row).
+    """
+    with _upload_lock(upload.id):
+        if upload.received != upload.size:
+            raise UploadError("Upload is incomplete", 409, offset=upload.received)
+
+        path = part_path(order_folder, upload)
+        try:
+            sha256 = _hasher_at(path, upload.id, upload.received).hexdigest()
+            if expected_sha256 and expected_sha256.lower() != sha256:
+                raise UploadError("Checksum mismatch", 422, sha256=sha256)
+            # Drop anything an interrupted chunk left past the end
+            os.truncate(path, upload.size)
+            blob_store.ingest(path, sha256)
+        except FileNotFoundError:
+            raise _part_missing(upload)
+    _forget(upload.id)
+    return sha256
+
+
+def abort(upload, order_folder):
+    """
+    Removes the partial file. The caller deletes the upload row and commits.
+    """
+    with _upload_lock(upload.id):
+        try:
+            os.remove(part_path(order_folder, upload))
+        except FileNotFoundError:
+            pass
+    _forget(upload.id)
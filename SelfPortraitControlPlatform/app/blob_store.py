@@ -0,0 +1,194 @@
+# app/blob_store.py
+
+"""
+Content-addressed storage for artwork files.
+
+Each distinct file is stored once, as <blob folder>/<sha[:2]>/<sha>, and has an
+ArtworkBlob row counting how many ArtworkFile rows use it. Their path looks like
+
+    blobs/<sha[:2]>/<sha>/<original secure filename>
+
+so the existing /static/artwork/<entry> URLs keep working and the name the
+school uploaded is still shown. The same scan uploaded twice (under any name,
+for any order) is stored once; re-adding a blob an order already has is a no-op.
+
+Reference changes happen inside the caller's transaction. Blobs whose count
+drops to zero are returned by release() and must be passed to collect() after
+the commit, which deletes the files that are still unreferenced. ingest()
+touches the blob's mtime (whether it moved the file in or found it there) and
+collect() leaves recently touched files alone, so an upload racing a delete of
+the same content never loses its file.
+
+Entries in the older "<order_id>/<filename>" form are still served and deleted
+as plain files.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import time
+
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+
+from SelfPortraitControlPlatform.app import db
+from SelfPortraitControlPlatform.app.derivatives import remove_derivatives
+from SelfPortraitControlPlatform.app.models import ArtworkBlob
+
+BLOB_ENTRY_PREFIX = 'blobs'
+HASH_BLOCK_SIZE = 64 * 1024
+# collect() skips blobs touched this recently (an upload may be about to reference them)
+BLOB_GC_GRACE_SECONDS = 60
+# add_ref() update/insert rounds before giving up on a contended blob row
+BLOB_ADD_REF_ATTEMPTS = 3
+
+_BLOB_ENTRY_RE = re.compile(r'^blobs/([0-9a-f]{2})/([0-9a-f]{64})/([^/]+)$')
+
+
+def blob_entry(sha256, filename):
+    return f"{BLOB_ENTRY_PREFIX}/{sha256[:2]}/{sha256}/{filename}"
+
+
+def parse_blob_entry(entry):
+    """
+    Returns (sha256, filename) for a blob entry, or None for a legacy path.
+    """
+    match = _BLOB_ENTRY_RE.match(entry or '')
+    if not match or match.group(2)[:2] != match.group(1):
+        return None
+    return match.group(2), match.group(3)
+
+
+class BlobTooLarge(Exception):
+    """
+    Raised by save_stream() when the stream is longer than its max_bytes.
+    """
+
+
+class BlobStore:
+    def __init__(self, directory=None):
+        self.directory = None
+        if directory:
+            self.set_directory(directory)
+
+    def set_directory(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def path(self, sha256):
+        return os.path.join(self.directory, sha256[:2], sha256)
+
+    def exists(self, sha256):
+        return os.path.exists(self.path(sha256))
+
+    def save_stream(self, stream, max_bytes=None):
+        """
+        Copies a file-like object into a temp file in the store while hashing it.
+        Returns (tmp_path, sha256, size); pass them to ingest(). Stops and raises
+        BlobTooLarge (removing the temp file) once more than max_bytes are read.
+        """
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            while True:
+                block = stream.read(HASH_BLOCK_SIZE)
+                if not block:
+                    break
+                size += len(block)
+                if max_bytes is not None and size > max_bytes:
+                    break
+                f.write(block)
+                hasher.update(block)
+        if max_bytes is not None and size > max_bytes:
+            os.remove(tmp_path)
+            raise BlobTooLarge(f"More than {max_bytes} bytes")
+        return tmp_path, hasher.hexdigest(), size
+
+    def ingest(self, src_path, sha256):
+        """
+        Moves an already-hashed file into place. If the blob is already stored,
+        the source is discarded instead (no copy). Returns True if it was new.
+        """
+        dest = self.path(sha256)
+        new = not os.path.exists(dest)
+        if new:
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            os.replace(src_path, dest)
+        else:
+            os.remove(src_path)
+        # Keeps collect() off it until our reference is committed; a moved-in
+        # file still has its old mtime (e.g. a part file resumed over hours)
+        os.utime(dest)
+        return new
+
+    def _increment(self, sha256):
+        result = db.session.execute(
+            update(ArtworkBlob)
+            .where(ArtworkBlob.sha256 == sha256)
+            .values(refcount=ArtworkBlob.refcount + 1)
+        )
+        return result.rowcount > 0
+
+    def add_ref(self, sha256, size):
+        """
+        Counts one more entry using the blob. The caller commits.
+        """
+        for _ in range(BLOB_ADD_REF_ATTEMPTS):
+            if self._increment(sha256):
+                return
+            try:
+                with db.session.begin_nested():
+                    db.session.add(ArtworkBlob(sha256=sha256, size=size, refcount=1))
+                return
+            except IntegrityError:
+                # A concurrent first upload of the same content inserted the row
+                # first: count on it instead (unless it has been released since)
+                continue
+        raise RuntimeError(f"Could not reference blob {sha256}")
+
+    def release(self, sha256):
+        """
+        Drops one reference. Returns True if the blob is now unreferenced; collect()
+        it after the caller commits.
+        """
+        db.session.execute(
+            update(ArtworkBlob)
+            .where(ArtworkBlob.sha256 == sha256)
+            .values(refcount=ArtworkBlob.refcount - 1)
+        )
+        result = db.session.execute(
+            delete(ArtworkBlob).where(ArtworkBlob.sha256 == sha256, ArtworkBlob.refcount <= 0)
+        )
+        return result.rowcount > 0
+
+    def collect(self, sha256s):
+        """
+        Deletes the files of blobs that no longer have a row. Call after commit.
+        A blob re-added in the meantime has a row again and is kept; one touched
+        within BLOB_GC_GRACE_SECONDS is left for a later sweep.
+        """
+        sha256s = set(sha256s)
+        if not sha256s:
+            return 0
+        alive = {
+            sha for (sha,) in
+            db.session.query(ArtworkBlob.sha256).filter(ArtworkBlob.sha256.in_(sha256s))
+        }
+        removed = 0
+        cutoff = time.time() - BLOB_GC_GRACE_SECONDS
+        for sha in sha256s - alive:
+            path = self.path(sha)
+            try:
+                if os.path.getmtime(path) > cutoff:
+                    continue
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            remove_derivatives(path)
+        return removed
+
+
+blob_store = BlobStore()
@@ -0,0 +1,108 @@
+# app/cache.py
+
+"""
+Cache for serialized order JSON fragments.
+
+Each entry is keyed by order id and stores (version, fragment), where version
+is the latest updated_at of the order, its artworks and its invoice, read from
+the database on every listing. A lookup only hits if the versions match, so a
+change committed by any worker process is picked up. The mutating routes also
+call invalidate() after they commit, which just frees the entry early.
+
+The default backend is an in-process LRU with a bounded number of entries.
+Anything with the same get/set/delete/clear/stats methods (e.g. a Redis-backed
+class) can be swapped in with order_cache.set_backend(...).
+"""
+
+import threading
+from collections import OrderedDict
+
+# Upper bound on cached order fragments per process
+ORDER_CACHE_MAX_ENTRIES = 5000
+
+
+class LRUCache:
+    def __init__(self, max_entries=ORDER_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class FragmentCache:
+    """
+    Versioned wrapper around a cache backend.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.stale = 0
+        self.invalidations = 0
+
+    def set_backend(self, backend):
+        self.backend = backend
+
+    def get(self, key, version):
+        entry = self.backend.get(key)
+        if entry is None:
+            return None
+        cached_version, fragment = entry
+        if cached_version != version:
+            self.stale += 1
+            return None
+        return fragment
+
+    def set(self, key, version, fragment):
+        self.backend.set(key, (version, fragment))
+
+    def invalidate(self, key):
+        self.invalidations += 1
+        self.backend.delete(key)
+
+    def stats(self):
+        stats = dict(self.backend.stats())
+        stats["stale"] = self.stale
+        stats["invalidations"] = self.invalidations
+        return stats
+
+
+order_cache = FragmentCache(LRUCache())
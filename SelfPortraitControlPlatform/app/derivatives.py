@@ -0,0 +1,228 @@
+# app/derivatives.py
+
+"""
+Thumbnail and preview images for uploaded artwork.
+
+For every original, two sizes are rendered (bounded by the longest edge) in
+both WebP and JPEG, and stored next to the original in a hidden .derivatives
+folder:
+
+    blobs/ab/<sha>                 ->  blobs/ab/.derivatives/<sha>.thumb.webp
+    7/logo.png (legacy layout)     ->  7/.derivatives/logo.png.preview.jpg
+
+Files Pillow can't read (PDFs, etc.) get an empty "<name>.unsupported" marker
+instead, so they are tried once and then always served as the original.
+
+Uploads queue their new files on a small thread pool (Pillow releases the GIL
+while decoding, resizing and encoding). serve_artwork renders a missing
+derivative inline, so a page never falls back to fetching the original.
+"""
+
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+DERIVATIVE_SIZES = {
+    'thumb': 256,
+    'preview': 1024,
+}
+DERIVATIVE_FORMATS = {
+    # extension: (Pillow format, save options)
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+DERIVATIVE_FOLDER = '.derivatives'
+UNSUPPORTED_MARKER = 'unsupported'
+DERIVATIVE_WORKERS = 2
+DERIVATIVE_MAX_QUEUE = 2000
+
+
+def derivative_path(original_path, size, ext):
+    folder, name = os.path.split(original_path)
+    return os.path.join(folder, DERIVATIVE_FOLDER, f"{name}.{size}.{ext}")
+
+
+def _marker_path(original_path):
+    folder, name = os.path.split(original_path)
+    return os.path.join(folder, DERIVATIVE_FOLDER, f"{name}.{UNSUPPORTED_MARKER}")
+
+
+def remove_derivatives(original_path):
+    paths = [derivative_path(original_path, size, ext)
+             for size in DERIVATIVE_SIZES for ext in DERIVATIVE_FORMATS]
+    for path in paths + [_marker_path(original_path)]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def has_derivatives(original_path):
+    """
+    True if nothing is left to render: every derivative exists, or the file isn't an image.
+    """
+    if os.path.exists(_marker_path(original_path)):
+        return True
+    return all(
+        os.path.exists(derivative_path(original_path, size, ext))
+        for size in DERIVATIVE_SIZES for ext in DERIVATIVE_FORMATS
+    )
+
+
+def image_dimensions(path):
+    """
+    (width, height) read from the file header, or (None, None) if it isn't an image.
+    """
+    try:
+        with Image.open(path) as image:
+            return image.size
+    except (UnidentifiedImageError, OSError):
+        return None, None
+
+
+def _flatten(image):
+    # JPEG has no alpha channel: composite transparent artwork onto white
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render_derivatives(original_path, force=False):
+    """
+    Writes every missing derivative of one original and returns how many were
+    written. A file Pillow can't identify is marked unsupported and skipped.
+    """
+    if not force and os.path.exists(_marker_path(original_path)):
+        return 0
+    todo = [
+        (size, ext) for size in DERIVATIVE_SIZES for ext in DERIVATIVE_FORMATS
+        if force or not os.path.exists(derivative_path(original_path, size, ext))
+    ]
+    if not todo:
+        return 0
+
+    folder = os.path.join(os.path.dirname(original_path), DERIVATIVE_FOLDER)
+    os.makedirs(folder, exist_ok=True)
+    largest = max(DERIVATIVE_SIZES[size] for size, _ in todo)
+
+    try:
+        source = Image.open(original_path)
+    except UnidentifiedImageError:
+        open(_marker_path(original_path), 'wb').close()
+        return 0
+    with source:
+        # Lets the JPEG decoder downscale while decoding; a big saving on large scans
+        source.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(source)
+        image.load()
+
+    written = 0
+    # Largest first, so each smaller size is resized from the previous one
+    for size in sorted({s for s, _ in todo}, key=DERIVATIVE_SIZES.get, reverse=True):
+        edge = DERIVATIVE_SIZES[size]
+        image = image.copy()
+        image.thumbnail((edge, edge), Image.LANCZOS, reducing_gap=3.0)
+        for ext in [e for s, e in todo if s == size]:
+            pil_format, options = DERIVATIVE_FORMATS[ext]
+            out = _flatten(image) if pil_format == 'JPEG' else image
+            if pil_format == 'WEBP' and out.mode not in ('RGB', 'RGBA'):
+                out = out.convert('RGBA' if 'A' in out.getbands() else 'RGB')
+            fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                out.save(f, pil_format, **options)
+            os.replace(tmp_path, derivative_path(original_path, size, ext))
+            written += 1
+    return written
+
+
+class DerivativeWorker:
+    def __init__(self, max_workers=DERIVATIVE_WORKERS, max_queue=DERIVATIVE_MAX_QUEUE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = set()
+        self.queued = 0
+        self.in_flight = 0
+        self.processed = 0
+        self.written = 0
+        self.skipped = 0
+        self.dropped = 0
+        self.failed = 0
+        self.seconds_total = 0.0
+        self.last_error = None
+
+    def init_app(self, app):
+        self.max_workers = app.config.get('DERIVATIVE_WORKERS', self.max_workers)
+        self.max_queue = app.config.get('DERIVATIVE_MAX_QUEUE', self.max_queue)
+
+    def _get_executor(self):
+        # Caller holds the lock
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix='artwork-derivatives')
+        return self._executor
+
+    def submit(self, original_path, force=False):
+        """
+        Queues one original; returns a Future, or None if it was already queued
+        or the queue is full.
+        """
+        with self._lock:
+            if original_path in self._pending:
+                return None
+            if self.queued >= self.max_queue:
+                self.dropped += 1
+                return None
+            self._pending.add(original_path)
+            self.queued += 1
+            return self._get_executor().submit(self._run, original_path, force)
+
+    def _run(self, original_path, force):
+        with self._lock:
+            self.queued -= 1
+            self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            written = render_derivatives(original_path, force=force)
+            with self._lock:
+                self.processed += 1
+                self.written += written
+                if not written:
+                    self.skipped += 1
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+                self.last_error = f"{original_path}: {e}"
+            print(f"[DERIVATIVES] {self.last_error}")
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.seconds_total += time.perf_counter() - started
+                self._pending.discard(original_path)
+
+    def stats(self):
+        with self._lock:
+            done = self.processed + self.failed
+            return {
+                "workers": self.max_workers,
+                "queue_depth": self.queued,
+                "in_flight": self.in_flight,
+                "processed": self.processed,
+                "derivatives_written": self.written,
+                "already_present": self.skipped,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "ms_avg": round(self.seconds_total / done * 1000, 2) if done else None,
+                "last_error": self.last_error,
+            }
+
+
+derivative_worker = DerivativeWorker()
@@ -0,0 +1,155 @@
+# app/events.py
+
+"""
+In-process fan-out broker for the /api/events Server-Sent Events stream.
+
+Routes publish a small event after they commit a change; every connected
+browser gets that event pushed to it instead of re-polling the full order and
+task lists. Recent events are kept in a ring buffer so a reconnecting client
+can resume from its Last-Event-ID.
+
+Note: the broker lives in one process. With several gunicorn workers, each
+worker only sees the events published by requests it handled itself. Event
+ids are "<boot nonce>-<sequence>", the nonce being random per process, so a
+reconnect that lands on another worker (or after a restart) is recognised and
+sent a "resync" instead of a replay of unrelated events.
+
+Each open stream occupies a worker for as long as the browser is connected,
+so run gunicorn with threads (worker_class "gthread", see gunicorn.conf.py)
+rather than the default sync workers.
+"""
+
+import json
+import queue
+import secrets
+import threading
+from collections import deque
+
+# How many past events are kept for Last-Event-ID replay
+EVENT_HISTORY_SIZE = 1000
+# Per-subscriber backlog; a subscriber that falls this far behind is told to resync
+SUBSCRIBER_QUEUE_SIZE = 256
+# Seconds between keep-alive comments on an idle stream
+KEEPALIVE_INTERVAL = 15
+
+
+class EventBroker:
+    def __init__(self, history_size=EVENT_HISTORY_SIZE):
+        self._lock = threading.Lock()
+        self._history = deque(maxlen=history_size)
+        self._subscribers = set()
+        self._last_id = 0
+        # Distinguishes this process's event ids from any other worker's
+        self.nonce = secrets.token_hex(4)
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event_type, data):
+        """
+        Pushes an event to every subscriber and returns its id.
+        Never blocks: a subscriber whose queue is full is sent a resync marker instead.
+        """
+        with self._lock:
+            self._last_id += 1
+            event = (self._last_id, event_type, data)
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                self._mark_overflowed(q)
+        return self.event_id(event[0])
+
+    def _mark_overflowed(self, q):
+        # Drop the backlog; the client will reload everything anyway
+        while True:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                break
+        q.put_nowait(None)
+
+    def event_id(self, sequence):
+        return f"{self.nonce}-{sequence}"
+
+    def _parse_event_id(self, last_event_id):
+        # The sequence number of one of our own ids, or None (another process, or garbage)
+        nonce, _, sequence = (last_event_id or '').partition('-')
+        if nonce != self.nonce or not sequence.isdigit():
+            return None
+        return int(sequence)
+
+    def subscribe(self, last_event_id=None):
+        """
+        Registers a subscriber and returns (queue, replay), where replay holds the
+        buffered events after last_event_id, or None if the client must resync
+        because those events are no longer (or were never) in the buffer, or the
+        id came from another process.
+        """
+        q = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add(q)
+            replay = []
+            if last_event_id is not None:
+                sequence = self._parse_event_id(last_event_id)
+                oldest_id = self._history[0][0] if self._history else self._last_id + 1
+                if sequence is None or sequence > self._last_id or sequence < oldest_id - 1:
+                    replay = None
+                else:
+                    replay = [e for e in self._history if e[0] > sequence]
+        return q, replay
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def stream(self, last_event_id=None, keepalive=KEEPALIVE_INTERVAL):
+        """
+        Generator of SSE-formatted strings for one client connection.
+        """
+        q, replay = self.subscribe(last_event_id)
+        try:
+            # Tell EventSource how long to wait before reconnecting (ms)
+            yield "retry: 3000\n\n"
+            if replay is None:
+                yield self._format(self._last_id, "resync", {})
+            else:
+                for event in replay:
+                    yield self._format(*event)
+
+            while True:
+                try:
+                    event = q.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    yield self._format(self._last_id, "resync", {})
+                else:
+                    yield self._format(*event)
+        finally:
+            self.unsubscribe(q)
+
+    def _format(self, sequence, event_type, data):
+        return format_sse(self.event_id(sequence), event_type, data)
+
+
+def format_sse(event_id, event_type, data):
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+broker = EventBroker()
+
+
+def publish_event(event_type, **data):
+    """
+    Convenience wrapper used by the routes, e.g.
+        publish_event("order_status", order_id=5, status="Kit Prepared")
+    Call it after db.session.commit() so clients never see uncommitted state.
+    """
+    return broker.publish(event_type, data)
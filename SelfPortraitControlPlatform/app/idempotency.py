@@ -0,0 +1,122 @@
+# app/idempotency.py
+
+"""
+Idempotency-Key support for state-changing routes.
+
+When the React form retries a slow request with the same Idempotency-Key
+header, the stored response from the first attempt is replayed instead of
+running the view again, so no duplicate orders, PDFs or Trello cards.
+
+The first request holds its key for IDEMPOTENCY_LEASE. A worker killed
+mid-request (gunicorn timeout, OOM) never clears its placeholder, so once
+the lease has run out a retry takes the key over and runs the view itself.
+"""
+
+import hashlib
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import jsonify, make_response, request
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+from SelfPortraitControlPlatform.app import db
+from SelfPortraitControlPlatform.app.models import IdempotencyKey
+
+# How long a stored response can be replayed
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# Longer than any request can run (gunicorn kills workers after 120s)
+IDEMPOTENCY_LEASE = timedelta(minutes=3)
+
+
+def _purge_expired():
+    cutoff = datetime.utcnow() - IDEMPOTENCY_KEY_TTL
+    IdempotencyKey.query.filter(IdempotencyKey.created_at < cutoff).delete(synchronize_session=False)
+
+
+def _take_over(record_id, now):
+    """
+    Claims an in-progress key whose lease has run out. True if this request won it.
+    """
+    result = db.session.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.id == record_id, IdempotencyKey.status_code.is_(None),
+               or_(IdempotencyKey.locked_until.is_(None), IdempotencyKey.locked_until < now))
+        .values(locked_until=now + IDEMPOTENCY_LEASE)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def _replay(record):
+    response = make_response(record.response_body, record.status_code)
+    response.mimetype = record.response_mimetype or 'application/json'
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view):
+    """
+    Decorator: honours an optional Idempotency-Key header.
+
+    - First request with a key: a placeholder row is committed, the view runs,
+      and its response (if not a 5xx) is stored against the key.
+    - Retry with the same key and body: the stored response is returned as-is.
+    - Retry while the first is still running: 409; once its lease has run
+      out (the worker died), the retry takes the key over and runs the view.
+    - Same key reused with a different body: 422.
+    Requests without the header behave exactly as before.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key or request.method == 'OPTIONS':
+            return view(*args, **kwargs)
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return jsonify({"error": "Idempotency-Key is too long"}), 400
+
+        scope = f"{request.method} {request.path}"
+        request_hash = hashlib.sha256(request.get_data()).hexdigest()
+
+        _purge_expired()
+        now = datetime.utcnow()
+        record = IdempotencyKey(key=key, scope=scope, request_hash=request_hash,
+                                locked_until=now + IDEMPOTENCY_LEASE)
+        db.session.add(record)
+        try:
+            db.session.commit()
+            record_id = record.id
+        except IntegrityError:
+            db.session.rollback()
+            existing = IdempotencyKey.query.filter_by(key=key, scope=scope).first()
+            if existing is None:
+                return jsonify({"error": "Idempotency-Key conflict, please retry"}), 409
+            if existing.request_hash != request_hash:
+                return jsonify({"error": "Idempotency-Key was already used for a different request"}), 422
+            if existing.status_code is not None:
+                return _replay(existing)
+            record_id = existing.id
+            if not _take_over(record_id, now):
+                return jsonify({"error": "A request with this Idempotency-Key is still in progress"}), 409
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            IdempotencyKey.query.filter_by(id=record_id).delete()
+            db.session.commit()
+            raise
+
+        record = db.session.get(IdempotencyKey, record_id)
+        if response.status_code >= 500:
+            # Let the client retry server errors for real
+            db.session.delete(record)
+        else:
+            record.status_code = response.status_code
+            record.locked_until = None
+            record.response_body = response.get_data(as_text=True)
+            record.response_mimetype = response.mimetype
+        db.session.commit()
+        return response
+    return wrapper
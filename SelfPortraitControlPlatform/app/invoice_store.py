@@ -0,0 +1,77 @@
+# app/invoice_store.py
+
+"""
+Immutable on-disk storage for issued invoice PDFs.
+
+An invoice is rendered once, when it moves to "Generated", and the bytes are
+written to <INVOICE_PDF_FOLDER>/<sha[:2]>/<sha>.pdf. Invoice.pdf_path (relative
+to the folder) and Invoice.pdf_sha256 point at that file; the file itself is
+never rewritten. Regenerating writes a new file and repoints the invoice, so a
+copy someone already downloaded still matches what is on disk under its hash.
+
+The issue date printed on the PDF comes from Invoice.issued_at, set the first
+time the invoice is stored, so re-rendering gives the same document.
+
+Invoices issued before PDFs were stored get theirs on their next status change,
+or all at once with `flask store-invoice-pdfs`; downloads never store anything.
+"""
+
+import hashlib
+import os
+import tempfile
+from datetime import datetime
+
+
+class InvoiceStore:
+    def __init__(self, directory=None):
+        self.directory = None
+        if directory:
+            self.set_directory(directory)
+
+    def init_app(self, app):
+        self.set_directory(app.config.get('INVOICE_PDF_FOLDER') or os.path.join(app.instance_path, 'invoices'))
+
+    def set_directory(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def full_path(self, rel_path):
+        return os.path.join(self.directory, rel_path)
+
+    def write(self, data):
+        """
+        Stores PDF bytes under their SHA-256 and returns (rel_path, sha256).
+        Writing the same bytes twice is a no-op.
+        """
+        sha = hashlib.sha256(data).hexdigest()
+        rel_path = os.path.join(sha[:2], f"{sha}.pdf")
+        path = self.full_path(rel_path)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write atomically so a concurrent download never sees a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.chmod(tmp_path, 0o444)
+            os.replace(tmp_path, path)
+        return rel_path, sha
+
+    def has_pdf(self, invoice):
+        return bool(invoice.pdf_path) and os.path.exists(self.full_path(invoice.pdf_path))
+
+    def persist(self, invoice, regenerate=False):
+        """
+        Renders and stores the invoice PDF if it isn't stored yet (or when
+        regenerate=True), updating the invoice's columns. The caller commits.
+        """
+        from SelfPortraitControlPlatform.app.pdf_utils import generate_invoice_pdf
+
+        if self.has_pdf(invoice) and not regenerate:
+            return invoice.pdf_path
+        if invoice.issued_at is None:
+            invoice.issued_at = datetime.utcnow()
+        invoice.pdf_path, invoice.pdf_sha256 = self.write(generate_invoice_pdf(invoice.order, invoice))
+        return invoice.pdf_path
+
+
+invoice_store = InvoiceStore()
@@ -0,0 +1,329 @@
+# app/janitor.py
+
+"""
+Background deletion of artwork files from disk.
+
+Routes commit first and then hand the janitor what to remove (an order's
+artwork folder, or blobs that lost their last reference); a daemon thread
+deletes it in batches of JANITOR_BATCH_SIZE files, so no request waits on a
+large rmtree. A job that fails is retried with exponential backoff; after
+JANITOR_MAX_ATTEMPTS it is dropped and left to the sweep. Files, bytes
+reclaimed and failures are counted for /api/cache/stats.
+
+Every JANITOR_SWEEP_INTERVAL the janitor also sweeps the artwork folder for
+anything a lost job (restart, crash) or an old bug left behind:
+  - "<order_id>/" folders whose order is gone, or has reached In Production
+    (its cleanup job was lost), unless a legacy artwork_files row or an
+    unfinished upload still points into them;
+  - blob files with no ArtworkBlob row (including those collect() skipped
+    because they were touched within BLOB_GC_GRACE_SECONDS), and stale .tmp
+    files left by interrupted uploads.
+Anything modified within JANITOR_SWEEP_GRACE_SECONDS is left alone, so a
+folder an upload has only just created is never swept from under it.
+"""
+
+import os
+import threading
+import time
+
+from SelfPortraitControlPlatform.app import db
+from SelfPortraitControlPlatform.app.blob_store import BLOB_ENTRY_PREFIX, blob_store
+from SelfPortraitControlPlatform.app.models import ArtworkBlob, ArtworkFile, ArtworkUpload, Order
+
+JANITOR_BATCH_SIZE = 200  # files unlinked before yielding
+JANITOR_BATCH_PAUSE = 0.01  # seconds between batches, to keep disk I/O from starving requests
+JANITOR_MAX_ATTEMPTS = 5
+JANITOR_BACKOFF_BASE = 5  # seconds; doubles per attempt
+JANITOR_SWEEP_INTERVAL = 60 * 60
+JANITOR_SWEEP_GRACE_SECONDS = 60 * 60
+# Order statuses whose artwork has been cleared from disk (see update_order_status)
+ARTWORK_CLEARED_STATUSES = ('In Production', 'Ready to Dispatch', 'Final Package Dispatched',
+                            'Final Package Received', 'Closed')
+
+
+def _backoff(attempts):
+    return JANITOR_BACKOFF_BASE * 2 ** (attempts - 1)
+
+
+class ArtworkJanitor:
+    def __init__(self):
+        self.app = None
+        self.artwork_folder = None
+        self.enabled = True
+        self.batch_size = JANITOR_BATCH_SIZE
+        self.sweep_interval = JANITOR_SWEEP_INTERVAL
+        self._thread = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        # ('folder', path) / ('blobs', frozenset of sha256) -> (attempts, next attempt at)
+        self._jobs = {}
+        self._next_sweep = None
+        self.folders_removed = 0
+        self.blobs_removed = 0
+        self.files_removed = 0
+        self.bytes_reclaimed = 0
+        self.retries = 0
+        self.failed = 0
+        self.sweeps = 0
+        self.orphans_found = 0
+        self.last_sweep_at = None
+        self.last_error = None
+
+    def set_directory(self, artwork_folder):
+        self.artwork_folder = artwork_folder
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('ARTWORK_JANITOR_ENABLED', self.enabled)
+        self.batch_size = app.config.get('ARTWORK_JANITOR_BATCH_SIZE', self.batch_size)
+        self.sweep_interval = app.config.get('ARTWORK_JANITOR_SWEEP_INTERVAL', self.sweep_interval)
+        if self.enabled:
+            self.start()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        # First sweep one interval after start-up, not during it
+        self._next_sweep = time.time() + self.sweep_interval
+        self._thread = threading.Thread(target=self._run, name='artwork-janitor', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def remove_folder(self, path):
+        """
+        Deletes a folder and everything in it, in the background. Call after commit.
+        """
+        self._schedule(('folder', path))
+
+    def collect_blobs(self, sha256s):
+        """
+        blob_store.collect() in the background. Call after commit.
+        """
+        if sha256s:
+            self._schedule(('blobs', frozenset(sha256s)))
+
+    def _schedule(self, job):
+        with self._lock:
+            self._jobs.setdefault(job, (0, 0.0))
+        if self.enabled:
+            self._wakeup.set()
+        else:
+            # No thread (tests, `flask` commands): do it now
+            self.run_pending()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.run_pending()
+                if time.time() >= self._next_sweep:
+                    self._next_sweep = time.time() + self.sweep_interval
+                    self.sweep()
+            except Exception as e:
+                with self._lock:
+                    self.last_error = str(e)
+                print(f"[JANITOR] {e}")
+            with self._lock:
+                due = [next_at for _, next_at in self._jobs.values()]
+            wait = min(due + [self._next_sweep]) - time.time()
+            self._wakeup.wait(max(wait, 0.1))
+            self._wakeup.clear()
+
+    def run_pending(self):
+        """
+        Runs every job that is due. Returns how many finished.
+        """
+        now = time.time()
+        with self._lock:
+            due = [job for job, (_, next_at) in self._jobs.items() if next_at <= now]
+        done = 0
+        for job in due:
+            kind, target = job
+            try:
+                if kind == 'folder':
+                    self._remove_tree(target)
+                else:
+                    with self.app.app_context():
+                        self._collect(target)
+            except Exception as e:
+                with self._lock:
+                    attempts = self._jobs[job][0] + 1
+                    self.last_error = f"{kind} {self._describe(job)}: {e}"
+                    if attempts >= JANITOR_MAX_ATTEMPTS:
+                        self.failed += 1
+                        del self._jobs[job]
+                        print(f"[JANITOR] Giving up after {attempts} attempts: {self.last_error}")
+                    else:
+                        self.retries += 1
+                        self._jobs[job] = (attempts, time.time() + _backoff(attempts))
+                        print(f"[JANITOR] Will retry: {self.last_error}")
+                continue
+            with self._lock:
+                del self._jobs[job]
+            done += 1
+        return done
+
+    @staticmethod
+    def _describe(job):
+        kind, target = job
+        return target if kind == 'folder' else f"{len(target)} blob(s)"
+
+    def _remove_tree(self, path):
+        """
+        Unlinks files bottom-up, pausing every batch_size files, then removes the
+        emptied directories. Any error aborts the job so it is retried; files
+        already removed stay removed.
+        """
+        if not os.path.isdir(path):
+            return
+        removed = 0
+        for root, dirs, files in os.walk(path, topdown=False):
+            for name in files:
+                file_path = os.path.join(root, name)
+                try:
+                    size = os.lstat(file_path).st_size
+                    os.remove(file_path)
+                except FileNotFoundError:
+                    continue
+                with self._lock:
+                    self.files_removed += 1
+                    self.bytes_reclaimed += size
+                removed += 1
+                if removed % self.batch_size == 0:
+                    time.sleep(JANITOR_BATCH_PAUSE)
+            for name in dirs:
+                dir_path = os.path.join(root, name)
+                if os.path.islink(dir_path):
+                    os.remove(dir_path)
+                else:
+                    os.rmdir(dir_path)
+        os.rmdir(path)
+        with self._lock:
+            self.folders_removed += 1
+        print(f"[CLEANUP] Deleted folder {path} ({removed} files)")
+
+    def _collect(self, sha256s):
+        sizes = {sha: self._size(blob_store.path(sha)) for sha in sha256s}
+        before = {sha for sha in sha256s if sizes[sha] is not None}
+        blob_store.collect(sha256s)
+        gone = {sha for sha in before if not blob_store.exists(sha)}
+        with self._lock:
+            self.blobs_removed += len(gone)
+            self.files_removed += len(gone)
+            self.bytes_reclaimed += sum(sizes[sha] for sha in gone)
+
+    @staticmethod
+    def _size(path):
+        try:
+            return os.path.getsize(path)
+        except FileNotFoundError:
+            return None
+
+    def sweep(self):
+        """
+        Finds orphaned order folders, unreferenced blobs and stale temp files,
+        and queues them for removal. Returns how many were found.
+        """
+        cutoff = time.time() - JANITOR_SWEEP_GRACE_SECONDS
+        found = 0
+        with self.app.app_context():
+            folders = self._orphan_folders(cutoff)
+            for path in folders:
+                self._schedule(('folder', path))
+            blobs, temp_files = self._orphan_blobs(cutoff)
+            db.session.remove()
+        found += len(folders)
+        for path in temp_files:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            with self._lock:
+                self.files_removed += 1
+                self.bytes_reclaimed += size
+            found += 1
+        if blobs:
+            # collect() re-checks for a row, so a blob re-referenced since is kept
+            self.collect_blobs(blobs)
+            found += len(blobs)
+        with self._lock:
+            self.sweeps += 1
+            self.orphans_found += found
+            self.last_sweep_at = time.time()
+        if found:
+            print(f"[JANITOR] Sweep found {found} orphaned folder(s)/file(s)")
+        return found
+
+    def _orphan_folders(self, cutoff):
+        candidates = {}
+        with os.scandir(self.artwork_folder) as entries:
+            for entry in entries:
+                if entry.name.isdigit() and entry.is_dir(follow_symlinks=False) \
+                        and entry.stat().st_mtime < cutoff:
+                    candidates[int(entry.name)] = entry.path
+        if not candidates:
+            return []
+        ids = list(candidates)
+        # Folders still needed: legacy "<order_id>/<name>" files and unfinished uploads
+        in_use = {order_id for (order_id,) in
+                  db.session.query(ArtworkFile.order_id)
+                  .filter(ArtworkFile.order_id.in_(ids), ~ArtworkFile.path.like(f"{BLOB_ENTRY_PREFIX}/%"))}
+        in_use |= {order_id for (order_id,) in
+                   db.session.query(ArtworkUpload.order_id).filter(ArtworkUpload.order_id.in_(ids))}
+        active = {order_id for (order_id,) in
+                  db.session.query(Order.id)
+                  .filter(Order.id.in_(ids), ~Order.status.in_(ARTWORK_CLEARED_STATUSES))}
+        return [path for order_id, path in candidates.items()
+                if order_id not in in_use and order_id not in active]
+
+    def _orphan_blobs(self, cutoff):
+        on_disk, temp_files = set(), []
+        root = blob_store.directory
+        for prefix in os.listdir(root):
+            folder = os.path.join(root, prefix)
+            if not os.path.isdir(folder):
+                if prefix.endswith('.tmp') and os.path.getmtime(folder) < cutoff:
+                    temp_files.append(folder)
+                continue
+            for name in os.listdir(folder):
+                path = os.path.join(folder, name)
+                if name.endswith('.tmp') and os.path.getmtime(path) < cutoff:
+                    temp_files.append(path)
+                elif len(name) == 64 and name.startswith(prefix) and os.path.getmtime(path) < cutoff:
+                    on_disk.add(name)
+        if not on_disk:
+            return set(), temp_files
+        referenced = set()
+        names = list(on_disk)
+        for start in range(0, len(names), 500):
+            referenced |= {sha for (sha,) in
+                           db.session.query(ArtworkBlob.sha256)
+                           .filter(ArtworkBlob.sha256.in_(names[start:start + 500]))}
+        return on_disk - referenced, temp_files
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "pending_jobs": len(self._jobs),
+                "folders_removed": self.folders_removed,
+                "blobs_removed": self.blobs_removed,
+                "files_removed": self.files_removed,
+                "bytes_reclaimed": self.bytes_reclaimed,
+                "retries": self.retries,
+                "failed": self.failed,
+                "sweeps": self.sweeps,
+                "orphans_found": self.orphans_found,
+                "last_sweep_at": self.last_sweep_at,
+                "last_error": self.last_error,
+            }
+
+
+artwork_janitor = ArtworkJanitor()
@@ -1,6 +1,12 @@
 from SelfPortraitControlPlatform.app import db
 from datetime import datetime
-from sqlalchemy.dialects.mysql import JSON
+from sqlalchemy import event
+from sqlalchemy.dialects.mysql import DATETIME, JSON
+
+# updated_at columns feed ETags and cache versions, so they need microseconds:
+# a plain DATETIME on MySQL is whole seconds, and two changes in the same
+# second would give the same version
+PreciseDateTime = db.DateTime().with_variant(DATETIME(fsp=6), 'mysql', 'mariadb')
 
 
 class User(db.Model):
@@ -43,18 +49,22 @@ class Order(db.Model):
     delivery_instructions = db.Column(db.Text)  # or String(500), etc.
     agree_to_promotions = db.Column(db.Boolean, default=False)
 
-    status = db.Column(db.String(50), default='Requested')
+    status = db.Column(db.String(50), default='Requested', index=True)
 
     # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    updated_at = db.Column(PreciseDateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
-    portal_username = db.Column(db.String(255), nullable=True)
+    portal_username = db.Column(db.String(255), nullable=True, index=True)
     portal_password = db.Column(db.String(50), nullable=True)
     kit_dispatched_at = db.Column(db.String(255), default='Kit not dispatched yet')
     kit_received_at = db.Column(db.String(255), default='Kit not received yet')
     quantities = db.Column(db.String(255), default='Unconfirmed')
 
+    # Filled in by the outbox dispatcher once the Trello card exists
+    trello_card_id = db.Column(db.String(64), nullable=True)
+    trello_card_url = db.Column(db.String(255), nullable=True)
+
 
     # Relationships
     kits = db.relationship('Kit', backref='order', lazy=True)
@@ -78,6 +88,8 @@ class Kit(db.Model):
     tracking_number = db.Column(db.String(255))
     # Potential future columns: shipping_label_url, kit_status, etc.
 
+    updated_at = db.Column(PreciseDateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
     def __repr__(self):
         return f"<Kit {self.id} for Order {self.order_id}>"
 
@@ -91,14 +103,56 @@ class Artwork(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
 
-    design_file_path = db.Column(db.String(255))
     status = db.Column(db.String(50), default='In Artwork')
     # Could store multiple revisions, notes, etc.
 
+    updated_at = db.Column(PreciseDateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    # The order's uploaded files, one ArtworkFile row each
+    files = db.relationship(
+        'ArtworkFile',
+        primaryjoin='Artwork.order_id == foreign(ArtworkFile.order_id)',
+        order_by='ArtworkFile.id',
+        viewonly=True,
+    )
+
+    @property
+    def design_file_path(self):
+        """
+        The file paths as the comma-joined string the API has always returned.
+        """
+        return ",".join(f.path for f in self.files) or None
+
     def __repr__(self):
         return f"<Artwork {self.id} for Order {self.order_id}>"
 
 
+class ArtworkFile(db.Model):
+    """
+    One uploaded artwork file. path is what the API exposes and what
+    /static/artwork/<path> serves: "blobs/<xx>/<sha256>/<name>" for files in the
+    blob store, "<order_id>/<name>" for older uploads.
+    Adding or removing a file is a single-row insert/delete; the unique
+    constraints make concurrent uploads of the same file/content safe.
+    """
+    __tablename__ = 'artwork_files'
+    __table_args__ = (
+        db.UniqueConstraint('order_id', 'path', name='uq_artwork_files_order_id_path'),
+        db.UniqueConstraint('order_id', 'sha256', name='uq_artwork_files_order_id_sha256'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
+    path = db.Column(db.String(512), nullable=False)
+    sha256 = db.Column(db.String(64), nullable=True)  # NULL only for older files that couldn't be hashed
+    size = db.Column(db.BigInteger, nullable=True)
+    width = db.Column(db.Integer, nullable=True)
+    height = db.Column(db.Integer, nullable=True)
+    uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ArtworkFile {self.id} {self.path}>"
+
+
 class Invoice(db.Model):
     """
     Represents the invoice for a particular order (one-to-one relationship).
@@ -106,18 +160,30 @@ class Invoice(db.Model):
     """
     __tablename__ = 'invoices'
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, unique=True, index=True)
 
     amount = db.Column(db.Float)
     status = db.Column(db.String(50), default='Ungenerated')
     # Additional fields: invoice_date, paid_date, etc.
 
+    # Set when the PDF is first stored; printed as the issue date
+    issued_at = db.Column(db.DateTime, nullable=True)
+    # Stored PDF, relative to INVOICE_PDF_FOLDER (see invoice_store.py)
+    pdf_path = db.Column(db.String(255), nullable=True)
+    pdf_sha256 = db.Column(db.String(64), nullable=True)
+
+    updated_at = db.Column(PreciseDateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
     def __repr__(self):
         return f"<Invoice {self.id} for Order {self.order_id}>"
 
 
 class Task(db.Model):
     __tablename__ = 'tasks'
+    __table_args__ = (
+        # update_order_status looks tasks up by (order_id, task_type)
+        db.Index('ix_tasks_order_id_task_type', 'order_id', 'task_type'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     description = db.Column(db.String(255))
     due_date = db.Column(db.DateTime)
@@ -127,9 +193,135 @@ class Task(db.Model):
     order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=True)
     task_type = db.Column(db.String(50), nullable=True)
 
+    updated_at = db.Column(PreciseDateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
     # If you want a direct relationship, you can add this:
     # order = db.relationship('Order', backref='tasks', lazy=True)
 
     def __repr__(self):
         return f"<Task {self.id} - {self.description}>"
 
+
+class Tombstone(db.Model):
+    """
+    Records the deletion of an order or one of its child rows, so the
+    delta sync endpoint can tell clients to drop it from their local cache.
+    Written automatically by the before_flush hook below.
+    """
+    __tablename__ = 'tombstones'
+    id = db.Column(db.Integer, primary_key=True)
+    record_type = db.Column(db.String(50), nullable=False)  # "order", "kit", "artwork", "invoice"
+    record_id = db.Column(db.Integer, nullable=False)
+    order_id = db.Column(db.Integer, nullable=True)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f"<Tombstone {self.record_type} {self.record_id}>"
+
+
+class IdempotencyKey(db.Model):
+    """
+    Stored response for a request sent with an Idempotency-Key header, so a
+    retried POST/PATCH returns the original result instead of running again.
+    status_code is NULL while the first request is still in progress; if that
+    request dies (worker killed), a retry takes the row over once locked_until
+    has passed. Rows expire after IDEMPOTENCY_KEY_TTL (see app/idempotency.py).
+    """
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        db.UniqueConstraint('key', 'scope', name='uq_idempotency_keys_key_scope'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(255), nullable=False)
+    scope = db.Column(db.String(255), nullable=False)  # e.g. "POST /api/orders"
+    request_hash = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+    response_mimetype = db.Column(db.String(255), nullable=True)
+    locked_until = db.Column(db.DateTime, nullable=True)  # lease of the in-progress request
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f"<IdempotencyKey {self.key} {self.scope}>"
+
+
+class OutboxMessage(db.Model):
+    """
+    Transactional outbox: a side effect (e.g. creating a Trello card) recorded in
+    the same commit as the change that caused it, and carried out later by the
+    dispatcher in app/outbox.py with retries.
+    status: "pending" -> "done", or "dead" once OUTBOX_MAX_ATTEMPTS is reached.
+    """
+    __tablename__ = 'outbox'
+    __table_args__ = (
+        db.Index('ix_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(100), nullable=False)  # e.g. "trello.create_card"
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<OutboxMessage {self.id} {self.topic} {self.status}>"
+
+
+class ArtworkBlob(db.Model):
+    """
+    A stored artwork file, keyed by its SHA-256 (see app/blob_store.py).
+    refcount is the number of ArtworkFile rows pointing at it;
+    the row is deleted when that reaches zero and the file is then removed.
+    """
+    __tablename__ = 'artwork_blobs'
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ArtworkBlob {self.sha256[:12]} refs={self.refcount}>"
+
+
+class ArtworkUpload(db.Model):
+    """
+    An unfinished chunked artwork upload (see app/artwork_uploads.py).
+    received is how many bytes of the partial file have been written; the row
+    is deleted when the upload is finalised or aborted.
+    """
+    __tablename__ = 'artwork_uploads'
+    __table_args__ = (
+        db.UniqueConstraint('order_id', 'filename', name='uq_artwork_uploads_order_id_filename'),
+    )
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex, also names the partial file
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)  # already passed through secure_filename
+    size = db.Column(db.BigInteger, nullable=False)
+    received = db.Column(db.BigInteger, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f"<ArtworkUpload {self.id} {self.order_id}/{self.filename} {self.received}/{self.size}>"
+
+
+# Models whose deletions are recorded as tombstones, and the record_type used for each
+TOMBSTONE_TYPES = {
+    Order: 'order',
+    Kit: 'kit',
+    Artwork: 'artwork',
+    Invoice: 'invoice',
+}
+
+
+@event.listens_for(db.session, 'before_flush')
+def _record_tombstones(session, flush_context, instances):
+    for obj in list(session.deleted):
+        record_type = TOMBSTONE_TYPES.get(type(obj))
+        if record_type is None:
+            continue
+        order_id = obj.id if record_type == 'order' else obj.order_id
+        session.add(Tombstone(record_type=record_type, record_id=obj.id, order_id=order_id))
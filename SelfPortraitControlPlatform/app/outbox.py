@@ -0,0 +1,174 @@
+# app/outbox.py
+
+"""
+Dispatcher for the transactional outbox (OutboxMessage).
+
+Routes call enqueue() before their commit, so the message exists if and only
+if the change it belongs to was committed. A background thread then drains due
+messages, calling the handler registered for each topic. Failures are retried
+with exponential backoff; after OUTBOX_MAX_ATTEMPTS the message is marked
+"dead" and left for a human to look at.
+
+Each message is claimed with a conditional UPDATE before it is handled, so
+several processes (gunicorn workers, or a separate `flask drain-outbox` worker)
+can run dispatchers against the same table without double-sending.
+"""
+
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+from SelfPortraitControlPlatform.app import db
+from SelfPortraitControlPlatform.app.models import Order, OutboxMessage
+
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_BACKOFF_BASE = 5  # seconds; doubles per attempt
+OUTBOX_BACKOFF_MAX = 60 * 60
+# How long a claimed message is hidden from other dispatchers while its handler runs
+OUTBOX_LEASE = timedelta(minutes=2)
+OUTBOX_BATCH_SIZE = 20
+# Idle poll interval; notify() wakes the dispatcher sooner
+OUTBOX_POLL_INTERVAL = 10
+
+
+def enqueue(topic, **payload):
+    """
+    Adds a message to the current session. Does not commit: the caller's commit
+    writes it together with the change it belongs to.
+    """
+    message = OutboxMessage(topic=topic, payload=json.dumps(payload))
+    db.session.add(message)
+    return message
+
+
+def _handle_trello_create_card(payload):
+    from SelfPortraitControlPlatform.app.trello_integration import create_trello_card
+
+    order = db.session.get(Order, payload['order_id'])
+    if order is None or order.trello_card_id:
+        # Order deleted, or a card was already made by an earlier attempt
+        return
+    card_data = create_trello_card(order)
+    if card_data is None:
+        raise RuntimeError("Trello card creation failed (see [TRELLO] log)")
+    order.trello_card_id = card_data.get('id')
+    order.trello_card_url = card_data.get('shortUrl')
+    print(f"[TRELLO] Card created: {order.trello_card_url}")
+
+
+OUTBOX_HANDLERS = {
+    'trello.create_card': _handle_trello_create_card,
+}
+
+
+def _backoff(attempts):
+    return timedelta(seconds=min(OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1), OUTBOX_BACKOFF_MAX))
+
+
+class OutboxDispatcher:
+    def __init__(self, app=None):
+        self.app = None
+        self._thread = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        if app.config.get('OUTBOX_DISPATCHER_ENABLED', True):
+            self.start()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='outbox-dispatcher', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def notify(self):
+        """
+        Wakes the dispatcher after a commit that enqueued messages.
+        """
+        self._wakeup.set()
+
+    def run_forever(self):
+        """
+        Foreground loop for a dedicated worker process (`flask drain-outbox`).
+        """
+        self._run()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            handled = 0
+            try:
+                with self.app.app_context():
+                    handled = self.dispatch_due()
+            except Exception as e:
+                print(f"[OUTBOX] Dispatcher error: {e}")
+            if handled == 0:
+                self._wakeup.wait(OUTBOX_POLL_INTERVAL)
+                self._wakeup.clear()
+
+    def dispatch_due(self, limit=OUTBOX_BATCH_SIZE):
+        """
+        Handles up to `limit` due messages. Must run inside an app context.
+        Returns how many messages were claimed.
+        """
+        now = datetime.utcnow()
+        due = (OutboxMessage.query
+               .filter(OutboxMessage.status == 'pending', OutboxMessage.next_attempt_at <= now)
+               .order_by(OutboxMessage.next_attempt_at)
+               .limit(limit)
+               .all())
+        seen = [(m.id, m.attempts) for m in due]
+        db.session.commit()
+
+        claimed = 0
+        for message_id, attempts in seen:
+            if self._claim(message_id, attempts):
+                claimed += 1
+                self._dispatch_one(message_id)
+        return claimed
+
+    def _claim(self, message_id, attempts):
+        rows = (OutboxMessage.query
+                .filter_by(id=message_id, status='pending', attempts=attempts)
+                .update({'attempts': attempts + 1,
+                         'next_attempt_at': datetime.utcnow() + OUTBOX_LEASE},
+                        synchronize_session=False))
+        db.session.commit()
+        return rows == 1
+
+    def _dispatch_one(self, message_id):
+        message = db.session.get(OutboxMessage, message_id)
+        handler = OUTBOX_HANDLERS.get(message.topic)
+        try:
+            if handler is None:
+                raise RuntimeError(f"No handler for topic {message.topic}")
+            handler(json.loads(message.payload))
+        except Exception as e:
+            db.session.rollback()
+            message = db.session.get(OutboxMessage, message_id)
+            message.last_error = str(e)
+            if message.attempts >= OUTBOX_MAX_ATTEMPTS:
+                message.status = 'dead'
+                print(f"[OUTBOX] Message {message.id} ({message.topic}) dead after {message.attempts} attempts: {e}")
+            else:
+                message.next_attempt_at = datetime.utcnow() + _backoff(message.attempts)
+                print(f"[OUTBOX] Message {message.id} ({message.topic}) failed, retrying at {message.next_attempt_at}: {e}")
+        else:
+            message.status = 'done'
+            message.processed_at = datetime.utcnow()
+            message.last_error = None
+        db.session.commit()
+
+
+outbox_dispatcher = OutboxDispatcher()
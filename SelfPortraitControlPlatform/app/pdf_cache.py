@@ -0,0 +1,192 @@
+# app/pdf_cache.py
+
+"""
+Content-addressed cache for rendered order PDFs (packing slips, checklists, ...).
+
+A PDF's key is a SHA-256 of the document type, PDF_TEMPLATE_VERSION and the
+values of the Order fields that document's generator reads (PDF_DOCUMENT_FIELDS
+in pdf_utils.py). Any change to those fields gives a new key, so entries never
+need invalidating; old ones simply age out.
+
+Two tiers:
+  - an in-memory LRU bounded by total bytes, for the hot documents
+  - files on disk (one per key) bounded by total bytes, evicted least recently
+    used first (file mtime is bumped on every hit). Going over the limit
+    evicts down to PDF_CACHE_LOW_WATER of it, so the folder is re-scanned
+    once per ~10% of max_bytes written rather than on every put once full.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from SelfPortraitControlPlatform.app.pdf_utils import PDF_DOCUMENT_FIELDS, PDF_TEMPLATE_VERSION
+
+PDF_CACHE_MAX_BYTES = 512 * 1024 * 1024
+PDF_CACHE_MEMORY_MAX_BYTES = 32 * 1024 * 1024
+# Disk eviction stops at this fraction of max_bytes
+PDF_CACHE_LOW_WATER = 0.9
+
+
+class PDFCache:
+    def __init__(self, directory=None, max_bytes=PDF_CACHE_MAX_BYTES,
+                 memory_max_bytes=PDF_CACHE_MEMORY_MAX_BYTES):
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self.memory_max_bytes = memory_max_bytes
+        self.max_bytes = max_bytes
+        self.low_water = PDF_CACHE_LOW_WATER
+        self.directory = None
+        self._disk_bytes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if directory:
+            self.set_directory(directory)
+
+    def init_app(self, app):
+        self.max_bytes = app.config.get('PDF_CACHE_MAX_BYTES', self.max_bytes)
+        self.memory_max_bytes = app.config.get('PDF_CACHE_MEMORY_MAX_BYTES', self.memory_max_bytes)
+        self.low_water = app.config.get('PDF_CACHE_LOW_WATER', self.low_water)
+        self.set_directory(app.config.get('PDF_CACHE_FOLDER') or os.path.join(app.instance_path, 'pdf_cache'))
+
+    def set_directory(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self.directory = directory
+            self._disk_bytes = sum(size for _, _, size in self._disk_entries())
+
+    @staticmethod
+    def key(doc_type, order):
+        fields = PDF_DOCUMENT_FIELDS[doc_type]
+        values = [getattr(order, f) for f in fields]
+        raw = json.dumps([doc_type, PDF_TEMPLATE_VERSION, values], default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def _disk_entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pdf'):
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, entry.path, st.st_size))
+        return entries
+
+    def _remember(self, key, data):
+        # Caller holds the lock
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        if len(data) > self.memory_max_bytes:
+            return
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def get(self, key):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return data
+
+        if self.directory:
+            path = self._path(key)
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                os.utime(path)  # mark as recently used for LRU eviction
+            except FileNotFoundError:
+                data = None
+            if data is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._remember(key, data)
+                return data
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def contains(self, key):
+        """
+        True if the key is cached in either tier. Doesn't touch the counters or LRU order.
+        """
+        with self._lock:
+            if key in self._memory:
+                return True
+        return bool(self.directory) and os.path.exists(self._path(key))
+
+    def put(self, key, data):
+        with self._lock:
+            self._remember(key, data)
+        if not self.directory:
+            return
+
+        # Write atomically so concurrent readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(key))
+
+        with self._lock:
+            self._disk_bytes += len(data)
+            if self._disk_bytes > self.max_bytes:
+                self._evict_disk()
+
+    def _evict_disk(self):
+        # Caller holds the lock. Re-scan so files written by other processes count too.
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, _, size in entries)
+        if total <= self.max_bytes:
+            # Over only by our own estimate (e.g. overwritten keys counted twice)
+            self._disk_bytes = total
+            return
+        target = int(self.max_bytes * self.low_water)
+        for _, path, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+        self._disk_bytes = total
+
+    def get_or_render(self, key, render):
+        data = self.get(key)
+        if data is None:
+            data = render()
+            self.put(key, data)
+        return data
+
+    def stats(self):
+        with self._lock:
+            return {
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "memory_max_bytes": self.memory_max_bytes,
+                "disk_bytes": self._disk_bytes,
+                "disk_max_bytes": self.max_bytes,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+pdf_cache = PDFCache()
@@ -4,18 +4,134 @@
 
 import os
 from datetime import datetime
+from functools import lru_cache
 from io import BytesIO
 
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER
 from reportlab.lib.enums import TA_LEFT
 from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.utils import ImageReader
 from reportlab.pdfgen import canvas
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.platypus import Table, TableStyle
 
 
+##############################################################################
+# Shared document template pieces, built once per process.
+# Treat these as read-only: derive a new ParagraphStyle instead of mutating one.
+##############################################################################
+
+_SAMPLE_STYLES = getSampleStyleSheet()
+NORMAL_STYLE = _SAMPLE_STYLES["Normal"]
+NORMAL_CENTER_STYLE = ParagraphStyle("NormalCenter", parent=NORMAL_STYLE, alignment=TA_CENTER)
+HEADING_LEFT_STYLE = ParagraphStyle("Heading1Left", parent=_SAMPLE_STYLES["Heading1"], alignment=TA_LEFT)
+HEADING_CENTER_STYLE = ParagraphStyle("Heading1Center", parent=_SAMPLE_STYLES["Heading1"], alignment=TA_CENTER)
+
+# Packing slip: nested item table, and the outer table holding it
+PACKING_SLIP_ITEM_TABLE_STYLE = TableStyle([
+    ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
+    ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+    ("ALIGN", (0, 0), (-1, 0), "CENTER"),
+    ("GRID", (0, 0), (-1, -1), 1, colors.black),
+    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+    ("FONTSIZE", (0, 0), (-1, 0), 10),
+])
+PACKING_SLIP_TABLE_STYLE = TableStyle([
+    ("BOX", (0, 0), (-1, -1), 1, colors.black),
+    ("INNERGRID", (0, 0), (-1, -1), 0.5, colors.grey),
+    ("SPAN", (0, 0), (2, 0)),  # Title row spans columns 0-2
+    ("SPAN", (0, 3), (2, 3)),  # Items row spans columns 0-2
+
+    ("ALIGN", (0, 0), (2, 0), "CENTER"),
+    ("FONTNAME", (0, 0), (2, 0), "Helvetica-Bold"),
+    ("FONTSIZE", (0, 0), (2, 0), 16),
+    ("BOTTOMPADDING", (0, 0), (2, 0), 12),
+
+    ("ALIGN", (0, 1), (2, 1), "CENTER"),
+    ("FONTNAME", (0, 1), (2, 1), "Helvetica-Bold"),
+    ("FONTSIZE", (0, 1), (2, 1), 10),
+    ("BACKGROUND", (0, 1), (2, 1), colors.lightgrey),
+    ("BOTTOMPADDING", (0, 1), (2, 1), 6),
+    ("TOPPADDING", (0, 1), (2, 1), 6),
+
+    ("VALIGN", (0, 2), (2, 2), "TOP"),
+    ("FONTNAME", (0, 2), (2, 2), "Helvetica"),
+    ("FONTSIZE", (0, 2), (2, 2), 10),
+    ("LEFTPADDING", (0, 2), (2, 2), 6),
+    ("RIGHTPADDING", (0, 2), (2, 2), 6),
+
+    ("VALIGN", (0, 3), (2, 3), "TOP"),
+])
+
+# Invoice: item lines and totals
+INVOICE_ITEMS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+])
+INVOICE_TOTALS_TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+    ('LINEBELOW', (0, 2), (-1, -4), 0.5, colors.grey),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+    ('TOPPADDING', (0, 0), (-1, -1), 5),
+])
+
+# Absolute, so it works whatever the working directory is
+LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "CFLogo.png")
+LOGO_DRAW_WIDTH = 100
+LOGO_DRAW_HEIGHT = 50
+
+
+@lru_cache(maxsize=None)
+def _logo_image():
+    """
+    The logo decoded once and pre-scaled to 2x its drawn size (for print
+    sharpness), so each invoice only embeds a small image. None if missing.
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(LOGO_PATH) as im:
+            im.thumbnail((LOGO_DRAW_WIDTH * 2, LOGO_DRAW_HEIGHT * 2))
+            scaled = im.copy()
+    except OSError as e:
+        print(f"Logo load error: {e}")
+        return None
+    return ImageReader(scaled)
+
+
+# Bump when a generator's layout or wording changes, so cached PDFs are re-rendered
+PDF_TEMPLATE_VERSION = 1
+
+# The Order fields each generator reads. The rendered-PDF cache (app/pdf_cache.py)
+# hashes exactly these, so keep them in sync with the functions below.
+PDF_DOCUMENT_FIELDS = {
+    "packing_slip": (  # create_invoice_pdf
+        "id", "free_sample", "art_packs", "created_at", "first_name", "last_name",
+        "address_line1", "address_line2", "city", "county", "postcode", "phone",
+    ),
+    "next_steps": (  # create_next_steps_pdf
+        "portal_username", "portal_password",
+    ),
+    "checklist": (  # create_checklist_pdf
+        "id", "free_sample", "first_name", "last_name", "school_name", "art_packs",
+        "address_line1", "address_line2", "city", "county", "postcode",
+    ),
+    "final_package_checklist": (  # create_final_package_checklist_pdf
+        "id", "school_name", "status", "phone", "address_line1", "city", "postcode",
+        "quantities",
+    ),
+}
+
+
 # app/pdf_utils.py
 
 def create_checklist_pdf(order):
@@ -34,12 +150,9 @@ def create_checklist_pdf(order):
         bottomMargin=50
     )
 
-    styles = getSampleStyleSheet()
-    normal_style = styles["Normal"]
-    heading_style = styles["Heading1"]
-
+    normal_style = NORMAL_STYLE
     # Let’s keep alignment left for a typical checklist
-    heading_style.alignment = TA_LEFT
+    heading_style = HEADING_LEFT_STYLE
 
     elements = []
 
@@ -121,12 +234,9 @@ def create_next_steps_pdf(order):
         bottomMargin=50
     )
 
-    styles = getSampleStyleSheet()
-    normal_style = styles["Normal"]
-    heading_style = styles["Heading1"]
-
-    # Center-align the headings for this document
-    heading_style.alignment = TA_CENTER
+    # Center-align the headings and paragraphs for this document
+    heading_style = HEADING_CENTER_STYLE
+    normal_style = NORMAL_CENTER_STYLE
 
     elements = []
 
@@ -147,8 +257,6 @@ def create_next_steps_pdf(order):
     If you have any issues with the kit, please contact our support desk at:
     (Alpha Graphics / Class Fundraising Support Desk contact details)<br/><br/>
     """
-    # Center-align normal paragraphs
-    normal_style.alignment = TA_CENTER
     elements.append(Paragraph(next_steps_text, normal_style))
     elements.append(Spacer(1, 24))
 
@@ -232,15 +340,7 @@ def create_invoice_pdf(order, kit_items=None):
         ])
 
     item_table = Table(item_data, colWidths=[120, 370, 70])
-    item_table_style = TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
-        ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
-        ("ALIGN", (0, 0), (-1, 0), "CENTER"),
-        ("GRID", (0, 0), (-1, -1), 1, colors.black),
-        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("FONTSIZE", (0, 0), (-1, 0), 10),
-    ])
-    item_table.setStyle(item_table_style)
+    item_table.setStyle(PACKING_SLIP_ITEM_TABLE_STYLE)
 
     # 2) Construct "Order Information"
     # You can format dates with .strftime or just store them as strings
@@ -276,34 +376,7 @@ def create_invoice_pdf(order, kit_items=None):
         [item_table, "", ""],  # Row 3 (nested items)
     ]
     parent_table = Table(parent_data, colWidths=[190, 190, 190])
-
-    parent_table_style = TableStyle([
-        ("BOX", (0, 0), (-1, -1), 1, colors.black),
-        ("INNERGRID", (0, 0), (-1, -1), 0.5, colors.grey),
-        ("SPAN", (0, 0), (2, 0)),  # Title row spans columns 0-2
-        ("SPAN", (0, 3), (2, 3)),  # Items row spans columns 0-2
-
-        ("ALIGN", (0, 0), (2, 0), "CENTER"),
-        ("FONTNAME", (0, 0), (2, 0), "Helvetica-Bold"),
-        ("FONTSIZE", (0, 0), (2, 0), 16),
-        ("BOTTOMPADDING", (0, 0), (2, 0), 12),
-
-        ("ALIGN", (0, 1), (2, 1), "CENTER"),
-        ("FONTNAME", (0, 1), (2, 1), "Helvetica-Bold"),
-        ("FONTSIZE", (0, 1), (2, 1), 10),
-        ("BACKGROUND", (0, 1), (2, 1), colors.lightgrey),
-        ("BOTTOMPADDING", (0, 1), (2, 1), 6),
-        ("TOPPADDING", (0, 1), (2, 1), 6),
-
-        ("VALIGN", (0, 2), (2, 2), "TOP"),
-        ("FONTNAME", (0, 2), (2, 2), "Helvetica"),
-        ("FONTSIZE", (0, 2), (2, 2), 10),
-        ("LEFTPADDING", (0, 2), (2, 2), 6),
-        ("RIGHTPADDING", (0, 2), (2, 2), 6),
-
-        ("VALIGN", (0, 3), (2, 3), "TOP"),
-    ])
-    parent_table.setStyle(parent_table_style)
+    parent_table.setStyle(PACKING_SLIP_TABLE_STYLE)
     elements.append(parent_table)
 
     doc.build(elements)
@@ -442,26 +515,27 @@ def generate_invoice_pdf(order, invoice):
 def generate_invoice_pdf(order, invoice):
     """
     Generates a PDF invoice on the fly and returns the PDF data as bytes.
+    The output only depends on the order, the invoice and its issued_at, so
+    rendering the same invoice twice gives identical bytes.
     """
-    # Initialize a BytesIO buffer and create a ReportLab canvas using it
+    # Initialize a BytesIO buffer and create a ReportLab canvas using it.
+    # invariant=1 drops the creation timestamp and random document id.
     buffer = BytesIO()
-    pdf = canvas.Canvas(buffer, pagesize=letter)
+    pdf = canvas.Canvas(buffer, pagesize=letter, invariant=1)
     width, height = letter
 
-    # Example logo drawing (adjust path as necessary)
-    image_path = os.path.join("app", "static", "CFLogo.png")
-    try:
+    # Logo (decoded and scaled once per process)
+    logo = _logo_image()
+    if logo is not None:
         pdf.drawImage(
-            image_path,
+            logo,
             50,
             height - 100,
-            width=100,
-            height=50,
+            width=LOGO_DRAW_WIDTH,
+            height=LOGO_DRAW_HEIGHT,
             preserveAspectRatio=True,
             mask='auto'
         )
-    except Exception as e:
-        print(f"Logo drawImage error: {e}")
 
     # Set up fonts and draw header information
     pdf.setFont("Helvetica", 8)
@@ -469,7 +543,7 @@ def generate_invoice_pdf(order, invoice):
     pdf.drawRightString(width - 50, height - 95, "01202 364824  https://classfundraising.co.uk/  Email@Emailhere.com")
 
     invoice_id_str = str(invoice.id)
-    invoice_date = datetime.utcnow().strftime('%m/%d/%Y')
+    invoice_date = (invoice.issued_at or datetime.utcnow()).strftime('%m/%d/%Y')
     due_date = "Due date logic here"
     total_str = f"${invoice.amount:.2f}" if invoice.amount else "$0.00"
 
@@ -501,15 +575,7 @@ def generate_invoice_pdf(order, invoice):
         ["1", "Art Pack", f"{order.art_packs}", "$100.00", "5%", f"${order.art_packs * 100 * 1.05:.2f}"],
     ]
     table = Table(data, colWidths=[15, 185, 50, 70, 60, 70])
-    style = TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-    ])
-    table.setStyle(style)
+    table.setStyle(INVOICE_ITEMS_TABLE_STYLE)
     table.wrapOn(pdf, width, height)
     table.drawOn(pdf, 50, height - 400)
 
@@ -522,16 +588,7 @@ def generate_invoice_pdf(order, invoice):
         ["Amount Due", total_str],
     ]
     totals_table = Table(totals_data, colWidths=[100, 50])
-    totals_style = TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 8),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-        ('LINEBELOW', (0, 2), (-1, -4), 0.5, colors.grey),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-        ('TOPPADDING', (0, 0), (-1, -1), 5),
-    ])
-    totals_table.setStyle(totals_style)
+    totals_table.setStyle(INVOICE_TOTALS_TABLE_STYLE)
     totals_table.wrapOn(pdf, width, height)
     totals_table.drawOn(pdf, 410, height - 535)
 
@@ -609,4 +666,13 @@ def create_final_package_checklist_pdf(order):
 
     pdf_data = buffer.getvalue()
     buffer.close()
-    return pdf_data
\ No newline at end of file
+    return pdf_data
+
+# Document type -> generator, used by print runs and pre-rendering.
+# Each generator only reads the fields listed in PDF_DOCUMENT_FIELDS.
+PDF_DOCUMENT_RENDERERS = {
+    "packing_slip": create_invoice_pdf,
+    "next_steps": create_next_steps_pdf,
+    "checklist": create_checklist_pdf,
+    "final_package_checklist": create_final_package_checklist_pdf,
+}
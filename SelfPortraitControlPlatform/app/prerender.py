@@ -0,0 +1,136 @@
+# app/prerender.py
+
+"""
+Background pre-rendering of order PDFs into pdf_cache.
+
+When an order reaches a stage, the documents staff will download next are
+rendered on a small thread pool straight after the commit, so the download
+itself is a cache hit. The request thread only takes a snapshot of the order
+fields; no ORM objects or sessions cross into the workers.
+
+This is purely an optimisation: if the queue is full or a render fails, the
+download route still renders synchronously on a miss.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from SelfPortraitControlPlatform.app.pdf_cache import pdf_cache
+from SelfPortraitControlPlatform.app.pdf_utils import PDF_DOCUMENT_RENDERERS
+from SelfPortraitControlPlatform.app.print_runs import snapshot_order
+
+PRERENDER_WORKERS = 2
+# Jobs waiting beyond this are dropped (they'd be rendered on download anyway)
+PRERENDER_MAX_QUEUE = 500
+
+# Documents needed at the next step, by the status an order has just moved to
+PRERENDER_ON_STATUS = {
+    'Kit Prepared': ('packing_slip', 'checklist', 'next_steps'),
+}
+# Once quantities are confirmed the final package checklist can be printed
+PRERENDER_ON_QUANTITIES = ('final_package_checklist',)
+
+
+class Prerenderer:
+    def __init__(self, max_workers=PRERENDER_WORKERS, max_queue=PRERENDER_MAX_QUEUE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.enabled = True
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = set()  # cache keys queued or rendering
+        self.queued = 0
+        self.in_flight = 0
+        self.submitted = 0
+        self.rendered = 0
+        self.already_cached = 0
+        self.dropped = 0
+        self.failed = 0
+        self.render_seconds_total = 0.0
+        self.render_seconds_max = 0.0
+        self.last_error = None
+
+    def init_app(self, app):
+        self.enabled = app.config.get('PRERENDER_ENABLED', self.enabled)
+        self.max_workers = app.config.get('PRERENDER_WORKERS', self.max_workers)
+        self.max_queue = app.config.get('PRERENDER_MAX_QUEUE', self.max_queue)
+
+    def _get_executor(self):
+        # Caller holds the lock
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix='pdf-prerender')
+        return self._executor
+
+    def submit(self, order, doc_types):
+        """
+        Queues the given documents for the order. Call after db.session.commit()
+        so the snapshot reflects committed data. Returns the number queued.
+        """
+        if not self.enabled or not doc_types:
+            return 0
+        fields = snapshot_order(order, doc_types)
+        queued = 0
+        for doc_type in doc_types:
+            key = pdf_cache.key(doc_type, SimpleNamespace(**fields))
+            with self._lock:
+                if key in self._pending:
+                    continue
+                if self.queued >= self.max_queue:
+                    self.dropped += 1
+                    continue
+                self._pending.add(key)
+                self.queued += 1
+                self.submitted += 1
+                self._get_executor().submit(self._render, doc_type, key, fields)
+            queued += 1
+        return queued
+
+    def _render(self, doc_type, key, fields):
+        with self._lock:
+            self.queued -= 1
+            self.in_flight += 1
+        try:
+            if pdf_cache.contains(key):
+                with self._lock:
+                    self.already_cached += 1
+                return
+            started = time.perf_counter()
+            data = PDF_DOCUMENT_RENDERERS[doc_type](SimpleNamespace(**fields))
+            elapsed = time.perf_counter() - started
+            pdf_cache.put(key, data)
+            with self._lock:
+                self.rendered += 1
+                self.render_seconds_total += elapsed
+                self.render_seconds_max = max(self.render_seconds_max, elapsed)
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+                self.last_error = f"{doc_type} for order {fields.get('id')}: {e}"
+            print(f"[PRERENDER] {self.last_error}")
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self._pending.discard(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "workers": self.max_workers,
+                "queue_depth": self.queued,
+                "in_flight": self.in_flight,
+                "submitted": self.submitted,
+                "rendered": self.rendered,
+                "already_cached": self.already_cached,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "render_ms_avg": round(self.render_seconds_total / self.rendered * 1000, 2) if self.rendered else None,
+                "render_ms_max": round(self.render_seconds_max * 1000, 2),
+                "last_error": self.last_error,
+            }
+
+
+prerenderer = Prerenderer()
@@ -0,0 +1,190 @@
+# app/print_runs.py
+
+"""
+Batch PDF rendering for the warehouse's morning print run.
+
+ReportLab rendering is pure-Python CPU work, so documents are rendered on a
+ProcessPoolExecutor rather than threads: one pool per web process, started
+with forkserver (or spawn) and sized by PRINT_RUN_WORKERS. Workers get a plain
+dict snapshot of each order (only the fields the generators read) instead of
+ORM objects, and already-cached PDFs are not re-rendered at all.
+"""
+
+import io
+import multiprocessing
+import os
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+
+from reportlab.pdfgen import canvas
+
+from SelfPortraitControlPlatform.app.pdf_cache import pdf_cache
+from SelfPortraitControlPlatform.app.pdf_utils import PDF_DOCUMENT_FIELDS, PDF_DOCUMENT_RENDERERS
+
+PRINT_RUN_MAX_DOCUMENTS = 2000
+# Size of the shared render pool; None means one process per CPU
+PRINT_RUN_WORKERS = None
+# Never "fork": it would copy the web process's threads' locks (outbox
+# dispatcher, janitor, SQLAlchemy pool) into every worker mid-use
+PRINT_RUN_START_METHODS = ('forkserver', 'spawn')
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def _mp_context():
+    available = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context(next(m for m in PRINT_RUN_START_METHODS if m in available))
+
+
+class PrintRunPool:
+    """
+    Process pool shared across print runs, so worker start-up (and importing
+    ReportLab) is paid once rather than per request. It is created on first
+    use with PRINT_RUN_WORKERS processes and never resized; a print run asking
+    for fewer workers just keeps fewer chunks in flight.
+    """
+
+    def __init__(self, max_workers=PRINT_RUN_WORKERS):
+        self.max_workers = max_workers or default_workers()
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_workers = app.config.get('PRINT_RUN_WORKERS') or self.max_workers
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=_mp_context())
+            return self._executor
+
+    def workers_for(self, requested):
+        """
+        Workers a print run may use: what it asked for, capped at the pool size.
+        """
+        return min(requested or self.max_workers, self.max_workers)
+
+    def render(self, jobs, max_workers=None):
+        """
+        Renders [(doc_type, order_snapshot), ...] on at most max_workers of the
+        pool's processes and yields the PDF bytes in the same order.
+        """
+        workers = self.workers_for(max_workers)
+        executor = self._get_executor()
+        # Hand each worker a few documents at a time to cut IPC round trips
+        chunksize = max(1, len(jobs) // (workers * 4))
+        in_flight = deque()
+        for start in range(0, len(jobs), chunksize):
+            if len(in_flight) >= workers:
+                yield from in_flight.popleft().result()
+            in_flight.append(executor.submit(_render_chunk, jobs[start:start + chunksize]))
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+
+def snapshot_order(order, doc_types):
+    """
+    Picklable copy of the order fields the given document types read.
+    """
+    fields = set()
+    for doc_type in doc_types:
+        fields.update(PDF_DOCUMENT_FIELDS[doc_type])
+    fields.add("id")
+    return {f: getattr(order, f) for f in fields}
+
+
+def _render_chunk(jobs):
+    # Runs in a worker process
+    return [PDF_DOCUMENT_RENDERERS[doc_type](SimpleNamespace(**fields)) for doc_type, fields in jobs]
+
+
+def render_documents(jobs, max_workers=None):
+    """
+    Renders [(doc_type, order_snapshot), ...] and yields the PDF bytes in the
+    same order. Cache hits are served directly; misses are rendered in parallel
+    and stored in the cache.
+    """
+    keys = [pdf_cache.key(doc_type, SimpleNamespace(**fields)) for doc_type, fields in jobs]
+    cached = [pdf_cache.get(key) for key in keys]
+    misses = [i for i, data in enumerate(cached) if data is None]
+
+    rendered = iter(())
+    if misses:
+        rendered = print_run_pool.render([jobs[i] for i in misses], max_workers)
+
+    miss_set = set(misses)
+    for i, data in enumerate(cached):
+        if i in miss_set:
+            data = next(rendered)
+            pdf_cache.put(keys[i], data)
+        yield data
+
+
+def merge_pdfs(pdfs):
+    """
+    Concatenates PDFs into one document, stamping "Page n of N" on every page.
+    """
+    from pypdf import PdfReader, PdfWriter
+
+    writer = PdfWriter()
+    for data in pdfs:
+        for page in PdfReader(io.BytesIO(data)).pages:
+            writer.add_page(page)
+
+    total = len(writer.pages)
+    for number, page in enumerate(writer.pages, start=1):
+        width = float(page.mediabox.width)
+        height = float(page.mediabox.height)
+        overlay_buffer = io.BytesIO()
+        overlay = canvas.Canvas(overlay_buffer, pagesize=(width, height))
+        overlay.setFont("Helvetica", 8)
+        overlay.drawRightString(width - 20, 12, f"Page {number} of {total}")
+        overlay.save()
+        page.merge_page(PdfReader(overlay_buffer).pages[0])
+
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """
+    Write-only, unseekable sink for zipfile; chunks are drained after each file.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def zip_stream(named_pdfs):
+    """
+    Streams a ZIP of (filename, pdf_bytes) pairs, one file at a time.
+    PDFs are already compressed, so entries are stored rather than deflated.
+    """
+    sink = _ChunkBuffer()
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for filename, data in named_pdfs:
+            archive.writestr(filename, data)
+            yield sink.drain()
+    yield sink.drain()
+
+
+print_run_pool = PrintRunPool()
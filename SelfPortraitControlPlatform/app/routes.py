@@ -1,78 +1,794 @@
 import os
-from flask import Blueprint, jsonify, request, send_from_directory, make_response
-from SelfPortraitControlPlatform.app.models import User, Order, Kit, Artwork, Invoice, Task
+import base64
+import binascii
+import csv
+import io
+import tempfile
+import hashlib
+from datetime import timezone
+from functools import wraps
+from collections import defaultdict
+from flask import Blueprint, Response, current_app, jsonify, request, send_file, send_from_directory, make_response, stream_with_context
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from SelfPortraitControlPlatform.app.models import (
+    User, Order, Kit, Artwork, ArtworkBlob, ArtworkFile, ArtworkUpload, Invoice, Task, Tombstone,
+)
 from SelfPortraitControlPlatform.app import db
-from datetime import datetime
-from werkzeug.utils import secure_filename
-import shutil
+from SelfPortraitControlPlatform.app.events import broker, publish_event
+from SelfPortraitControlPlatform.app.cache import order_cache
+from SelfPortraitControlPlatform.app.idempotency import idempotent
+from SelfPortraitControlPlatform.app.outbox import enqueue, outbox_dispatcher
+from SelfPortraitControlPlatform.app.pdf_cache import pdf_cache
+from SelfPortraitControlPlatform.app.invoice_store import invoice_store
+from SelfPortraitControlPlatform.app import artwork_uploads
+from SelfPortraitControlPlatform.app.blob_store import (
+    BLOB_ENTRY_PREFIX, BlobTooLarge, blob_entry, blob_store, parse_blob_entry
+)
+from SelfPortraitControlPlatform.app.derivatives import (
+    DERIVATIVE_SIZES, derivative_path, derivative_worker, image_dimensions, remove_derivatives,
+    render_derivatives,
+)
+from SelfPortraitControlPlatform.app.janitor import artwork_janitor
+from SelfPortraitControlPlatform.app.react_build import react_build
+from SelfPortraitControlPlatform.app.prerender import PRERENDER_ON_QUANTITIES, PRERENDER_ON_STATUS, prerenderer
+from datetime import datetime, timedelta
+from werkzeug.security import safe_join
+from werkzeug.utils import secure_filename, send_file as werkzeug_send_file
+from urllib.parse import quote as url_quote
 
 # Configure Blueprint
 main_bp = Blueprint('main', __name__)
 
 
+##############################################################################
+# Conditional GET (ETag / Last-Modified) for polled collections
+##############################################################################
+
+def _collection_version(models):
+    """
+    Cheap change version for a set of tables: (count, max(updated_at)) per model,
+    fetched in a single round trip without loading any rows. updated_at keeps
+    microseconds (PreciseDateTime), so a change in the same second still moves it.
+    """
+    columns = []
+    for model in models:
+        columns.append(select(func.count()).select_from(model).scalar_subquery())
+        columns.append(select(func.max(model.updated_at)).scalar_subquery())
+    return tuple(db.session.execute(select(*columns)).one())
+
+
+def conditional_collection(*models):
+    """
+    Decorator for collection GETs the front end polls.
+    Derives a strong ETag from the tables' change version plus the request's
+    query string, and answers If-None-Match with 304 before the view runs,
+    so unchanged polls never load or serialize rows.
+    Last-Modified is sent for information only: max(updated_at) doesn't move
+    when a row is deleted, so If-Modified-Since alone never gets a 304.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            version = _collection_version(models)
+            etag = hashlib.sha1(f"{request.full_path}|{version!r}".encode()).hexdigest()
+            timestamps = [v for v in version[1::2] if v is not None]
+            last_modified = max(timestamps).replace(microsecond=0, tzinfo=timezone.utc) if timestamps else None
+
+            # The ETag covers row counts as well as timestamps, so it also
+            # changes on deletes
+            if request.if_none_match and request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+# Page size for the keyset-paginated order listing
+ORDERS_DEFAULT_PAGE_SIZE = 50
+ORDERS_MAX_PAGE_SIZE = 200
+
+
+# Fields that can be requested via ?fields= on the order APIs.
+# Nested artwork/invoice fields are requested as e.g. "invoice.status".
+ORDER_SCALAR_FIELDS = (
+    "id", "reason", "product", "free_sample", "first_name", "last_name",
+    "school_name", "position", "art_packs", "referral", "email", "phone",
+    "address_line1", "address_line2", "city", "county", "postcode",
+    "delivery_instructions", "agree_to_promotions",
+    "status", "created_at", "updated_at", "kit_dispatched_at", "kit_received_at",
+    "quantities", "trello_card_url",
+)
+ARTWORK_FIELDS = ("id", "design_file_path", "status")
+INVOICE_FIELDS = ("id", "status", "amount")  # "Ungenerated", "Generated", "Invoice Sent", "Invoice Paid"
+ORDER_NESTED_FIELDS = {"artworks": ARTWORK_FIELDS, "invoice": INVOICE_FIELDS}
+
+
+def _parse_fields_arg(value):
+    """
+    Parses ?fields=id,school_name,status,invoice.status into a projection:
+        {"id": None, "school_name": None, "status": None, "invoice": ("status",)}
+    A bare "artworks" or "invoice" selects all of that child's fields.
+    Returns None (meaning every field) when value is empty.
+    Raises ValueError on unknown field names.
+    """
+    if not value:
+        return None
+
+    projection = {}
+    for raw in value.split(','):
+        name = raw.strip()
+        if not name:
+            continue
+        parent, _, child = name.partition('.')
+        if parent in ORDER_NESTED_FIELDS:
+            allowed = ORDER_NESTED_FIELDS[parent]
+            if not child:
+                projection[parent] = allowed
+            elif child not in allowed:
+                raise ValueError(f"Unknown field: {name}")
+            elif projection.get(parent) != allowed:
+                projection[parent] = tuple(projection.get(parent) or ()) + (child,)
+        elif parent in ORDER_SCALAR_FIELDS and not child:
+            projection[parent] = None
+        else:
+            raise ValueError(f"Unknown field: {name}")
+    return projection
+
+
+def _order_field_value(o, name):
+    value = getattr(o, name)
+    if name in ("created_at", "updated_at"):
+        return value.isoformat() if value else None
+    if name == "quantities":
+        return json.loads(value) if value and value != "Unconfirmed" else "Unconfirmed"
+    return value
+
+
+def _serialize_order(o, projection=None):
+    """
+    Builds the JSON dict for a single order, including its artworks and invoice.
+    If a projection from _parse_fields_arg is given, only those keys are emitted.
+    """
+    data = {}
+    for name in ORDER_SCALAR_FIELDS:
+        if projection is None or name in projection:
+            data[name] = _order_field_value(o, name)
+
+    # Attach the artworks array
+    if projection is None or "artworks" in projection:
+        artwork_fields = projection["artworks"] if projection else ARTWORK_FIELDS
+        data["artworks"] = [
+            {f: getattr(a, f) for f in artwork_fields} for a in o.artworks
+        ]
+
+    # Attach the invoice object
+    if projection is None or "invoice" in projection:
+        invoice_fields = projection["invoice"] if projection else INVOICE_FIELDS
+        data["invoice"] = {f: getattr(o.invoice, f) for f in invoice_fields} if o.invoice else {}
+
+    return data
+
+
+def _with_order_children(query, projection=None):
+    """
+    Eager-loads the relationships _serialize_order walks, so serializing N orders
+    costs a fixed number of queries (orders + artworks + invoices) instead of 1 + 2N.
+    With a projection, only the requested columns and children are SELECTed
+    (id and created_at are always loaded, as pagination needs them).
+    """
+    if projection is None:
+        return query.options(
+            selectinload(Order.artworks).selectinload(Artwork.files),
+            selectinload(Order.invoice),
+        )
+
+    order_columns = [getattr(Order, n) for n in ORDER_SCALAR_FIELDS if n in projection]
+    options = [load_only(Order.id, Order.created_at, *order_columns)]
+    if "artworks" in projection:
+        # design_file_path is built from the artwork_files rows, not a column
+        artwork_fields = [f for f in projection["artworks"] if f != "design_file_path"]
+        artworks = selectinload(Order.artworks)
+        if len(artwork_fields) < len(projection["artworks"]):
+            options.append(artworks.load_only(Artwork.order_id, *[getattr(Artwork, f) for f in artwork_fields])
+                           .selectinload(Artwork.files))
+        else:
+            options.append(artworks.load_only(*[getattr(Artwork, f) for f in artwork_fields]))
+    if "invoice" in projection:
+        options.append(selectinload(Order.invoice).load_only(
+            *[getattr(Invoice, f) for f in projection["invoice"]]
+        ))
+    return query.options(*options)
+
+
+def _load_order_children(orders):
+    """
+    Loads artworks (with their files) and invoice for the given orders in three queries total.
+    """
+    ids = [o.id for o in orders]
+    artworks = defaultdict(list)
+    for a in Artwork.query.filter(Artwork.order_id.in_(ids)).order_by(Artwork.id):
+        artworks[a.order_id].append(a)
+    files = defaultdict(list)
+    for f in ArtworkFile.query.filter(ArtworkFile.order_id.in_(ids)).order_by(ArtworkFile.id):
+        files[f.order_id].append(f)
+    invoices = {i.order_id: i for i in Invoice.query.filter(Invoice.order_id.in_(ids))}
+    for o in orders:
+        for a in artworks[o.id]:
+            set_committed_value(a, 'files', files[o.id])
+        set_committed_value(o, 'artworks', artworks[o.id])
+        set_committed_value(o, 'invoice', invoices.get(o.id))
+
+
+def _order_versions(orders):
+    """
+    Fragment version per order id: the latest updated_at of the order, its
+    artworks and its invoice, read in one query. Keying the cache on what is
+    in the database (rather than relying on invalidate(), which only reaches
+    this process) means a change made through another worker is never served
+    stale; the columns keep microseconds, so that holds within the same
+    second too. Read before the children are loaded, so a fragment can only ever
+    be stored under a version older than its data, never newer.
+    """
+    artworks_updated = (select(func.max(Artwork.updated_at))
+                        .where(Artwork.order_id == Order.id).scalar_subquery())
+    invoice_updated = (select(func.max(Invoice.updated_at))
+                       .where(Invoice.order_id == Order.id).scalar_subquery())
+    rows = db.session.execute(
+        select(Order.id, Order.updated_at, artworks_updated, invoice_updated)
+        .where(Order.id.in_([o.id for o in orders]))
+    )
+    return {order_id: tuple(versions) for order_id, *versions in rows}
+
+
+def _order_fragments(orders):
+    """
+    Full-shape serialized JSON for each order, served from order_cache when the
+    cached version (see _order_versions) still matches. Children are only
+    loaded for the cache misses.
+    """
+    if not orders:
+        return []
+    versions = _order_versions(orders)
+    fragments = {}
+    misses = []
+    for o in orders:
+        fragment = order_cache.get(o.id, versions.get(o.id))
+        if fragment is None:
+            misses.append(o)
+        else:
+            fragments[o.id] = fragment
+
+    if misses:
+        _load_order_children(misses)
+        for o in misses:
+            fragment = current_app.json.dumps(_serialize_order(o))
+            order_cache.set(o.id, versions.get(o.id), fragment)
+            fragments[o.id] = fragment
+
+    return [fragments[o.id] for o in orders]
+
+
+def _invalidate_order(order_id):
+    """
+    Called by every route that changes an order or its artworks/invoice,
+    after the commit. Frees the entry early in this process; correctness
+    doesn't depend on it (the version check catches changes from any worker).
+    """
+    order_cache.invalidate(order_id)
+
+
+def _parse_bool_arg(value):
+    """
+    Parses a query-string boolean ("true"/"false", "1"/"0", "yes"/"no").
+    Raises ValueError for anything else.
+    """
+    lowered = value.strip().lower()
+    if lowered in ('true', '1', 'yes'):
+        return True
+    if lowered in ('false', '0', 'no'):
+        return False
+    raise ValueError(f"Invalid boolean value: {value}")
+
+
+def _parse_date_arg(value, end_of_range=False):
+    """
+    Parses a query-string date or datetime (ISO 8601).
+    A bare date (YYYY-MM-DD) used as the end of a range covers that whole day,
+    so the returned bound is the start of the following day.
+    """
+    parsed = datetime.fromisoformat(value.strip())
+    if end_of_range and len(value.strip()) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def _encode_orders_cursor(order):
+    """
+    Opaque cursor pointing just after `order` in (created_at, id) order.
+    """
+    raw = f"{order.created_at.isoformat()}|{order.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_orders_cursor(cursor):
+    """
+    Reverses _encode_orders_cursor. Raises ValueError if the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at_str, order_id_str = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at_str), int(order_id_str)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+
+def _filter_orders_query(query, args):
+    """
+    Applies the optional server-side filters from the query string:
+      status         exact match, comma-separated for several statuses
+      free_sample    true/false
+      product        exact match
+      school_name    prefix match
+      created_from   created_at >= this date/datetime
+      created_to     created_at <= this date (whole day) or < this datetime
+    Raises ValueError on malformed values.
+    """
+    status = args.get('status')
+    if status:
+        statuses = [s.strip() for s in status.split(',') if s.strip()]
+        query = query.filter(Order.status.in_(statuses))
+
+    free_sample = args.get('free_sample')
+    if free_sample:
+        query = query.filter(Order.free_sample == _parse_bool_arg(free_sample))
+
+    product = args.get('product')
+    if product:
+        query = query.filter(Order.product == product)
+
+    school_name = args.get('school_name')
+    if school_name:
+        query = query.filter(Order.school_name.startswith(school_name, autoescape=True))
+
+    created_from = args.get('created_from')
+    if created_from:
+        query = query.filter(Order.created_at >= _parse_date_arg(created_from))
+
+    created_to = args.get('created_to')
+    if created_to:
+        query = query.filter(Order.created_at < _parse_date_arg(created_to, end_of_range=True))
+
+    return query
+
+
 @main_bp.route('/api/orders', methods=['GET'])
+@conditional_collection(Order, Artwork, Invoice)
 def get_all_orders():
-    orders = Order.query.all()
+    """
+    Lists orders newest first, keyset-paginated on (created_at, id).
 
-    orders_list = []
-    for o in orders:
-        # Gather artworks
-        artworks_data = []
-        for a in o.artworks:
-            artworks_data.append({
-                "id": a.id,
-                "design_file_path": a.design_file_path,
-                "status": a.status
-            })
-
-        # Gather invoice
-        invoice_data = {}
-        if o.invoice:
-            invoice_data = {
-                "id": o.invoice.id,
-                "status": o.invoice.status,  # "Ungenerated", "Generated", "Invoice Sent", "Invoice Paid"
-                "amount": o.invoice.amount  # optional
-            }
-
-        orders_list.append({
-            "id": o.id,
-            "reason": o.reason,
-            "product": o.product,
-            "free_sample": o.free_sample,
-            "first_name": o.first_name,
-            "last_name": o.last_name,
-            "school_name": o.school_name,
-            "position": o.position,
-            "art_packs": o.art_packs,
-            "referral": o.referral,
-            "email": o.email,
-            "phone": o.phone,
-            "address_line1": o.address_line1,
-            "address_line2": o.address_line2,
-            "city": o.city,
-            "county": o.county,
-            "postcode": o.postcode,
-            "delivery_instructions": o.delivery_instructions,
-            "agree_to_promotions": o.agree_to_promotions,
-
-            "status": o.status,
-            "created_at": o.created_at.isoformat() if o.created_at else None,
-            "updated_at": o.updated_at.isoformat() if o.updated_at else None,
-            "kit_dispatched_at": o.kit_dispatched_at,
-            "kit_received_at": o.kit_received_at,
-            "quantities": json.loads(o.quantities) if o.quantities and o.quantities != "Unconfirmed" else "Unconfirmed",
-
-            # Attach the artworks array
-            "artworks": artworks_data,
-
-            # Attach the invoice object
-            "invoice": invoice_data
-        })
+    Query params:
+      limit   page size (default 50, max 200)
+      cursor  the next_cursor from the previous page
+      all     "true" returns the old unpaginated list (for old clients)
+      fields  comma-separated projection, e.g. id,school_name,status,invoice.status
+      plus the filters documented on _filter_orders_query.
+
+    Returns {"orders": [...], "next_cursor": "..." or null}.
+    """
+    try:
+        projection = _parse_fields_arg(request.args.get('fields'))
+        query = Order.query if projection is None else _with_order_children(Order.query, projection)
+        query = _filter_orders_query(query, request.args)
+        return_all = _parse_bool_arg(request.args.get('all', 'false'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Legacy shape: a bare list of every matching order
+    if return_all:
+        orders = query.all()
+        if projection is None:
+            return _json_fragments_response("[" + ",".join(_order_fragments(orders)) + "]")
+        return jsonify([_serialize_order(o, projection) for o in orders])
+
+    try:
+        limit = int(request.args.get('limit', ORDERS_DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    if limit < 1:
+        return jsonify({"error": "limit must be at least 1"}), 400
+    limit = min(limit, ORDERS_MAX_PAGE_SIZE)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            cursor_created_at, cursor_id = _decode_orders_cursor(cursor)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        query = query.filter(or_(
+            Order.created_at < cursor_created_at,
+            and_(Order.created_at == cursor_created_at, Order.id < cursor_id)
+        ))
+
+    # Fetch one extra row to find out whether there is another page
+    orders = (query
+              .filter(Order.created_at.isnot(None))
+              .order_by(Order.created_at.desc(), Order.id.desc())
+              .limit(limit + 1)
+              .all())
+    has_more = len(orders) > limit
+    orders = orders[:limit]
+    next_cursor = _encode_orders_cursor(orders[-1]) if has_more else None
+
+    if projection is None:
+        # Same key order as jsonify (sorted) would produce
+        return _json_fragments_response(
+            '{"next_cursor":%s,"orders":[%s]}'
+            % (current_app.json.dumps(next_cursor), ",".join(_order_fragments(orders)))
+        )
+
+    return jsonify({
+        "orders": [_serialize_order(o, projection) for o in orders],
+        "next_cursor": next_cursor
+    })
+
+
+def _json_fragments_response(body):
+    """
+    Wraps JSON assembled from cached fragments in a response, like jsonify does.
+    """
+    return current_app.response_class(body + "\n", mimetype=current_app.json.mimetype)
+
+
+@main_bp.route('/api/orders/<int:order_id>', methods=['GET'])
+def get_order(order_id):
+    """
+    Returns a single order in the same shape as the listing.
+    Supports the same ?fields= projection.
+    """
+    try:
+        projection = _parse_fields_arg(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if projection is None:
+        order = Order.query.get_or_404(order_id)
+        return _json_fragments_response(_order_fragments([order])[0])
+
+    order = _with_order_children(Order.query, projection).filter(Order.id == order_id).first_or_404()
+    return jsonify(_serialize_order(order, projection))
+
+
+@main_bp.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """
+    Hit / miss / eviction counters for the in-process caches,
+    plus queue depth and render times for background PDF pre-rendering,
+    and what the artwork janitor has deleted.
+    """
+    return jsonify({
+        "orders": order_cache.stats(),
+        "pdfs": pdf_cache.stats(),
+        "prerender": prerenderer.stats(),
+        "artwork_derivatives": derivative_worker.stats(),
+        "artwork_janitor": artwork_janitor.stats()
+    })
+
+# Rows fetched per round trip when streaming the export
+EXPORT_BATCH_SIZE = 500
+# One flat row per order: the order's own columns plus its invoice
+EXPORT_COLUMNS = ORDER_SCALAR_FIELDS + ("invoice_id", "invoice_status", "invoice_amount")
+
+
+def _export_query(args):
+    """
+    Flat (order + invoice) rows for the export, streamed from a server-side
+    cursor in batches of EXPORT_BATCH_SIZE. Columns are selected directly so no
+    ORM objects pile up in the session. Raises ValueError on bad filters.
+    """
+    return (_filter_orders_query(Order.query, args)
+            .outerjoin(Invoice, Invoice.order_id == Order.id)
+            .with_entities(*[getattr(Order, n) for n in ORDER_SCALAR_FIELDS],
+                           Invoice.id, Invoice.status, Invoice.amount)
+            .order_by(Order.id)
+            .yield_per(EXPORT_BATCH_SIZE))
+
+
+def _export_values(row):
+    return [v.isoformat() if isinstance(v, datetime) else v for v in row]
+
+
+def _export_ndjson(query):
+    quantities_index = EXPORT_COLUMNS.index("quantities")
+    for row in query:
+        values = _export_values(row)
+        q = values[quantities_index]
+        values[quantities_index] = json.loads(q) if q and q != "Unconfirmed" else "Unconfirmed"
+        yield json.dumps(dict(zip(EXPORT_COLUMNS, values))) + "\n"
+
+
+def _export_csv(query):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    writer.writerow(EXPORT_COLUMNS)
+    yield flush()
+    for row in query:
+        writer.writerow(_export_values(row))
+        yield flush()
+
+
+def _export_xlsx(query):
+    from openpyxl import Workbook
+
+    # Write-only mode streams rows to a temp file instead of holding the sheet in memory
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Orders")
+    ws.append(EXPORT_COLUMNS)
+    for row in query:
+        ws.append(_export_values(row))
+
+    with tempfile.TemporaryFile() as tmp:
+        wb.save(tmp)
+        tmp.seek(0)
+        while True:
+            chunk = tmp.read(64 * 1024)
+            if not chunk:
+                break
+            yield chunk
+
+
+EXPORT_FORMATS = {
+    "ndjson": (_export_ndjson, "application/x-ndjson", "ndjson"),
+    "csv": (_export_csv, "text/csv", "csv"),
+    "xlsx": (_export_xlsx, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+}
+
+
+@main_bp.route('/api/orders/export', methods=['GET'])
+def export_orders():
+    """
+    Streams every order (one row each, with its invoice) for back-office reporting.
+    ?format=ndjson|csv|xlsx (default csv); accepts the same filters as the listing.
+    """
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    writer, mimetype, extension = EXPORT_FORMATS[export_format]
+
+    try:
+        query = _export_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    response = Response(stream_with_context(writer(query)), mimetype=mimetype)
+    response.headers.set('Content-Disposition', 'attachment', filename=f'orders_export.{extension}')
+    return response
+
+
+# How far each sync token is set back. Rows get updated_at when they are
+# flushed, which can be well before the commit makes them visible (the bulk
+# import flushes in batches and commits once), so the next sync re-reads this
+# window rather than skipping rows committed late.
+SYNC_TOKEN_OVERLAP = timedelta(minutes=5)
+
+
+def _encode_sync_token(moment):
+    return base64.urlsafe_b64encode(moment.isoformat().encode()).decode()
+
+
+def _decode_sync_token(token):
+    """
+    Reverses _encode_sync_token. Raises ValueError if the token is malformed.
+    """
+    try:
+        return datetime.fromisoformat(base64.urlsafe_b64decode(token.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid sync token")
+
+
+@main_bp.route('/api/orders/changes', methods=['GET'])
+def get_order_changes():
+    """
+    Delta sync: returns the orders, kits, artworks and invoices created or
+    updated since ?since=<token>, plus tombstones for anything deleted, and a
+    new token to pass next time. Without ?since the full current state is
+    returned, which is how a client seeds its cache.
+
+    Each token is set back by SYNC_TOKEN_OVERLAP, so rows changed shortly
+    before the previous sync are sent again; clients should upsert by id.
+    """
+    since = None
+    if request.args.get('since'):
+        try:
+            since = _decode_sync_token(request.args['since'])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    # Taken before querying, less the overlap, so nothing committed meanwhile
+    # (or flushed earlier but committed later) is missed next time.
+    # Truncated to whole seconds (inclusive, so nothing is lost) to keep tokens short.
+    next_token = _encode_sync_token((datetime.utcnow() - SYNC_TOKEN_OVERLAP).replace(microsecond=0))
+
+    def changed(model, *options):
+        query = model.query.options(*options)
+        if since is not None:
+            query = query.filter(model.updated_at >= since)
+        return query.order_by(model.id).all()
+
+    order_fields = {name: None for name in ORDER_SCALAR_FIELDS}
+    orders_data = [_serialize_order(o, order_fields) for o in changed(Order)]
+    kits_data = [{
+        "id": k.id,
+        "order_id": k.order_id,
+        "dispatch_date": k.dispatch_date.isoformat() if k.dispatch_date else None,
+        "tracking_number": k.tracking_number
+    } for k in changed(Kit)]
+    artworks_data = [
+        dict({f: getattr(a, f) for f in ARTWORK_FIELDS}, order_id=a.order_id) for a in changed(Artwork, selectinload(Artwork.files))
+    ]
+    invoices_data = [
+        dict({f: getattr(i, f) for f in INVOICE_FIELDS}, order_id=i.order_id) for i in changed(Invoice)
+    ]
+
+    deleted_data = []
+    if since is not None:
+        tombstones = (Tombstone.query
+                      .filter(Tombstone.deleted_at >= since)
+                      .order_by(Tombstone.id)
+                      .all())
+        deleted_data = [{
+            "type": t.record_type,
+            "id": t.record_id,
+            "order_id": t.order_id
+        } for t in tombstones]
+
+    return jsonify({
+        "orders": orders_data,
+        "kits": kits_data,
+        "artworks": artworks_data,
+        "invoices": invoices_data,
+        "deleted": deleted_data,
+        "next_token": next_token
+    })
+
+
+# Order form JSON key -> free-text Order column
+ORDER_PAYLOAD_TEXT_FIELDS = {
+    'reason': 'reason',
+    'product': 'product',
+    'firstName': 'first_name',
+    'surname': 'last_name',
+    'organisation': 'school_name',
+    'position': 'position',
+    'referral': 'referral',
+    'email': 'email',
+    'phone': 'phone',
+    'addressLine1': 'address_line1',
+    'addressLine2': 'address_line2',
+    'city': 'city',
+    'county': 'county',
+    'postcode': 'postcode',
+    'deliveryInstructions': 'delivery_instructions',
+}
+
+
+def _order_text_value(data, key, column):
+    """
+    A free-text field from the payload as a string (or None), checked against
+    the column's length. Numbers are accepted and stringified (e.g. a phone
+    number sent as a JSON number). Raises ValueError for anything else, so a
+    bad row is reported rather than failing the whole request at flush time.
+    """
+    value = data.get(key)
+    if value is None or value == "":
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = str(value)
+    if not isinstance(value, str):
+        raise ValueError(f"{key} must be a string")
+    max_length = Order.__table__.columns[column].type.length
+    if max_length is not None and len(value) > max_length:
+        raise ValueError(f"{key} is longer than {max_length} characters")
+    return value
+
+
+def _order_fields_from_payload(data):
+    """
+    Maps the order form's JSON keys (firstName, organisation, artPacks, ...) onto
+    Order column values, generating the school portal credentials.
+    Also accepts CSV rows, where every value is a string.
+    Raises ValueError on values that can't be converted, or are too long for their column.
+    """
+    import random
+
+    if not isinstance(data, dict):
+        raise ValueError("Each order must be an object")
+
+    def as_bool(key, default=False):
+        value = data.get(key)
+        if value is None or value == "":
+            return default
+        if isinstance(value, str):
+            return _parse_bool_arg(value)
+        if not isinstance(value, (bool, int)):
+            raise ValueError(f"{key} must be a boolean")
+        return bool(value)
+
+    text = {column: _order_text_value(data, key, column)
+            for key, column in ORDER_PAYLOAD_TEXT_FIELDS.items()}
+
+    first = (text['first_name'] or "").lower().replace(" ", "")
+    last = (text['last_name'] or "").lower().replace(" ", "")
+    portal_username = (first + last)[:Order.__table__.columns['portal_username'].type.length] \
+        if first or last else "user"
+
+    # Generate a 10-digit random password (digits 1..9)
+    portal_password = "".join(str(random.randint(1, 9)) for _ in range(10))
+
+    art_packs_value = data.get('artPacks')
+    try:
+        if isinstance(art_packs_value, (bool, dict, list)):
+            raise TypeError
+        art_packs = int(art_packs_value) if art_packs_value else 0
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid artPacks: {art_packs_value}")
+
+    return dict(
+        text,
+        free_sample=as_bool('freeSample', default=None),
+        art_packs=art_packs,
+        agree_to_promotions=as_bool('agreeToPromotions'),
+
+        status='Requested',
+
+        portal_username=portal_username,
+        portal_password=portal_password,
+    )
+
+
+def _order_child_rows(order_id):
+    """
+    Column values for the Kit, Artwork and Invoice rows every new order starts with.
+    """
+    kit = dict(
+        order_id=order_id,
+        dispatch_date=None,  # or datetime.utcnow(), etc.
+        tracking_number=None  # Fill in if you have a default
+    )
+    artwork = dict(
+        order_id=order_id,
+        status='Portraits Not Received From School Yet'  # defaults to "In Artwork"
+    )
+    invoice = dict(
+        order_id=order_id,
+        amount=0.0,  # or some default amount
+        status='Ungenerated'  # defaults to "Unpaid"
+    )
+    return kit, artwork, invoice
 
-    return jsonify(orders_list)
 
 # API endpoint: Create an order
 @main_bp.route('/api/orders', methods=['OPTIONS', 'POST'])
+@idempotent
 def create_order():
     # Preflight (OPTIONS) request
     if request.method == 'OPTIONS':
@@ -89,69 +805,22 @@ def create_order():
         if not data:
             return jsonify({"error": "No data provided"}), 400
 
-        import random
-
-        first = (data.get('firstName') or "").lower().replace(" ", "")
-        last = (data.get('surname') or "").lower().replace(" ", "")
-        portal_username = first + last if first or last else "user"
-
-        # Generate a 10-digit random password (digits 1..9)
-        portal_password = "".join(str(random.randint(1, 9)) for _ in range(10))
-
-        new_order = Order(
-            reason=data.get('reason'),
-            product=data.get('product'),
-            free_sample=data.get('freeSample'),
-            first_name=data.get('firstName'),
-            last_name=data.get('surname'),
-            school_name=data.get('organisation'),
-            position=data.get('position'),
-            art_packs=int(data.get('artPacks')) if data.get('artPacks') else 0,
-            referral=data.get('referral'),
-            email=data.get('email'),
-            phone=data.get('phone'),
-            address_line1=data.get('addressLine1'),
-            address_line2=data.get('addressLine2'),
-            city=data.get('city'),
-            county=data.get('county'),
-            postcode=data.get('postcode'),
-            delivery_instructions=data.get('deliveryInstructions'),
-            agree_to_promotions=data.get('agreeToPromotions', False),
-
-            status='Requested',
-
-            portal_username=portal_username,
-            portal_password=portal_password,
-
-        )
+        try:
+            new_order = Order(**_order_fields_from_payload(data))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         db.session.add(new_order)
-        db.session.commit()  # Now new_order has a valid .id
+        db.session.flush()  # Now new_order has a valid .id (no commit yet)
 
         # 2) Create child rows for Kit, Artwork, and Invoice
-        # You can customize these as you wish
-        kit = Kit(
-            order_id=new_order.id,
-            dispatch_date=None,  # or datetime.utcnow(), etc.
-            tracking_number=None  # Fill in if you have a default
-        )
-        db.session.add(kit)
-
-        artwork = Artwork(
-            order_id=new_order.id,
-            design_file_path=None,  # fill in if you have a default path
-            status='Portraits Not Received From School Yet'  # defaults to "In Artwork"
-        )
-        db.session.add(artwork)
-
-        invoice = Invoice(
-            order_id=new_order.id,
-            amount=0.0,  # or some default amount
-            status='Ungenerated'  # defaults to "Unpaid"
-        )
-        db.session.add(invoice)
+        kit_fields, artwork_fields, invoice_fields = _order_child_rows(new_order.id)
+        db.session.add(Kit(**kit_fields))
+        db.session.add(Artwork(**artwork_fields))
+        db.session.add(Invoice(**invoice_fields))
 
         # 3) Commit everything together
         db.session.commit()
+        publish_event("order_created", order_id=new_order.id, status=new_order.status)
 
         return jsonify({
             "message": "Order created",
@@ -159,7 +828,85 @@ def create_order():
         }), 201
 
 
+# Bulk import limits
+ORDER_BULK_MAX_ROWS = 5000
+ORDER_BULK_BATCH_SIZE = 500
+
+
+@main_bp.route('/api/orders/bulk', methods=['POST'])
+def bulk_create_orders():
+    """
+    Creates many orders in one transaction, e.g. when onboarding a school district.
+    Accepts either a JSON array of order objects (same keys as POST /api/orders)
+    or a multipart CSV upload in the 'file' field with those keys as the header row.
+
+    Rows that fail validation are reported and skipped; the rest are inserted in
+    batches, with Kit/Artwork/Invoice rows written via executemany, and committed once.
+    Returns {"created": n, "failed": n, "results": [{"row": i, ...}, ...]}.
+    """
+    if 'file' in request.files:
+        try:
+            text = request.files['file'].read().decode('utf-8-sig')
+        except UnicodeDecodeError:
+            return jsonify({"error": "CSV file must be UTF-8"}), 400
+        rows = list(csv.DictReader(io.StringIO(text)))
+    else:
+        rows = request.get_json(silent=True)
+        if not isinstance(rows, list):
+            return jsonify({"error": "Expected a JSON array of orders or a CSV 'file' upload"}), 400
+
+    if not rows:
+        return jsonify({"error": "No data provided"}), 400
+    if len(rows) > ORDER_BULK_MAX_ROWS:
+        return jsonify({"error": f"At most {ORDER_BULK_MAX_ROWS} orders per request"}), 400
+
+    results = [None] * len(rows)
+    valid = []
+    for i, data in enumerate(rows):
+        try:
+            valid.append((i, _order_fields_from_payload(data)))
+        except ValueError as e:
+            results[i] = {"row": i, "status": "error", "error": str(e)}
+
+    created_ids = []
+    for start in range(0, len(valid), ORDER_BULK_BATCH_SIZE):
+        batch = valid[start:start + ORDER_BULK_BATCH_SIZE]
+
+        # Orders go through the ORM so we get their ids back. SQLAlchemy batches
+        # these into multi-row INSERTs where the database can return the new ids
+        # in order (e.g. PostgreSQL); elsewhere they are sent row by row, but still
+        # inside the one transaction.
+        orders = [Order(**fields) for _, fields in batch]
+        db.session.add_all(orders)
+        db.session.flush()
+
+        kits, artworks, invoices = [], [], []
+        for (i, _), order in zip(batch, orders):
+            kit_fields, artwork_fields, invoice_fields = _order_child_rows(order.id)
+            kits.append(kit_fields)
+            artworks.append(artwork_fields)
+            invoices.append(invoice_fields)
+            results[i] = {"row": i, "status": "created", "order_id": order.id}
+            created_ids.append(order.id)
+
+        # Child rows don't need ids back, so each table is a single executemany
+        db.session.execute(insert(Kit), kits)
+        db.session.execute(insert(Artwork), artworks)
+        db.session.execute(insert(Invoice), invoices)
+
+    db.session.commit()
+    if created_ids:
+        publish_event("orders_bulk_created", order_ids=created_ids)
+
+    return jsonify({
+        "created": len(created_ids),
+        "failed": len(rows) - len(created_ids),
+        "results": results
+    }), 201 if created_ids else 400
+
+
 @main_bp.route('/api/orders/<int:order_id>/status', methods=['PATCH'])
+@idempotent
 def update_order_status(order_id):
     order = Order.query.get_or_404(order_id)
     data = request.get_json()
@@ -202,14 +949,9 @@ def update_order_status(order_id):
 
     if new_status == 'Kit Returned':
         order.kit_received_at = 'Kit Returned'
-        from SelfPortraitControlPlatform.app.trello_integration import create_trello_card
-        card_data = create_trello_card(order)
-        if card_data is None:
-            print("[TRELLO] Could not create a Trello card (check logs).")
-        else:
-            # Optionally, you might want to store the Trello card ID or URL in your DB
-            # e.g. order.trello_card_id = card_data['id']
-            print(f"[TRELLO] Card created: {card_data.get('shortUrl')}")
+        # The Trello card is created by the outbox dispatcher after this commit,
+        # which stores its id/URL on the order
+        enqueue('trello.create_card', order_id=order.id)
 
         # 2) Find all tasks with the same order_id and task_type='kit_follow_up_call'
         tasks_to_remove = Task.query.filter_by(order_id=order.id, task_type='kit_completion_follow_up').all()
@@ -218,20 +960,28 @@ def update_order_status(order_id):
         for t in tasks_to_remove:
             db.session.delete(t)
 
+    blobs_to_collect = []
     if new_status == 'In Production':
-        order_folder = os.path.join(ARTWORK_UPLOAD_FOLDER, str(order.id))
-        try:
-            shutil.rmtree(order_folder, ignore_errors=True)
-            print(f"[CLEANUP] Deleted folder for Order {order.id}: {order_folder}")
-        except Exception as e:
-            print(f"[CLEANUP] Could not remove folder: {e}")
-        # Optionally, also reset Artwork.design_file_path to None
-        artwork = Artwork.query.filter_by(order_id=order.id).first()
-        if artwork:
-            artwork.design_file_path = None
+        # Drop the order's artwork files, releasing the blobs they referenced.
+        # The files themselves are deleted by the janitor after the commit.
+        _, blobs_to_collect = _remove_artwork_files(order.id)
 
     # 4) Commit all changes together
     db.session.commit()
+    if new_status == 'In Production':
+        artwork_janitor.remove_folder(_order_artwork_folder(order.id))
+        artwork_janitor.collect_blobs(blobs_to_collect)
+    _invalidate_order(order.id)
+    publish_event("order_status", order_id=order.id, status=new_status)
+    if new_status == 'Kit Returned':
+        outbox_dispatcher.notify()
+
+    # Warm the PDF cache with the documents the next stage needs. The final
+    # package checklist prints the status, so re-render it on every change.
+    doc_types = list(PRERENDER_ON_STATUS.get(new_status, ()))
+    if order.quantities and order.quantities != 'Unconfirmed':
+        doc_types.extend(PRERENDER_ON_QUANTITIES)
+    prerenderer.submit(order, doc_types)
     return jsonify({"message": f"Order status updated to {new_status}"}), 200
 
 
@@ -239,25 +989,17 @@ def update_order_status(order_id):
 
 
 
-import os
-from flask import send_from_directory, Blueprint
-
-main_bp = Blueprint('main', __name__)
-
-# Compute an absolute path to the React build folder
-CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
-BUILD_DIR = os.path.abspath(os.path.join(CURRENT_DIR, "..", "..", "self-portrait-website", "build"))
-print("[DEBUG] BUILD_DIR =>", BUILD_DIR, flush=True)
-
+# The build folder is indexed by create_app (REACT_BUILD_DIR); see react_build.py
 
 @main_bp.route("/", defaults={"path": ""})
 @main_bp.route("/<path:path>")
 def serve_react(path):
     # If a specific file is requested and exists, serve it.
-    if path and os.path.exists(os.path.join(BUILD_DIR, path)):
-        return send_from_directory(BUILD_DIR, path)
     # Otherwise, serve index.html (this supports client-side routing)
-    return send_from_directory(BUILD_DIR, "index.html")
+    asset = (path and react_build.get(path)) or react_build.get("index.html")
+    if asset is None:
+        return jsonify({"error": "Front end not built"}), 404
+    return react_build.send(asset)
 
 
 
@@ -267,7 +1009,7 @@ def after_request(response):
     response.headers["Access-Control-Allow-Origin"] = "http://localhost:3000"
     response.headers["Access-Control-Allow-Credentials"] = "true"
     response.headers["Access-Control-Allow-Methods"] = "GET,HEAD,OPTIONS,POST,PUT,PATCH,DELETE"
-    response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
+    response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization, Idempotency-Key"
     return response
 
 
@@ -275,19 +1017,33 @@ def after_request(response):
 # NEW ROUTE: Generate and return a PDF packing slip (or invoice)
 ##############################################################################
 
+def _cached_pdf_response(doc_type, order, render, filename):
+    """
+    Serves an order PDF from pdf_cache, rendering it only on a miss.
+    The cache key doubles as a strong ETag, so a client that already has this
+    exact document gets a 304 without the PDF being rendered or read.
+    """
+    key = pdf_cache.key(doc_type, order)
+    if request.if_none_match.contains(key):
+        response = make_response('', 304)
+    else:
+        pdf_data = pdf_cache.get_or_render(key, lambda: render(order))
+        response = make_response(pdf_data)
+        response.headers.set('Content-Disposition', 'attachment', filename=filename)
+        response.headers.set('Content-Type', 'application/pdf')
+    response.set_etag(key)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 @main_bp.route('/api/orders/<int:order_id>/packing-slip', methods=['GET'])
 def generate_packing_slip(order_id):
     from SelfPortraitControlPlatform.app.pdf_utils import create_invoice_pdf
 
     order = Order.query.get_or_404(order_id)
 
-    pdf_data = create_invoice_pdf(order)
-
-    response = make_response(pdf_data)
-    response.headers.set('Content-Disposition', 'attachment',
-                         filename=f'packing_slip_order_{order_id}.pdf')
-    response.headers.set('Content-Type', 'application/pdf')
-    return response
+    return _cached_pdf_response('packing_slip', order, create_invoice_pdf,
+                                f'packing_slip_order_{order_id}.pdf')
 
 
 
@@ -297,13 +1053,8 @@ def generate_next_steps(order_id):
     from SelfPortraitControlPlatform.app.pdf_utils import create_next_steps_pdf
     order = Order.query.get_or_404(order_id)
 
-    pdf_data = create_next_steps_pdf(order)
-
-    response = make_response(pdf_data)
-    response.headers.set('Content-Disposition', 'attachment',
-                         filename=f'next_steps_order_{order_id}.pdf')
-    response.headers.set('Content-Type', 'application/pdf')
-    return response
+    return _cached_pdf_response('next_steps', order, create_next_steps_pdf,
+                                f'next_steps_order_{order_id}.pdf')
 
 
 
@@ -312,13 +1063,8 @@ def generate_checklist(order_id):
     from SelfPortraitControlPlatform.app.pdf_utils import create_checklist_pdf
     order = Order.query.get_or_404(order_id)
 
-    pdf_data = create_checklist_pdf(order)
-
-    response = make_response(pdf_data)
-    response.headers.set('Content-Disposition', 'attachment',
-                         filename=f'checklist_order_{order_id}.pdf')
-    response.headers.set('Content-Type', 'application/pdf')
-    return response
+    return _cached_pdf_response('checklist', order, create_checklist_pdf,
+                                f'checklist_order_{order_id}.pdf')
 
 
 # app/routes.py
@@ -326,7 +1072,6 @@ def generate_checklist(order_id):
 @main_bp.route('/api/orders/<int:order_id>/final-package-checklist', methods=['GET'])
 def generate_final_package_checklist(order_id):
     from SelfPortraitControlPlatform.app.pdf_utils import create_final_package_checklist_pdf
-    from flask import make_response
 
     order = Order.query.get_or_404(order_id)
 
@@ -334,16 +1079,89 @@ def generate_final_package_checklist(order_id):
     if not order.quantities or order.quantities == "Unconfirmed":
         return jsonify({"error": "Cannot generate Final Package Checklist until quantities are confirmed"}), 400
 
-    pdf_data = create_final_package_checklist_pdf(order)
+    return _cached_pdf_response('final_package_checklist', order, create_final_package_checklist_pdf,
+                                f'final_package_checklist_order_{order_id}.pdf')
+
 
-    response = make_response(pdf_data)
-    response.headers.set('Content-Disposition', 'attachment',
-                         filename=f'final_package_checklist_order_{order_id}.pdf')
-    response.headers.set('Content-Type', 'application/pdf')
-    return response
 
 
 
+# URL-friendly names accepted by /api/print-runs
+PRINT_RUN_DOCUMENT_TYPES = ('packing_slip', 'next_steps', 'checklist', 'final_package_checklist')
+
+
+@main_bp.route('/api/print-runs', methods=['POST'])
+def create_print_run():
+    """
+    Renders a batch of order documents in parallel and returns them as one file.
+    Expects JSON:
+        {"order_ids": [1, 2, 3],
+         "documents": ["packing_slip", "checklist"],
+         "output": "pdf" | "zip",         (default "pdf")
+         "workers": 4}                     (optional, capped at PRINT_RUN_WORKERS)
+    "pdf" returns a single merged PDF with page numbers; "zip" streams one PDF
+    per order and document. Final package checklists are skipped for orders whose
+    quantities are unconfirmed; their ids are listed in X-Print-Run-Skipped.
+    """
+    from SelfPortraitControlPlatform.app.print_runs import (
+        PRINT_RUN_MAX_DOCUMENTS, merge_pdfs, render_documents, snapshot_order, zip_stream
+    )
+
+    data = request.get_json() or {}
+    order_ids = data.get('order_ids')
+    documents = data.get('documents')
+    output = data.get('output', 'pdf')
+    workers = data.get('workers')
+
+    if not order_ids or not isinstance(order_ids, list):
+        return jsonify({"error": "order_ids must be a non-empty list"}), 400
+    if not documents or not isinstance(documents, list):
+        return jsonify({"error": "documents must be a non-empty list"}), 400
+    unknown = [d for d in documents if d not in PRINT_RUN_DOCUMENT_TYPES]
+    if unknown:
+        return jsonify({"error": f"Unknown document types: {', '.join(map(str, unknown))}"}), 400
+    if output not in ('pdf', 'zip'):
+        return jsonify({"error": "output must be 'pdf' or 'zip'"}), 400
+    if workers is not None and (not isinstance(workers, int) or workers < 1):
+        return jsonify({"error": "workers must be a positive integer"}), 400
+    if len(order_ids) * len(documents) > PRINT_RUN_MAX_DOCUMENTS:
+        return jsonify({"error": f"At most {PRINT_RUN_MAX_DOCUMENTS} documents per print run"}), 400
+
+    try:
+        order_ids = [int(i) for i in order_ids]
+    except (TypeError, ValueError):
+        return jsonify({"error": "order_ids must be integers"}), 400
+    orders = {o.id: o for o in Order.query.filter(Order.id.in_(order_ids))}
+    missing = [i for i in order_ids if i not in orders]
+    if missing:
+        return jsonify({"error": f"Orders not found: {', '.join(map(str, missing))}"}), 404
+
+    # Snapshot everything up front: rendering happens in other processes,
+    # and the ZIP is streamed after this view has returned
+    jobs, names, skipped = [], [], []
+    for order_id in order_ids:
+        order = orders[order_id]
+        snapshot = snapshot_order(order, documents)
+        for doc_type in documents:
+            if doc_type == 'final_package_checklist' and (not order.quantities or order.quantities == "Unconfirmed"):
+                skipped.append(order_id)
+                continue
+            jobs.append((doc_type, snapshot))
+            names.append(f"{doc_type}_order_{order_id}.pdf")
+    if not jobs:
+        return jsonify({"error": "Nothing to print", "skipped": skipped}), 400
+
+    if output == 'zip':
+        pdfs = render_documents(jobs, workers)
+        response = Response(zip_stream(zip(names, pdfs)), mimetype='application/zip')
+        response.headers.set('Content-Disposition', 'attachment', filename='print_run.zip')
+    else:
+        response = make_response(merge_pdfs(render_documents(jobs, workers)))
+        response.headers.set('Content-Disposition', 'attachment', filename='print_run.pdf')
+        response.headers.set('Content-Type', 'application/pdf')
+    if skipped:
+        response.headers['X-Print-Run-Skipped'] = ",".join(map(str, skipped))
+    return response
 
 
 @main_bp.route('/api/school-portal/login', methods=['POST'])
@@ -413,6 +1231,7 @@ def create_task():
     )
     db.session.add(new_task)
     db.session.commit()
+    publish_event("task_created", task_id=new_task.id, order_id=new_task.order_id, task_type=new_task.task_type)
 
     return jsonify({
         "message": "Task created",
@@ -422,6 +1241,7 @@ def create_task():
 
 
 @main_bp.route('/api/tasks', methods=['GET'])
+@conditional_collection(Task)
 def get_all_tasks():
     tasks = Task.query.all()
     tasks_list = []
@@ -445,54 +1265,267 @@ def get_all_tasks():
 ROUTES_DIR = os.path.dirname(os.path.abspath(__file__))
 ARTWORK_UPLOAD_FOLDER = os.path.join(ROUTES_DIR, '..', 'app', 'static', 'artwork')
 os.makedirs(ARTWORK_UPLOAD_FOLDER, exist_ok=True)
+# Content-addressed artwork files, served from /static/artwork/blobs/...
+blob_store.set_directory(os.path.join(ARTWORK_UPLOAD_FOLDER, BLOB_ENTRY_PREFIX))
+artwork_janitor.set_directory(ARTWORK_UPLOAD_FOLDER)
+
+
+def _touch_artwork(order_id):
+    # Artwork.updated_at drives the /api/orders ETag and /api/orders/changes
+    db.session.execute(
+        update(Artwork).where(Artwork.order_id == order_id).values(updated_at=datetime.utcnow())
+    )
+
+
+def _attach_blob(order_id, sha256, size, filename):
+    """
+    Adds an artwork_files row for a stored blob, unless the order already has
+    that content (under any name). The INSERT and the blob reference share a
+    savepoint: the unique constraints settle concurrent uploads of the same
+    file, so nothing is lost or doubled. Returns (path, added). The caller commits.
+    """
+    path = blob_entry(sha256, filename)
+    width, height = image_dimensions(blob_store.path(sha256))
+    try:
+        with db.session.begin_nested():
+            db.session.add(ArtworkFile(order_id=order_id, path=path, sha256=sha256, size=size,
+                                       width=width, height=height))
+            db.session.flush()
+            # Inside the savepoint: add_ref settles its own insert race, and
+            # anything else it raises undoes the artwork_files row with it
+            blob_store.add_ref(sha256, size)
+    except IntegrityError:
+        existing = ArtworkFile.query.filter_by(order_id=order_id, sha256=sha256).first()
+        return (existing.path if existing else path), False
+    _touch_artwork(order_id)
+    return path, True
+
+
+def _remove_artwork_files(order_id, paths=None):
+    """
+    Deletes the order's artwork_files rows (all of them, or just `paths`), one
+    DELETE per row so a row removed concurrently is never released twice.
+    Returns (removed rows, blobs to pass to blob_store.collect() after the commit).
+    """
+    query = ArtworkFile.query.filter_by(order_id=order_id)
+    if paths is not None:
+        query = query.filter(ArtworkFile.path.in_(paths))
+    removed, unreferenced = [], []
+    for f in query.all():
+        if db.session.execute(delete(ArtworkFile).where(ArtworkFile.id == f.id)).rowcount:
+            removed.append(f)
+            if parse_blob_entry(f.path) and blob_store.release(f.sha256):
+                unreferenced.append(f.sha256)
+    if removed:
+        _touch_artwork(order_id)
+    return removed, unreferenced
+
+
+def _artwork_original_path(entry):
+    """
+    Disk path of an artwork entry (blob or legacy "<order_id>/<name>"), or None
+    if the entry would point outside the artwork folder.
+    """
+    parsed = parse_blob_entry(entry)
+    if parsed:
+        return blob_store.path(parsed[0])
+    return safe_join(ARTWORK_UPLOAD_FOLDER, entry)
+
+
+def _queue_derivatives(entries):
+    # Thumbnails/previews are made off the request; serve_artwork covers any not ready yet
+    for entry in entries:
+        path = _artwork_original_path(entry)
+        if path:
+            derivative_worker.submit(path)
 
 
 
 
 @main_bp.route('/api/orders/<int:order_id>/artwork/upload', methods=['POST'])
 def upload_artwork_images(order_id):
+    """
+    Multipart upload of one or more images. Counts against the same per-order
+    limit (ARTWORK_MAX_BYTES_PER_ORDER) as chunked uploads; a request that
+    would go over it is rejected as a whole with 413.
+    """
     order = Order.query.get_or_404(order_id)
     files = request.files.getlist('images')
     if not files:
         return jsonify({"error": "No images field in form data"}), 400
 
-    # Create a subfolder named after the order ID
-    order_folder = os.path.join(ARTWORK_UPLOAD_FOLDER, str(order_id))
-    os.makedirs(order_folder, exist_ok=True)
-
-    # Fetch existing Artwork entry (assuming you only have 1 Artwork row per order)
-    artwork = Artwork.query.filter_by(order_id=order_id).first()
-    existing_paths = artwork.design_file_path or ""
-    existing_files = existing_paths.split(",") if existing_paths else []
-
+    max_bytes = current_app.config.get('ARTWORK_MAX_BYTES_PER_ORDER',
+                                       artwork_uploads.ARTWORK_MAX_BYTES_PER_ORDER)
+    used = artwork_uploads.order_bytes_used(order_id)
     saved_file_paths = []
     for file in files:
         if file.filename == '':
             continue
 
         filename = secure_filename(file.filename)  # sanitize
-        # e.g. "5/world_icon.jpeg"
-        path_in_db = f"{order_id}/{filename}"
 
-        # --- Check if path_in_db already exists ---
-        if path_in_db in existing_files:
-            print(f"[UPLOAD] Skipping duplicate: {path_in_db}")
-            continue  # Skip saving
-
-        # Otherwise, proceed to save
-        save_path = os.path.join(order_folder, filename)
-        file.save(save_path)
+        # Stored by content: the same scan under another name is kept once,
+        # and a different scan with an existing name is no longer skipped
+        try:
+            tmp_path, sha256, size = blob_store.save_stream(file.stream, max_bytes=max_bytes - used)
+        except BlobTooLarge:
+            # Blobs already stored for this request have no row once rolled
+            # back; the janitor's sweep removes them
+            db.session.rollback()
+            return _upload_error_response(artwork_uploads.UploadError(
+                "Upload would exceed this order's artwork size limit", 413, limit=max_bytes, used=used))
+        blob_store.ingest(tmp_path, sha256)
+        path_in_db, added = _attach_blob(order_id, sha256, size, filename)
+        if not added:
+            print(f"[UPLOAD] Skipping duplicate: {filename} (same content as {path_in_db})")
+            continue
+        used += size
         saved_file_paths.append(path_in_db)
 
-    # Update Artwork.design_file_path with newly added references
     if saved_file_paths:
-        new_paths = existing_files + saved_file_paths
-        artwork.design_file_path = ",".join(new_paths)
         db.session.commit()
+        _invalidate_order(order_id)
+        publish_event("artwork_uploaded", order_id=order_id, files=saved_file_paths)
+        _queue_derivatives(saved_file_paths)
 
     return jsonify({"message": "Images uploaded successfully!"}), 200
 
 
+##############################################################################
+# Chunked, resumable artwork uploads (protocol described in artwork_uploads.py)
+##############################################################################
+
+def _order_artwork_folder(order_id):
+    return os.path.join(ARTWORK_UPLOAD_FOLDER, str(order_id))
+
+
+def _upload_error_response(e):
+    return jsonify(dict(e.extra, error=e.message)), e.status_code
+
+
+def _upload_state(upload):
+    return {
+        "upload_id": upload.id,
+        "filename": upload.filename,
+        "size": upload.size,
+        "offset": upload.received,
+        "chunk_size": current_app.config.get('ARTWORK_UPLOAD_CHUNK_MAX_BYTES',
+                                             artwork_uploads.ARTWORK_UPLOAD_CHUNK_MAX_BYTES),
+    }
+
+
+@main_bp.route('/api/orders/<int:order_id>/artwork/uploads', methods=['POST'])
+def initiate_artwork_upload(order_id):
+    """
+    Starts a chunked upload, or returns the unfinished one for the same file.
+    Expects JSON: {"filename": "scan_01.tif", "size": 48213377, "sha256": optional}
+    If sha256 names content that is already stored, it is attached straight
+    away ("complete": true) and no chunks need sending.
+    """
+    Order.query.get_or_404(order_id)
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename') or '')
+    size = data.get('size')
+    if not filename or filename.startswith(artwork_uploads.PART_PREFIX):
+        return jsonify({"error": "Missing or invalid filename"}), 400
+    if not isinstance(size, int) or isinstance(size, bool):
+        return jsonify({"error": "size must be an integer number of bytes"}), 400
+
+    sha256 = str(data.get('sha256') or '').lower()
+    blob = db.session.get(ArtworkBlob, sha256) if sha256 else None
+    if blob is not None and blob.size == size and blob_store.exists(sha256):
+        path_in_db, added = _attach_blob(order_id, sha256, size, filename)
+        db.session.commit()
+        if added:
+            _invalidate_order(order_id)
+            publish_event("artwork_uploaded", order_id=order_id, files=[path_in_db])
+            _queue_derivatives([path_in_db])
+        return jsonify({"path": path_in_db, "sha256": sha256, "size": size,
+                        "offset": size, "complete": True}), 200
+
+    artwork_uploads.purge_expired(_order_artwork_folder)
+    try:
+        upload = artwork_uploads.initiate(
+            order_id, _order_artwork_folder(order_id), filename, size,
+            max_bytes=current_app.config.get('ARTWORK_MAX_BYTES_PER_ORDER',
+                                             artwork_uploads.ARTWORK_MAX_BYTES_PER_ORDER),
+        )
+    except artwork_uploads.UploadError as e:
+        db.session.rollback()
+        return _upload_error_response(e)
+    created = upload in db.session.new
+    db.session.commit()
+    return jsonify(_upload_state(upload)), 201 if created else 200
+
+
+@main_bp.route('/api/orders/<int:order_id>/artwork/uploads/<upload_id>', methods=['GET'])
+def get_artwork_upload(order_id, upload_id):
+    upload = ArtworkUpload.query.filter_by(id=upload_id, order_id=order_id).first_or_404()
+    return jsonify(_upload_state(upload)), 200
+
+
+@main_bp.route('/api/orders/<int:order_id>/artwork/uploads/<upload_id>', methods=['PUT'])
+def put_artwork_upload_chunk(order_id, upload_id):
+    """
+    Writes the raw request body at ?offset=N. On a 409 the response carries
+    the server's offset, which is where the client should resume from.
+    """
+    upload = ArtworkUpload.query.filter_by(id=upload_id, order_id=order_id).first_or_404()
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({"error": "Missing offset"}), 400
+
+    try:
+        new_offset = artwork_uploads.write_chunk(
+            upload, _order_artwork_folder(order_id), offset, request.stream, request.content_length,
+            max_chunk=current_app.config.get('ARTWORK_UPLOAD_CHUNK_MAX_BYTES',
+                                             artwork_uploads.ARTWORK_UPLOAD_CHUNK_MAX_BYTES),
+        )
+    except artwork_uploads.UploadError as e:
+        # Keep whatever was written before the failure, so the client can resume
+        # from there (or drop the upload if its part file is gone)
+        db.session.commit()
+        return _upload_error_response(e)
+    db.session.commit()
+    return jsonify({"offset": new_offset, "size": upload.size}), 200
+
+
+@main_bp.route('/api/orders/<int:order_id>/artwork/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_artwork_upload(order_id, upload_id):
+    """
+    Completes the upload and adds it to the order's artwork files.
+    Optional JSON: {"sha256": "<hex>"} is checked against the received bytes.
+    """
+    upload = ArtworkUpload.query.filter_by(id=upload_id, order_id=order_id).first_or_404()
+    data = request.get_json(silent=True) or {}
+
+    try:
+        sha256 = artwork_uploads.finalize(upload, _order_artwork_folder(order_id), data.get('sha256'))
+    except artwork_uploads.UploadError as e:
+        db.session.commit()
+        return _upload_error_response(e)
+
+    path_in_db, added = _attach_blob(order_id, sha256, upload.size, upload.filename)
+    db.session.delete(upload)
+    db.session.commit()
+    if added:
+        _invalidate_order(order_id)
+        publish_event("artwork_uploaded", order_id=order_id, files=[path_in_db])
+        _queue_derivatives([path_in_db])
+
+    return jsonify({"path": path_in_db, "sha256": sha256, "size": upload.size,
+                    "duplicate": not added}), 200
+
+
+@main_bp.route('/api/orders/<int:order_id>/artwork/uploads/<upload_id>', methods=['DELETE'])
+def abort_artwork_upload(order_id, upload_id):
+    upload = ArtworkUpload.query.filter_by(id=upload_id, order_id=order_id).first_or_404()
+    artwork_uploads.abort(upload, _order_artwork_folder(order_id))
+    db.session.delete(upload)
+    db.session.commit()
+    return jsonify({"message": "Upload aborted"}), 200
+
+
 
 
 
@@ -502,8 +1535,119 @@ def serve_artwork(filename):
     """
     Serve a file from SelfPortraitControlPlatform.app/static/artwork (including subfolders).
     <path:filename> means it can contain slashes like 5/world_icon.jpeg
+    ?size=thumb|preview returns a downscaled WebP (or JPEG if the browser
+    doesn't accept WebP); the default, size=original, returns the upload itself.
+
+    blobs/<xx>/<sha256>/<name> URLs name their content, so they (and their
+    thumbnails) are cached as immutable for a year. Older "<order_id>/<name>"
+    files are revalidated with their ETag instead. Range requests are honoured
+    either way, and with ARTWORK_SENDFILE_MODE set the front proxy sends the bytes.
+    """
+    # Unfinished chunked uploads live alongside the artwork; never serve them
+    if os.path.basename(filename).startswith(artwork_uploads.PART_PREFIX):
+        return jsonify({"error": "Not found"}), 404
+
+    size = request.args.get('size', 'original')
+    if size != 'original':
+        if size not in DERIVATIVE_SIZES:
+            return jsonify({"error": f"size must be one of: original, {', '.join(DERIVATIVE_SIZES)}"}), 400
+        response = _serve_artwork_derivative(filename, size)
+        if response is not None:
+            return response
+
+    # blobs/<xx>/<sha256>/<name>: the file is stored under its hash alone
+    parsed = parse_blob_entry(filename)
+    if parsed:
+        sha256, name = parsed
+        if not blob_store.exists(sha256):
+            return jsonify({"error": "Not found"}), 404
+        return _send_artwork_file(blob_store.path(sha256), download_name=name, etag=sha256,
+                                  immutable=True)
+
+    path = _artwork_original_path(filename)
+    if not path or not os.path.isfile(path):
+        return jsonify({"error": "Not found"}), 404
+    return _send_artwork_file(path)
+
+
+def _serve_artwork_derivative(filename, size):
+    """
+    Sends the thumb/preview for an artwork entry, rendering it first if the
+    background worker hasn't yet. None means "serve the original instead"
+    (e.g. a PDF or other file Pillow can't read).
+    """
+    original = _artwork_original_path(filename)
+    if not original or not os.path.isfile(original):
+        return None
+
+    webp = any(mimetype == 'image/webp' and quality > 0 for mimetype, quality in request.accept_mimetypes)
+    ext, mimetype = ('webp', 'image/webp') if webp else ('jpg', 'image/jpeg')
+    path = derivative_path(original, size, ext)
+    if not os.path.exists(path):
+        try:
+            render_derivatives(original)
+        except Exception as e:
+            print(f"[DERIVATIVES] Serving original for {filename}: {e}")
+            return None
+        if not os.path.exists(path):
+            return None  # not an image
+
+    parsed = parse_blob_entry(filename)
+    response = _send_artwork_file(path, mimetype=mimetype,
+                                  etag=f"{parsed[0]}.{size}.{ext}" if parsed else None,
+                                  immutable=bool(parsed))
+    response.vary.add('Accept')
+    return response
+
+
+def _send_artwork_file(path, mimetype=None, download_name=None, etag=None, immutable=False):
     """
-    return send_from_directory(ARTWORK_UPLOAD_FOLDER, filename)
+    send_file for anything under ARTWORK_UPLOAD_FOLDER.
+
+    immutable=True (the URL contains the content hash) adds
+    "Cache-Control: public, max-age=<ARTWORK_IMMUTABLE_MAX_AGE>, immutable";
+    otherwise the browser revalidates with If-None-Match / If-Modified-Since.
+
+    ARTWORK_SENDFILE_MODE hands the transfer to the front proxy so no worker
+    is tied up streaming bytes:
+      'x-sendfile'        Apache mod_xsendfile / lighttpd: X-Sendfile: <absolute path>
+      'x-accel-redirect'  nginx: X-Accel-Redirect: <ARTWORK_ACCEL_REDIRECT_PREFIX><relative path>,
+                          which needs an internal location aliased to the artwork folder:
+                              location /_artwork/ { internal; alias /srv/.../app/static/artwork/; }
+    In those modes 304s are still answered here; Range is left to the proxy.
+    """
+    mode = (current_app.config.get('ARTWORK_SENDFILE_MODE') or '').lower()
+    if mode not in ('x-sendfile', 'x-accel-redirect'):
+        mode = ''
+    max_age = current_app.config.get('ARTWORK_IMMUTABLE_MAX_AGE', 365 * 24 * 60 * 60) if immutable else None
+    response = werkzeug_send_file(
+        path, request.environ,
+        mimetype=mimetype,
+        download_name=download_name,
+        conditional=not mode,
+        etag=etag if etag is not None else True,
+        max_age=max_age,
+        use_x_sendfile=bool(mode),
+        response_class=current_app.response_class,
+    )
+    if immutable:
+        response.cache_control.immutable = True
+    if not mode:
+        return response
+
+    # The proxy handles Range itself; only the cheap 304 is answered here
+    response = response.make_conditional(request.environ)
+    if response.status_code == 304:
+        response.headers.pop('X-Sendfile', None)
+    elif mode == 'x-accel-redirect':
+        response.headers.pop('X-Sendfile', None)
+        # nginx sets it from the file; stop werkzeug re-adding 0 for the empty body
+        response.headers.pop('Content-Length', None)
+        response.automatically_set_content_length = False
+        relative = os.path.relpath(path, ARTWORK_UPLOAD_FOLDER).replace(os.sep, '/')
+        prefix = current_app.config.get('ARTWORK_ACCEL_REDIRECT_PREFIX', '/_artwork/')
+        response.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + url_quote(relative)
+    return response
 
 
 
@@ -513,8 +1657,8 @@ def serve_artwork(filename):
 @main_bp.route('/api/orders/<int:order_id>/artwork/delete', methods=['DELETE'])
 def delete_artwork_file(order_id):
     """
-    Removes a single image reference from Artwork.design_file_path
-    and deletes the physical file from disk.
+    Removes a single artwork file from the order (one DELETE on artwork_files)
+    and deletes the physical file from disk once nothing references it.
     Expects JSON: {"filename": "7/world_icon.jpeg"}
     """
     data = request.get_json()
@@ -523,57 +1667,51 @@ def delete_artwork_file(order_id):
 
     filename_to_delete = data['filename']  # e.g. "7/world_icon.jpeg"
 
-    # 1) Check that this order + Artwork actually exists
-    artwork = Artwork.query.filter_by(order_id=order_id).first()
-    if not artwork:
-        return jsonify({"error": "No Artwork record found for this order"}), 404
-
-    existing_paths = artwork.design_file_path or ""
-    paths_list = [p.strip() for p in existing_paths.split(',') if p.strip()]
-
-    # 2) Check if this filename is in the Artwork row
-    if filename_to_delete not in paths_list:
-        return jsonify({"error": f"File {filename_to_delete} not found in Artwork.design_file_path"}), 404
-
-    # 3) Remove from the DB entry
-    paths_list.remove(filename_to_delete)
-    artwork.design_file_path = ",".join(paths_list) if paths_list else None
+    # 1) Remove the row, dropping its blob reference
+    removed, unreferenced = _remove_artwork_files(order_id, [filename_to_delete])
+    if not removed:
+        db.session.rollback()
+        return jsonify({"error": f"File {filename_to_delete} not found for this order"}), 404
     db.session.commit()
+    _invalidate_order(order_id)
+    publish_event("artwork_deleted", order_id=order_id, file=filename_to_delete)
 
-    # 4) Delete from disk
-    file_path = os.path.join(ARTWORK_UPLOAD_FOLDER, filename_to_delete)
-    if os.path.exists(file_path):
-        try:
-            os.remove(file_path)
-            print(f"[DELETE] Removed file from disk: {file_path}")
-        except Exception as e:
-            print(f"[DELETE] Could not remove file: {e}")
+    # 2) Delete from disk: a blob only once nothing references it, a legacy file directly
+    if parse_blob_entry(filename_to_delete):
+        artwork_janitor.collect_blobs(unreferenced)
+    else:
+        file_path = os.path.join(ARTWORK_UPLOAD_FOLDER, filename_to_delete)
+        remove_derivatives(file_path)
+        if os.path.exists(file_path):
+            try:
+                os.remove(file_path)
+                print(f"[DELETE] Removed file from disk: {file_path}")
+            except Exception as e:
+                print(f"[DELETE] Could not remove file: {e}")
 
     return jsonify({"message": f"File {filename_to_delete} deleted"}), 200
 
 
 @main_bp.route('/api/invoices/<int:invoice_id>/status', methods=['PATCH'])
+@idempotent
 def update_invoice_status(invoice_id):
-    from SelfPortraitControlPlatform.app.pdf_utils import generate_invoice_pdf
     invoice = Invoice.query.get_or_404(invoice_id)
     data = request.get_json()
     new_status = data.get('status')
     if not new_status:
         return jsonify({"error": "Missing status"}), 400
 
-    old_status = invoice.status
     invoice.status = new_status
 
-    # If the new status is "Generated" and old_status was "Ungenerated", let's generate the PDF
-    if new_status == 'Generated' and old_status == 'Ungenerated':
-        order = invoice.order  # one-to-one relationship => invoice.order is the associated order
-        pdf_path = generate_invoice_pdf(order, invoice)
-        # Optionally store the path in invoice, if you want quick reference
-        # invoice_pdf_rel_path = pdf_path.replace(os.path.join("app", "static"), "")
-        # e.g. "/invoices/InvoiceIdNumber1_OrderId1/InvoiceIdNumber1_OrderId1.pdf"
-        # If you have a column in Invoice for pdf_path: invoice.pdf_path = invoice_pdf_rel_path
+    # Once an invoice leaves "Ungenerated", render and store its PDF once (this also
+    # backfills invoices issued before PDFs were stored). It is committed together
+    # with the status; later downloads just serve the stored file.
+    if new_status != 'Ungenerated' and not invoice_store.has_pdf(invoice):
+        invoice_store.persist(invoice)
 
     db.session.commit()
+    _invalidate_order(invoice.order_id)
+    publish_event("invoice_status", invoice_id=invoice.id, order_id=invoice.order_id, status=new_status)
 
     return jsonify({"message": f"Invoice status updated to {new_status}"}), 200
 
@@ -604,20 +1742,59 @@ from SelfPortraitControlPlatform.app.pdf_utils import generate_invoice_pdf  # En
 
 @main_bp.route('/api/invoices/<int:invoice_id>/download', methods=['GET'])
 def download_invoice(invoice_id):
+    """
+    Serves the stored invoice PDF. send_file handles Range requests and
+    If-None-Match against the PDF's SHA-256, so repeat downloads cost a 304.
+    An invoice without a stored PDF (still "Ungenerated", or issued before PDFs
+    were stored and not yet backfilled with `flask store-invoice-pdfs`) is
+    rendered for this response only: a GET never writes files or commits.
+    """
     # Retrieve the invoice and its associated order from the database
     invoice = Invoice.query.get_or_404(invoice_id)
-    order = invoice.order
-
-    # Generate the PDF on the fly using your PDF utility function
-    pdf_data = generate_invoice_pdf(order, invoice)
 
-    # Create a response with the PDF data
-    response = make_response(pdf_data)
-    response.headers.set('Content-Disposition', 'attachment', filename=f'invoice_{invoice_id}.pdf')
-    response.headers.set('Content-Type', 'application/pdf')
+    if not invoice_store.has_pdf(invoice):
+        response = make_response(generate_invoice_pdf(invoice.order, invoice))
+        response.headers.set('Content-Disposition', 'attachment', filename=f'invoice_{invoice_id}.pdf')
+        response.headers.set('Content-Type', 'application/pdf')
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    response = send_file(
+        invoice_store.full_path(invoice.pdf_path),
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=f'invoice_{invoice_id}.pdf',
+        etag=invoice.pdf_sha256,
+        conditional=True,
+    )
+    response.headers['Cache-Control'] = 'private, no-cache'
     return response
 
 
+@main_bp.route('/api/invoices/<int:invoice_id>/regenerate', methods=['POST'])
+@idempotent
+def regenerate_invoice(invoice_id):
+    """
+    Explicitly re-renders the stored invoice PDF from the current order data,
+    keeping the original issue date unless {"reissue": true} is sent.
+    """
+    invoice = Invoice.query.get_or_404(invoice_id)
+    data = request.get_json(silent=True) or {}
+    if data.get('reissue'):
+        invoice.issued_at = None
+
+    invoice_store.persist(invoice, regenerate=True)
+    db.session.commit()
+    _invalidate_order(invoice.order_id)
+    publish_event("invoice_regenerated", invoice_id=invoice.id, order_id=invoice.order_id)
+
+    return jsonify({
+        "message": "Invoice PDF regenerated",
+        "pdf_sha256": invoice.pdf_sha256,
+        "issued_at": invoice.issued_at.isoformat(),
+    }), 200
+
+
 import json  # Add this import at the top if not present
 
 @main_bp.route('/api/orders/<int:order_id>/quantities', methods=['PATCH'])
@@ -630,6 +1807,9 @@ def update_quantities(order_id):
     # Store the quantities as a JSON string in the database
     order.quantities = json.dumps(data['quantities'])
     db.session.commit()
+    _invalidate_order(order.id)
+    publish_event("order_quantities", order_id=order.id)
+    prerenderer.submit(order, PRERENDER_ON_QUANTITIES)
     return jsonify({"message": "Quantities updated successfully."}), 200
 
 
@@ -753,6 +1933,26 @@ def delete_user(user_id):
 @main_bp.route('/api/tasks/<int:task_id>', methods=['DELETE'])
 def delete_task(task_id):
     task = Task.query.get_or_404(task_id)
+    order_id = task.order_id
     db.session.delete(task)
     db.session.commit()
+    publish_event("task_deleted", task_id=task_id, order_id=order_id)
     return jsonify({"message": f"Task {task_id} deleted"}), 200
+
+
+@main_bp.route('/api/events', methods=['GET'])
+def event_stream():
+    """
+    Server-Sent Events stream of order / task / invoice / artwork changes.
+    Each event carries only ids and the new status, so the client patches its
+    local state (or refetches one order) instead of reloading the full lists.
+    Reconnects resume from the Last-Event-ID header (or ?last_event_id=);
+    a "resync" event means the gap could not be replayed and the client should reload.
+    """
+    # "<nonce>-<n>"; an id from another worker or an old process gets a resync
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or None
+
+    response = Response(broker.stream(last_event_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # don't let nginx buffer the stream
+    return response
@@ -1,26 +1,99 @@
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 from SelfPortraitControlPlatform.app.models import Order
 
 # Trello API credentials
 TRELLO_KEY = os.getenv('TRELLO_KEY', '1e2279831dd6b11e82dd7aaa934ee8c0')
 TRELLO_TOKEN = os.getenv('TRELLO_TOKEN', 'ATTA45b114110a92d2892d18f6c3da2c2cb5eb19190b483179206702d1a020e380937160F183')
 TRELLO_LIST_ID_IN_ARTWORK = os.getenv('TRELLO_LIST_ID_IN_ARTWORK', '677cdb99c93f6f998afd9985')  # List ID for "In Artwork"
+# Overridable so tests/dev can point at a local stand-in server
+TRELLO_API_URL = os.getenv('TRELLO_API_URL', 'https://api.trello.com/1')
 
-def create_trello_card(order: Order):
+# Connection pooling / concurrency
+TRELLO_POOL_SIZE = int(os.getenv('TRELLO_POOL_SIZE', '10'))  # keep-alive connections kept open
+TRELLO_MAX_WORKERS = int(os.getenv('TRELLO_MAX_WORKERS', '8'))  # threads used by the batch functions
+TRELLO_TIMEOUT = 10  # seconds
+# How many times a request rejected with 429 is retried (after waiting Retry-After)
+TRELLO_MAX_RATE_LIMIT_RETRIES = 5
+TRELLO_DEFAULT_RETRY_AFTER = 1  # seconds, when a 429 has no Retry-After header
+
+
+def _build_session():
     """
-    Creates a new card on Trello in the 'In Artwork' list whenever an
-    order transitions to 'In Artwork'.
+    One pooled keep-alive session per process, so consecutive calls reuse the
+    TCP+TLS connection. The adapter only retries connection failures; 429s are
+    handled by _send so that concurrent batch workers back off together, and
+    other HTTP errors are left to the caller (e.g. the outbox's retry/backoff).
+    """
+    session = requests.Session()
+    retry = Retry(total=3, connect=3, read=0, status=0, backoff_factor=0.3)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=TRELLO_POOL_SIZE,
+                          pool_block=True, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+_session = _build_session()
+
+# Shared across threads: when Trello answers 429, nobody sends until this time
+_rate_limit_lock = threading.Lock()
+_rate_limited_until = 0.0
+
+
+def _wait_for_rate_limit():
+    with _rate_limit_lock:
+        delay = _rate_limited_until - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+
+
+def _note_rate_limited(response):
+    global _rate_limited_until
+    try:
+        retry_after = float(response.headers.get('Retry-After', TRELLO_DEFAULT_RETRY_AFTER))
+    except ValueError:
+        retry_after = TRELLO_DEFAULT_RETRY_AFTER
+    with _rate_limit_lock:
+        _rate_limited_until = max(_rate_limited_until, time.monotonic() + retry_after)
+
+
+def _send(method, path, params):
     """
+    Sends a request to the Trello API over the pooled session, honouring 429 /
+    Retry-After. Raises requests.exceptions.RequestException on failure.
+    """
+    params = dict(params, key=TRELLO_KEY, token=TRELLO_TOKEN)
+    for _ in range(TRELLO_MAX_RATE_LIMIT_RETRIES + 1):
+        _wait_for_rate_limit()
+        response = _session.request(method, f"{TRELLO_API_URL}{path}", params=params, timeout=TRELLO_TIMEOUT)
+        if response.status_code != 429:
+            break
+        _note_rate_limited(response)
+    response.raise_for_status()  # Raise an exception for HTTP errors (including a final 429)
+    return response.json()
+
 
+def _credentials_ok():
     # Safety checks for missing credentials
     if not (TRELLO_KEY and TRELLO_TOKEN and TRELLO_LIST_ID_IN_ARTWORK):
         print("[TRELLO] Missing TRELLO_KEY, TRELLO_TOKEN, or TRELLO_LIST_ID_IN_ARTWORK.")
-        return None
+        return False
+    return True
 
-    # API endpoint for creating Trello cards
-    url = "https://api.trello.com/1/cards"
 
+def _card_params(order: Order):
+    """
+    Query parameters for a new card. Built from the ORM object up front, so the
+    batch workers never touch the database session.
+    """
     # Construct the card's title and description
     card_name = f"Order #{order.id} - {order.school_name or 'Unknown School'}"
     card_desc = (
@@ -31,25 +104,66 @@ def create_trello_card(order: Order):
         "-------------------------------------------\n"
         "This Trello card was auto-generated from your Flask app."
     )
-
-    # Query parameters for the Trello API
-    query_params = {
+    return {
         'idList': TRELLO_LIST_ID_IN_ARTWORK,
-        'key': TRELLO_KEY,
-        'token': TRELLO_TOKEN,
         'name': card_name,
         'desc': card_desc,
     }
 
-    # Make the API request
+
+def _create_card(order_id, params):
     try:
-        response = requests.post(url, params=query_params, timeout=10)
-        response.raise_for_status()  # Raise an exception for HTTP errors
+        trello_card_data = _send('POST', '/cards', params)
     except requests.exceptions.RequestException as e:
-        print(f"[TRELLO] Failed to create Trello card for Order #{order.id}: {e}")
+        print(f"[TRELLO] Failed to create Trello card for Order #{order_id}: {e}")
         return None
 
     # Parse and log the response data
-    trello_card_data = response.json()
-    print(f"[TRELLO] Successfully created Trello card for Order #{order.id} — Card URL: {trello_card_data.get('shortUrl')}")
+    print(f"[TRELLO] Successfully created Trello card for Order #{order_id} — Card URL: {trello_card_data.get('shortUrl')}")
     return trello_card_data
+
+
+def create_trello_card(order: Order):
+    """
+    Creates a new card on Trello in the 'In Artwork' list whenever an
+    order transitions to 'In Artwork'.
+    """
+    if not _credentials_ok():
+        return None
+    return _create_card(order.id, _card_params(order))
+
+
+def move_trello_card(card_id, list_id):
+    """
+    Moves an existing card to another list. Returns the card data, or None on failure.
+    """
+    try:
+        return _send('PUT', f'/cards/{card_id}', {'idList': list_id})
+    except requests.exceptions.RequestException as e:
+        print(f"[TRELLO] Failed to move Trello card {card_id}: {e}")
+        return None
+
+
+def create_trello_cards(orders, max_workers=TRELLO_MAX_WORKERS):
+    """
+    Batch version of create_trello_card, e.g. for a day's returned kits.
+    Cards are created concurrently on a bounded thread pool sharing the pooled
+    session; a 429 from Trello pauses every worker for Retry-After.
+    Returns {order_id: card data or None}.
+    """
+    if not _credentials_ok():
+        return {order.id: None for order in orders}
+    jobs = [(order.id, _card_params(order)) for order in orders]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = pool.map(lambda job: _create_card(*job), jobs)
+        return {order_id: card for (order_id, _), card in zip(jobs, results)}
+
+
+def move_trello_cards(card_ids, list_id, max_workers=TRELLO_MAX_WORKERS):
+    """
+    Batch version of move_trello_card. Returns {card_id: card data or None}.
+    """
+    card_ids = list(card_ids)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = pool.map(lambda card_id: move_trello_card(card_id, list_id), card_ids)
+        return dict(zip(card_ids, results))
@@ -21,6 +21,55 @@ class Config:
     SESSION_COOKIE_SAMESITE = "Lax"         # Use 'Lax' or 'Strict' instead of 'None'
     PERMANENT_SESSION_LIFETIME = 31 * 24 * 60 * 60
 
+    # Run the outbox dispatcher thread inside the web process.
+    # Set to False when running `flask drain-outbox` as a separate worker instead.
+    OUTBOX_DISPATCHER_ENABLED = os.getenv('OUTBOX_DISPATCHER_ENABLED', 'true').lower() == 'true'
+
+    # Rendered-PDF cache; defaults to <instance folder>/pdf_cache
+    PDF_CACHE_FOLDER = os.getenv('PDF_CACHE_FOLDER')
+    PDF_CACHE_MAX_BYTES = 512 * 1024 * 1024
+    PDF_CACHE_MEMORY_MAX_BYTES = 32 * 1024 * 1024
+    PDF_CACHE_LOW_WATER = 0.9
+
+    # Issued invoice PDFs (kept permanently); defaults to <instance folder>/invoices
+    INVOICE_PDF_FOLDER = os.getenv('INVOICE_PDF_FOLDER')
+
+    # Processes rendering /api/print-runs batches (per web process); 0 means one per CPU
+    PRINT_RUN_WORKERS = int(os.getenv('PRINT_RUN_WORKERS', 0)) or None
+
+    # Pre-render the next stage's PDFs on a background thread pool after status changes
+    PRERENDER_ENABLED = os.getenv('PRERENDER_ENABLED', 'true').lower() == 'true'
+    PRERENDER_WORKERS = 2
+    PRERENDER_MAX_QUEUE = 500
+
+    # Chunked artwork uploads: largest accepted chunk, and total artwork bytes allowed per order
+    ARTWORK_UPLOAD_CHUNK_MAX_BYTES = 8 * 1024 * 1024
+    ARTWORK_MAX_BYTES_PER_ORDER = int(os.getenv('ARTWORK_MAX_BYTES_PER_ORDER', 2 * 1024 * 1024 * 1024))
+
+    # Threads rendering artwork thumbnails/previews after upload
+    DERIVATIVE_WORKERS = 2
+    DERIVATIVE_MAX_QUEUE = 2000
+
+    # Background deletion of artwork from disk (In Production cleanup, unreferenced blobs)
+    # and the periodic sweep for orphaned order folders. Disabled, deletions run inline.
+    ARTWORK_JANITOR_ENABLED = os.getenv('ARTWORK_JANITOR_ENABLED', 'true').lower() == 'true'
+    ARTWORK_JANITOR_BATCH_SIZE = 200
+    ARTWORK_JANITOR_SWEEP_INTERVAL = 60 * 60
+
+    # Serving /static/artwork: '' streams files from Flask; 'x-sendfile' (Apache/lighttpd)
+    # or 'x-accel-redirect' (nginx) lets the front proxy send them instead
+    ARTWORK_SENDFILE_MODE = os.getenv('ARTWORK_SENDFILE_MODE', '')
+    # nginx `internal` location aliased to app/static/artwork (x-accel-redirect mode)
+    ARTWORK_ACCEL_REDIRECT_PREFIX = os.getenv('ARTWORK_ACCEL_REDIRECT_PREFIX', '/_artwork/')
+    # Browser cache lifetime for content-hashed artwork URLs (blobs/<sha256>/...)
+    ARTWORK_IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+    # The React production build served at /; indexed (and its .gz/.br files written) by create_app
+    REACT_BUILD_DIR = os.getenv('REACT_BUILD_DIR', os.path.abspath(
+        os.path.join(os.path.dirname(__file__), '..', 'self-portrait-website', 'build')))
+    # Browser cache lifetime for fingerprinted React build files (static/js/main.<hash>.js, ...)
+    STATIC_IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
 
 class ProductionConfig(Config):
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///default.db')
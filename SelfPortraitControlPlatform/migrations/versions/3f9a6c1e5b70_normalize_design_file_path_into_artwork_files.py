@@ -0,0 +1,121 @@
+"""Move artworks.design_file_path into an artwork_files table
+
+Revision ID: 3f9a6c1e5b70
+Revises: b7e04d2f9c13
+Create Date: 2026-10-18 19:40:13.552904
+
+"""
+import hashlib
+import os
+import re
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a6c1e5b70'
+down_revision = 'b7e04d2f9c13'
+branch_labels = None
+depends_on = None
+
+# Same location routes.py uses (app/static/artwork)
+ARTWORK_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'app', 'static', 'artwork')
+BLOB_ENTRY_RE = re.compile(r'^blobs/([0-9a-f]{2})/([0-9a-f]{64})/([^/]+)$')
+
+
+def _describe(path):
+    """
+    (sha256, size, width, height) for an entry, from the file on disk where
+    it exists. Missing files get NULLs; the row is still migrated.
+    """
+    match = BLOB_ENTRY_RE.match(path)
+    if match:
+        sha256 = match.group(2)
+        disk_path = os.path.join(ARTWORK_FOLDER, 'blobs', sha256[:2], sha256)
+    else:
+        sha256 = None
+        disk_path = os.path.join(ARTWORK_FOLDER, path)
+    if not os.path.isfile(disk_path):
+        return sha256, None, None, None
+
+    size = os.path.getsize(disk_path)
+    if sha256 is None:
+        hasher = hashlib.sha256()
+        with open(disk_path, 'rb') as f:
+            for block in iter(lambda: f.read(64 * 1024), b''):
+                hasher.update(block)
+        sha256 = hasher.hexdigest()
+    width = height = None
+    try:
+        from PIL import Image
+        with Image.open(disk_path) as image:
+            width, height = image.size
+    except Exception:
+        pass
+    return sha256, size, width, height
+
+
+def upgrade():
+    artwork_files = op.create_table('artwork_files',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('path', sa.String(length=512), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=True),
+    sa.Column('size', sa.BigInteger(), nullable=True),
+    sa.Column('width', sa.Integer(), nullable=True),
+    sa.Column('height', sa.Integer(), nullable=True),
+    sa.Column('uploaded_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['order.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('order_id', 'path', name='uq_artwork_files_order_id_path'),
+    sa.UniqueConstraint('order_id', 'sha256', name='uq_artwork_files_order_id_sha256')
+    )
+
+    # Copy every comma-separated entry into its own row, keeping upload order
+    conn = op.get_bind()
+    rows = conn.execute(sa.text(
+        "SELECT order_id, design_file_path, updated_at FROM artworks "
+        "WHERE design_file_path IS NOT NULL AND design_file_path != '' ORDER BY id"
+    ).columns(updated_at=sa.DateTime())).fetchall()  # typed, so SQLite hands back a datetime too
+    new_rows = []
+    seen_paths, seen_hashes = set(), set()
+    for order_id, design_file_path, updated_at in rows:
+        for path in design_file_path.split(','):
+            path = path.strip()
+            if not path or (order_id, path) in seen_paths:
+                continue
+            seen_paths.add((order_id, path))
+            sha256, size, width, height = _describe(path)
+            if sha256 is not None:
+                if (order_id, sha256) in seen_hashes:
+                    sha256 = None  # two older files with identical content; keep both rows
+                else:
+                    seen_hashes.add((order_id, sha256))
+            new_rows.append({
+                'order_id': order_id, 'path': path, 'sha256': sha256, 'size': size,
+                'width': width, 'height': height, 'uploaded_at': updated_at or datetime.utcnow(),
+            })
+    if new_rows:
+        op.bulk_insert(artwork_files, new_rows)
+
+    with op.batch_alter_table('artworks', schema=None) as batch_op:
+        batch_op.drop_column('design_file_path')
+
+
+def downgrade():
+    with op.batch_alter_table('artworks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('design_file_path', sa.String(length=255), nullable=True))
+
+    conn = op.get_bind()
+    paths = {}
+    for order_id, path in conn.execute(sa.text("SELECT order_id, path FROM artwork_files ORDER BY id")):
+        paths.setdefault(order_id, []).append(path)
+    for order_id, order_paths in paths.items():
+        conn.execute(
+            sa.text("UPDATE artworks SET design_file_path = :paths WHERE order_id = :order_id"),
+            {'paths': ",".join(order_paths), 'order_id': order_id},
+        )
+
+    op.drop_table('artwork_files')
@@ -0,0 +1,30 @@
+"""Add updated_at to artworks, invoices and tasks
+
+Revision ID: 5c1e7a9d3b42
+Revises: 02129095cd72
+Create Date: 2026-10-18 10:12:40.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1e7a9d3b42'
+down_revision = '02129095cd72'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('artworks', 'invoices', 'tasks'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        # Existing rows count as changed "now" so the first ETag is well defined
+        op.execute(f"UPDATE {table} SET updated_at = CURRENT_TIMESTAMP")
+
+
+def downgrade():
+    for table in ('tasks', 'invoices', 'artworks'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('updated_at')
@@ -0,0 +1,27 @@
+"""Add locked_until to idempotency_keys
+
+Revision ID: 6b2f8e4a1d37
+Revises: 3f9a6c1e5b70
+Create Date: 2026-10-18 21:12:40.318265
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6b2f8e4a1d37'
+down_revision = '3f9a6c1e5b70'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing in-progress rows get NULL, which counts as an expired lease
+    with op.batch_alter_table('idempotency_keys', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('locked_until', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('idempotency_keys', schema=None) as batch_op:
+        batch_op.drop_column('locked_until')
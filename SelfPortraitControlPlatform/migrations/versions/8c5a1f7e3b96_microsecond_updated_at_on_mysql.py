@@ -0,0 +1,38 @@
+"""Store updated_at with microseconds on MySQL
+
+Revision ID: 8c5a1f7e3b96
+Revises: 6b2f8e4a1d37
+Create Date: 2026-10-18 21:48:05.771920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = '8c5a1f7e3b96'
+down_revision = '6b2f8e4a1d37'
+branch_labels = None
+depends_on = None
+
+# Columns the collection ETags and the order fragment cache are versioned on
+TABLES = ('order', 'kits', 'artworks', 'invoices', 'tasks')
+
+
+def _alter(type_, existing_type):
+    # SQLite and PostgreSQL already keep microseconds
+    if op.get_context().dialect.name not in ('mysql', 'mariadb'):
+        return
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('updated_at', type_=type_, existing_type=existing_type,
+                                  existing_nullable=True)
+
+
+def upgrade():
+    _alter(mysql.DATETIME(fsp=6), sa.DateTime())
+
+
+def downgrade():
+    _alter(sa.DateTime(), mysql.DATETIME(fsp=6))
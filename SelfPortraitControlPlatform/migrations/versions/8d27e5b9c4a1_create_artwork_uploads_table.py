@@ -0,0 +1,40 @@
+"""Create artwork_uploads table for chunked uploads
+
+Revision ID: 8d27e5b9c4a1
+Revises: f61c3b8a2d94
+Create Date: 2026-10-18 17:11:05.904417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d27e5b9c4a1'
+down_revision = 'f61c3b8a2d94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('artwork_uploads',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('received', sa.BigInteger(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['order.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('order_id', 'filename', name='uq_artwork_uploads_order_id_filename')
+    )
+    with op.batch_alter_table('artwork_uploads', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_artwork_uploads_updated_at'), ['updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('artwork_uploads', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_artwork_uploads_updated_at'))
+
+    op.drop_table('artwork_uploads')
@@ -0,0 +1,30 @@
+"""Create artwork_blobs table for content-addressed artwork storage
+
+Revision ID: b7e04d2f9c13
+Revises: 8d27e5b9c4a1
+Create Date: 2026-10-18 18:24:52.117630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e04d2f9c13'
+down_revision = '8d27e5b9c4a1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('artwork_blobs',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('refcount', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+
+
+def downgrade():
+    op.drop_table('artwork_blobs')
@@ -0,0 +1,86 @@
+"""Add indexes for hot lookup paths
+
+Revision ID: e37b5d0a6c91
+Revises: 9a4f2c6e8d17
+Create Date: 2026-10-18 12:20:05.517834
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e37b5d0a6c91'
+down_revision = '9a4f2c6e8d17'
+branch_labels = None
+depends_on = None
+
+
+def _check_one_invoice_per_order():
+    """
+    ix_invoices_order_id is unique. Orders that already have several invoices
+    would make it fail halfway through (MySQL DDL isn't transactional), so stop
+    before any index is created and say which orders need fixing by hand.
+    """
+    if op.get_context().as_sql:
+        return  # offline: no database to look at
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT order_id, COUNT(*) FROM invoices GROUP BY order_id HAVING COUNT(*) > 1 ORDER BY order_id"
+    )).fetchall()
+    if duplicates:
+        listed = ", ".join(f"order {order_id} ({count} invoices)" for order_id, count in duplicates[:20])
+        more = f" and {len(duplicates) - 20} more" if len(duplicates) > 20 else ""
+        raise RuntimeError(
+            f"Cannot add the unique index ix_invoices_order_id: {len(duplicates)} order(s) have more "
+            f"than one invoice: {listed}{more}. Keep one invoice per order (delete or merge the others), "
+            f"then run the upgrade again."
+        )
+
+
+def upgrade():
+    _check_one_invoice_per_order()
+
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        # Listing filters / keyset pagination, school portal login, ETag + delta sync
+        batch_op.create_index(batch_op.f('ix_order_status'), ['status'], unique=False)
+        batch_op.create_index(batch_op.f('ix_order_created_at'), ['created_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_order_portal_username'), ['portal_username'], unique=False)
+        batch_op.create_index(batch_op.f('ix_order_updated_at'), ['updated_at'], unique=False)
+
+    with op.batch_alter_table('tasks', schema=None) as batch_op:
+        # Task.query.filter_by(order_id=..., task_type=...) in update_order_status
+        batch_op.create_index('ix_tasks_order_id_task_type', ['order_id', 'task_type'], unique=False)
+        batch_op.create_index(batch_op.f('ix_tasks_updated_at'), ['updated_at'], unique=False)
+
+    with op.batch_alter_table('invoices', schema=None) as batch_op:
+        # One invoice per order
+        batch_op.create_index(batch_op.f('ix_invoices_order_id'), ['order_id'], unique=True)
+        batch_op.create_index(batch_op.f('ix_invoices_updated_at'), ['updated_at'], unique=False)
+
+    with op.batch_alter_table('artworks', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_artworks_updated_at'), ['updated_at'], unique=False)
+
+    with op.batch_alter_table('kits', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_kits_updated_at'), ['updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('kits', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_kits_updated_at'))
+
+    with op.batch_alter_table('artworks', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_artworks_updated_at'))
+
+    with op.batch_alter_table('invoices', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_invoices_updated_at'))
+        batch_op.drop_index(batch_op.f('ix_invoices_order_id'))
+
+    with op.batch_alter_table('tasks', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_tasks_updated_at'))
+        batch_op.drop_index('ix_tasks_order_id_task_type')
+
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_order_updated_at'))
+        batch_op.drop_index(batch_op.f('ix_order_portal_username'))
+        batch_op.drop_index(batch_op.f('ix_order_created_at'))
+        batch_op.drop_index(batch_op.f('ix_order_status'))
@@ -0,0 +1,30 @@
+"""Add issued_at and stored PDF columns to invoices
+
+Revision ID: f61c3b8a2d94
+Revises: c2a96e4d0f58
+Create Date: 2026-10-18 16:02:41.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f61c3b8a2d94'
+down_revision = 'c2a96e4d0f58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('invoices', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('issued_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('pdf_path', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('pdf_sha256', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('invoices', schema=None) as batch_op:
+        batch_op.drop_column('pdf_sha256')
+        batch_op.drop_column('pdf_path')
+        batch_op.drop_column('issued_at')
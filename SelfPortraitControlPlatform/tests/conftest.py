@@ -0,0 +1,156 @@
+import importlib.util
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import event
+
+from SelfPortraitControlPlatform.app import create_app, db, trello_integration
+from SelfPortraitControlPlatform.app.cache import order_cache
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'OUTBOX_DISPATCHER_ENABLED': False,
+        'ARTWORK_JANITOR_ENABLED': False,
+        'PRERENDER_ENABLED': False,
+        'PDF_CACHE_FOLDER': str(tmp_path / 'pdf_cache'),
+        'INVOICE_PDF_FOLDER': str(tmp_path / 'invoices'),
+    })
+    with app.app_context():
+        _transactional_sqlite(db.engine)
+        db.create_all()
+        # Module-level caches outlive the app; start each test empty
+        order_cache.backend.clear()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _transactional_sqlite(engine):
+    # pysqlite only opens a transaction before DML, so a SAVEPOINT issued first
+    # would commit on RELEASE; let SQLAlchemy emit BEGIN itself, as MySQL does
+    @event.listens_for(engine, 'connect')
+    def _connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, 'begin')
+    def _begin(connection):
+        connection.exec_driver_sql('BEGIN')
+
+    engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def artwork_folder(app, tmp_path, monkeypatch):
+    """
+    Points artwork storage (order folders and the blob store) at a temp folder.
+    """
+    from SelfPortraitControlPlatform.app import routes
+    from SelfPortraitControlPlatform.app.blob_store import blob_store
+
+    folder = tmp_path / 'artwork'
+    monkeypatch.setattr(routes, 'ARTWORK_UPLOAD_FOLDER', str(folder))
+    monkeypatch.setattr(blob_store, 'directory', None)
+    blob_store.set_directory(str(folder / 'blobs'))
+    return folder
+
+
+def load_migration(revision):
+    """
+    One migration module, loaded on its own (the full chain doesn't run on SQLite).
+    """
+    path, = (Path(__file__).resolve().parent.parent / 'migrations' / 'versions').glob(f'{revision}_*.py')
+    spec = importlib.util.spec_from_file_location(f'migration_{revision}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_migration(engine, step):
+    # step is the module's upgrade or downgrade
+    with engine.begin() as conn:
+        with Operations.context(MigrationContext.configure(conn)):
+            step()
+
+
+def make_order(client, **fields):
+    data = dict(firstName='Ada', surname='Lovelace', organisation='Test School',
+                artPacks='3', product='Self Portrait')
+    data.update(fields)
+    response = client.post('/api/orders', json=data)
+    assert response.status_code == 201, response.data
+    return response.json['order_id']
+
+
+class StubTrello:
+    """
+    Local stand-in for the Trello API: answers the first `fail_first` card
+    requests with `fail_status` (and `fail_headers`), then creates cards.
+    """
+
+    def __init__(self, fail_first=0, fail_status=500, fail_headers=None):
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.fail_headers = fail_headers or {}
+        self.calls = 0
+        self.call_times = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                stub.calls += 1
+                stub.call_times.append(time.monotonic())
+                headers = {}
+                if stub.calls <= stub.fail_first:
+                    status, body, headers = stub.fail_status, b'{"error": "unavailable"}', stub.fail_headers
+                else:
+                    status = 200
+                    body = json.dumps({'id': f'card{stub.calls}',
+                                       'shortUrl': f'https://trello.test/c/{stub.calls}'}).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}/1'
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def trello(monkeypatch):
+    stubs = []
+
+    def start(fail_first=0, **options):
+        stub = StubTrello(fail_first, **options)
+        stubs.append(stub)
+        monkeypatch.setattr(trello_integration, 'TRELLO_API_URL', stub.url)
+        return stub
+
+    yield start
+    for stub in stubs:
+        stub.close()
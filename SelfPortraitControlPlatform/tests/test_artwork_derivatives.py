@@ -0,0 +1,90 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from SelfPortraitControlPlatform.app import derivatives
+from SelfPortraitControlPlatform.app.derivatives import derivative_worker
+from SelfPortraitControlPlatform.app.models import ArtworkFile
+from SelfPortraitControlPlatform.tests.conftest import make_order
+
+
+@pytest.fixture(autouse=True)
+def render_inline(monkeypatch):
+    # Leave rendering to serve_artwork so each test sees it happen
+    monkeypatch.setattr(derivative_worker, 'submit', lambda *args, **kwargs: None)
+
+
+def upload(client, order_id, data, filename):
+    response = client.post(f'/api/orders/{order_id}/artwork/upload', data={
+        'images': [(io.BytesIO(data), filename)],
+    })
+    assert response.status_code == 200
+    return ArtworkFile.query.filter_by(order_id=order_id).order_by(ArtworkFile.id.desc()).first().path
+
+
+def png(width=1200, height=800):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 40, 40)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def test_thumb_is_webp_when_the_browser_accepts_it(client, artwork_folder):
+    entry = upload(client, make_order(client), png(), 'scan.png')
+
+    response = client.get(f'/static/artwork/{entry}?size=thumb',
+                          headers={'Accept': 'image/avif,image/webp,*/*;q=0.8'})
+    assert response.status_code == 200
+    assert response.mimetype == 'image/webp'
+    assert 'Accept' in response.vary
+    with Image.open(io.BytesIO(response.data)) as image:
+        assert image.format == 'WEBP'
+        assert max(image.size) == 256
+
+
+def test_preview_falls_back_to_jpeg(client, artwork_folder):
+    entry = upload(client, make_order(client), png(), 'scan.png')
+
+    for accept in ('image/jpeg,image/png', 'image/webp;q=0, */*'):
+        response = client.get(f'/static/artwork/{entry}?size=preview', headers={'Accept': accept})
+        assert response.status_code == 200
+        assert response.mimetype == 'image/jpeg'
+        with Image.open(io.BytesIO(response.data)) as image:
+            assert image.format == 'JPEG'
+            assert max(image.size) == 1024
+
+
+def test_original_is_the_upload_itself(client, artwork_folder):
+    data = png(300, 200)
+    entry = upload(client, make_order(client), data, 'scan.png')
+
+    for query in ('', '?size=original'):
+        response = client.get(f'/static/artwork/{entry}{query}', headers={'Accept': 'image/webp'})
+        assert response.status_code == 200
+        assert response.data == data
+
+
+def test_unknown_size_is_rejected(client, artwork_folder):
+    entry = upload(client, make_order(client), png(), 'scan.png')
+
+    response = client.get(f'/static/artwork/{entry}?size=huge')
+    assert response.status_code == 400
+    assert 'thumb' in response.get_json()['error']
+
+
+def test_non_image_serves_the_original_and_is_marked_unsupported(client, artwork_folder, monkeypatch):
+    data = b'%PDF-1.4 not really a picture'
+    entry = upload(client, make_order(client), data, 'brief.pdf')
+
+    response = client.get(f'/static/artwork/{entry}?size=thumb', headers={'Accept': 'image/webp'})
+    assert response.status_code == 200
+    assert response.data == data
+    markers = [name for _, _, files in os.walk(artwork_folder / 'blobs') for name in files
+               if name.endswith('.unsupported')]
+    assert len(markers) == 1
+
+    # The marker stops Pillow being asked again
+    monkeypatch.setattr(derivatives.Image, 'open', lambda *args: pytest.fail('re-rendered'))
+    response = client.get(f'/static/artwork/{entry}?size=preview')
+    assert response.data == data
@@ -0,0 +1,109 @@
+import hashlib
+import io
+
+import pytest
+import sqlalchemy as sa
+from PIL import Image
+
+from SelfPortraitControlPlatform.app import db
+from SelfPortraitControlPlatform.app.models import Artwork, ArtworkFile
+from SelfPortraitControlPlatform.tests.conftest import load_migration, make_order, run_migration
+
+
+@pytest.fixture
+def migration(tmp_path, monkeypatch):
+    """
+    The artwork_files migration, loaded on its own with its artwork folder in tmp_path.
+    """
+    module = load_migration('3f9a6c1e5b70')
+    monkeypatch.setattr(module, 'ARTWORK_FOLDER', str(tmp_path / 'artwork'))
+    return module
+
+
+@pytest.fixture
+def engine(tmp_path):
+    # The tables as the previous revision left them
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'migration.db'}")
+    with engine.begin() as conn:
+        conn.execute(sa.text('CREATE TABLE "order" (id INTEGER PRIMARY KEY)'))
+        conn.execute(sa.text(
+            'CREATE TABLE artworks (id INTEGER PRIMARY KEY, order_id INTEGER NOT NULL, '
+            'status VARCHAR(50), design_file_path VARCHAR(255), updated_at DATETIME)'))
+    yield engine
+    engine.dispose()
+
+
+def write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+
+def png(width, height):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def test_upgrade_splits_paths_into_rows(engine, migration, tmp_path):
+    artwork = tmp_path / 'artwork'
+    scan = png(40, 30)
+    write(artwork / '1' / 'a.png', scan)
+    write(artwork / '1' / 'copy.png', scan)  # same content under another name
+    blob = b'stored by hash'
+    sha256 = hashlib.sha256(blob).hexdigest()
+    write(artwork / 'blobs' / sha256[:2] / sha256, blob)
+    with engine.begin() as conn:
+        conn.execute(sa.text('INSERT INTO "order" (id) VALUES (1), (2)'))
+        conn.execute(sa.text(
+            "INSERT INTO artworks (id, order_id, design_file_path, updated_at) VALUES "
+            "(1, 1, :first, '2026-01-02 03:04:05'), (2, 2, '', NULL), (3, 1, '1/a.png', NULL)"
+        ).bindparams(first=f'1/a.png, 1/copy.png,,1/missing.png,blobs/{sha256[:2]}/{sha256}/b.txt'))
+
+    run_migration(engine, migration.upgrade)
+
+    with engine.connect() as conn:
+        rows = conn.execute(sa.text(
+            'SELECT order_id, path, sha256, size, width, height, uploaded_at FROM artwork_files ORDER BY id'
+        )).fetchall()
+        columns = [c['name'] for c in sa.inspect(conn).get_columns('artworks')]
+    assert 'design_file_path' not in columns
+    assert [(r.order_id, r.path) for r in rows] == [
+        (1, '1/a.png'), (1, '1/copy.png'), (1, '1/missing.png'), (1, f'blobs/{sha256[:2]}/{sha256}/b.txt'),
+    ]
+    a, copy, missing, stored = rows
+    assert (a.sha256, a.size, a.width, a.height) == (hashlib.sha256(scan).hexdigest(), len(scan), 40, 30)
+    assert str(a.uploaded_at).startswith('2026-01-02 03:04:05')
+    # Identical content keeps both rows; only the first holds the hash
+    assert copy.sha256 is None and copy.size == len(scan)
+    assert (missing.sha256, missing.size, missing.width) == (None, None, None)
+    assert (stored.sha256, stored.size, stored.width) == (sha256, len(blob), None)
+
+
+def test_downgrade_joins_rows_back_up(engine, migration):
+    with engine.begin() as conn:
+        conn.execute(sa.text('INSERT INTO "order" (id) VALUES (1)'))
+        conn.execute(sa.text("INSERT INTO artworks (id, order_id, design_file_path) VALUES (1, 1, '1/a.png,1/b.png')"))
+
+    run_migration(engine, migration.upgrade)
+    run_migration(engine, migration.downgrade)
+
+    with engine.connect() as conn:
+        assert conn.execute(sa.text('SELECT design_file_path FROM artworks')).scalar() == '1/a.png,1/b.png'
+        assert not sa.inspect(conn).has_table('artwork_files')
+
+
+def test_design_file_path_joins_the_order_files(client):
+    order_id = make_order(client)
+    artwork = Artwork.query.filter_by(order_id=order_id).one()
+    assert artwork.design_file_path is None
+
+    db.session.add_all([
+        ArtworkFile(order_id=order_id, path=f'{order_id}/b.png'),
+        ArtworkFile(order_id=order_id, path=f'{order_id}/a.png'),
+    ])
+    db.session.commit()
+    db.session.expire(artwork)
+    # Upload order, not name order
+    assert artwork.design_file_path == f'{order_id}/b.png,{order_id}/a.png'
+    response = client.get(f'/api/orders/{order_id}')
+    assert response.get_json()['artworks'][0]['design_file_path'] == artwork.design_file_path
@@ -0,0 +1,107 @@
+import io
+
+import pytest
+
+from SelfPortraitControlPlatform.app.derivatives import derivative_worker
+from SelfPortraitControlPlatform.app.models import ArtworkFile
+from SelfPortraitControlPlatform.tests.conftest import make_order
+
+DATA = bytes(range(256)) * 4
+
+
+@pytest.fixture(autouse=True)
+def no_derivatives(monkeypatch):
+    monkeypatch.setattr(derivative_worker, 'submit', lambda *args, **kwargs: None)
+
+
+@pytest.fixture
+def blob_entry(client, artwork_folder):
+    order_id = make_order(client)
+    response = client.post(f'/api/orders/{order_id}/artwork/upload', data={
+        'images': [(io.BytesIO(DATA), 'scan.tif')],
+    })
+    assert response.status_code == 200
+    return ArtworkFile.query.filter_by(order_id=order_id).one().path
+
+
+@pytest.fixture
+def legacy_entry(artwork_folder):
+    # An upload from before the blob store: <order_id>/<name>, not content-addressed
+    (artwork_folder / '7').mkdir()
+    (artwork_folder / '7' / 'scan.tif').write_bytes(DATA)
+    return '7/scan.tif'
+
+
+def test_blob_urls_are_cached_as_immutable(client, app, blob_entry):
+    app.config['ARTWORK_IMMUTABLE_MAX_AGE'] = 600
+
+    response = client.get(f'/static/artwork/{blob_entry}')
+    assert response.status_code == 200
+    assert response.data == DATA
+    assert response.cache_control.public
+    assert response.cache_control.max_age == 600
+    assert response.cache_control.immutable
+    assert response.get_etag()[0] == blob_entry.split('/')[2]  # the sha256
+
+
+def test_legacy_paths_are_revalidated(client, legacy_entry):
+    response = client.get(f'/static/artwork/{legacy_entry}')
+    assert response.status_code == 200
+    assert not response.cache_control.immutable
+    assert response.cache_control.max_age is None
+    assert response.cache_control.no_cache
+
+    etag = response.headers['ETag']
+    response = client.get(f'/static/artwork/{legacy_entry}', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+@pytest.mark.parametrize('entry', ['blob_entry', 'legacy_entry'])
+def test_range_gives_partial_content(client, request, entry):
+    entry = request.getfixturevalue(entry)
+
+    response = client.get(f'/static/artwork/{entry}', headers={'Range': 'bytes=100-199'})
+    assert response.status_code == 206
+    assert response.data == DATA[100:200]
+    assert response.headers['Content-Range'] == f'bytes 100-199/{len(DATA)}'
+    assert response.headers['Accept-Ranges'] == 'bytes'
+
+    response = client.get(f'/static/artwork/{entry}', headers={'Range': f'bytes={len(DATA)}-'})
+    assert response.status_code == 416
+
+
+def test_x_sendfile_hands_the_absolute_path_to_the_proxy(client, app, blob_entry, artwork_folder):
+    app.config['ARTWORK_SENDFILE_MODE'] = 'X-Sendfile'
+
+    response = client.get(f'/static/artwork/{blob_entry}')
+    assert response.status_code == 200
+    assert response.data == b''
+    sha256 = blob_entry.split('/')[2]
+    assert response.headers['X-Sendfile'] == str(artwork_folder / 'blobs' / sha256[:2] / sha256)
+    assert 'X-Accel-Redirect' not in response.headers
+    assert response.cache_control.immutable
+
+
+def test_x_accel_redirect_names_the_internal_location(client, app, legacy_entry):
+    app.config['ARTWORK_SENDFILE_MODE'] = 'x-accel-redirect'
+    app.config['ARTWORK_ACCEL_REDIRECT_PREFIX'] = '/internal/art/'
+
+    response = client.get(f'/static/artwork/{legacy_entry}', headers={'Range': 'bytes=0-9'})
+    # Range is left to nginx
+    assert response.status_code == 200
+    assert response.headers['X-Accel-Redirect'] == '/internal/art/7/scan.tif'
+    assert 'X-Sendfile' not in response.headers
+    assert 'Content-Length' not in response.headers
+    assert response.data == b''
+
+
+@pytest.mark.parametrize('mode', ['x-sendfile', 'x-accel-redirect'])
+def test_proxy_mode_answers_304_itself(client, app, blob_entry, mode):
+    app.config['ARTWORK_SENDFILE_MODE'] = mode
+    etag = client.get(f'/static/artwork/{blob_entry}').headers['ETag']
+
+    response = client.get(f'/static/artwork/{blob_entry}', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert 'X-Sendfile' not in response.headers
+    assert 'X-Accel-Redirect' not in response.headers
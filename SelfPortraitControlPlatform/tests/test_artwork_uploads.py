@@ -0,0 +1,77 @@
+import io
+import os
+
+import pytest
+from sqlalchemy import update
+
+from SelfPortraitControlPlatform.app import artwork_uploads, db
+from SelfPortraitControlPlatform.app.models import ArtworkFile, ArtworkUpload
+from SelfPortraitControlPlatform.tests.conftest import make_order
+
+
+@pytest.fixture(autouse=True)
+def order_limit(app):
+    app.config['ARTWORK_MAX_BYTES_PER_ORDER'] = 1000
+
+
+def _start_upload(client, order_id, size, filename='scan.tif'):
+    response = client.post(f'/api/orders/{order_id}/artwork/uploads',
+                           json={'filename': filename, 'size': size})
+    assert response.status_code == 201
+    return response.get_json()['upload_id']
+
+
+def test_multipart_upload_is_held_to_the_per_order_limit(client, artwork_folder):
+    order_id = make_order(client)
+    _start_upload(client, order_id, 600)  # reserves 600 of the 1000 bytes
+
+    response = client.post(f'/api/orders/{order_id}/artwork/upload', data={
+        'images': [(io.BytesIO(b'a' * 300), 'a.png'), (io.BytesIO(b'b' * 300), 'b.png')],
+    })
+    assert response.status_code == 413
+    assert response.get_json()['limit'] == 1000
+    # Rejected as a whole, nothing left behind but unreferenced blobs for the sweep
+    assert ArtworkFile.query.filter_by(order_id=order_id).count() == 0
+    assert not [name for _, _, files in os.walk(artwork_folder / 'blobs') for name in files
+                if name.endswith('.tmp')]
+
+    response = client.post(f'/api/orders/{order_id}/artwork/upload', data={
+        'images': [(io.BytesIO(b'a' * 300), 'a.png')],
+    })
+    assert response.status_code == 200
+    assert ArtworkFile.query.filter_by(order_id=order_id).count() == 1
+
+
+def test_chunk_for_a_missing_part_file_is_gone_not_a_server_error(client, artwork_folder):
+    order_id = make_order(client)
+    upload_id = _start_upload(client, order_id, 10)
+    os.remove(artwork_folder / str(order_id) / f'.upload-{upload_id}.part')
+
+    response = client.put(f'/api/orders/{order_id}/artwork/uploads/{upload_id}?offset=0', data=b'x' * 10)
+    assert response.status_code == 410
+    assert db.session.get(ArtworkUpload, upload_id) is None
+    # Starting again gives a fresh upload
+    assert _start_upload(client, order_id, 10) != upload_id
+
+
+def test_chunk_recorded_by_another_worker_first_is_a_conflict(client, artwork_folder, monkeypatch):
+    order_id = make_order(client)
+    upload_id = _start_upload(client, order_id, 10)
+    hasher_at = artwork_uploads._hasher_at
+
+    def other_worker_wins(path, upload_id_, offset):
+        # Another process writes the same chunk and records it while this one is writing
+        db.session.execute(update(ArtworkUpload).where(ArtworkUpload.id == upload_id_).values(received=5))
+        return hasher_at(path, upload_id_, offset)
+
+    monkeypatch.setattr(artwork_uploads, '_hasher_at', other_worker_wins)
+    response = client.put(f'/api/orders/{order_id}/artwork/uploads/{upload_id}?offset=0', data=b'x' * 5)
+    assert response.status_code == 409
+    assert response.get_json()['offset'] == 5
+    monkeypatch.setattr(artwork_uploads, '_hasher_at', hasher_at)
+
+    response = client.put(f'/api/orders/{order_id}/artwork/uploads/{upload_id}?offset=5', data=b'y' * 5)
+    assert response.status_code == 200
+    response = client.post(f'/api/orders/{order_id}/artwork/uploads/{upload_id}/finalize', json={})
+    assert response.status_code == 200
+    assert response.get_json()['size'] == 10
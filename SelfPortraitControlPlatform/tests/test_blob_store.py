@@ -0,0 +1,48 @@
+import os
+import time
+
+import pytest
+from sqlalchemy import insert
+
+from SelfPortraitControlPlatform.app import db
+from SelfPortraitControlPlatform.app.blob_store import BlobStore
+from SelfPortraitControlPlatform.app.models import ArtworkBlob
+
+SHA = 'ab' * 32
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(str(tmp_path))
+
+
+def test_add_ref_counts_on_a_row_inserted_concurrently(app, store, monkeypatch):
+    increment = store._increment
+    calls = []
+
+    def racing_increment(sha256):
+        calls.append(sha256)
+        if len(calls) == 1:
+            # Another request's first upload of the same content gets its row in first
+            db.session.execute(insert(ArtworkBlob).values(sha256=sha256, size=3, refcount=1))
+            return False
+        return increment(sha256)
+
+    monkeypatch.setattr(store, '_increment', racing_increment)
+    store.add_ref(SHA, 3)
+    db.session.commit()
+    assert db.session.get(ArtworkBlob, SHA).refcount == 2
+    assert len(calls) == 2
+
+
+def test_ingest_touches_a_moved_in_file(app, store, tmp_path):
+    src = tmp_path / 'upload.part'
+    src.write_bytes(b'abc')
+    hours_ago = time.time() - 3 * 60 * 60
+    os.utime(src, (hours_ago, hours_ago))
+
+    assert store.ingest(str(src), SHA)
+    assert os.path.getmtime(store.path(SHA)) > time.time() - 60
+    # ...so a collect() racing the commit of its reference leaves it alone
+    assert store.collect([SHA]) == 0
+    assert store.exists(SHA)
@@ -0,0 +1,59 @@
+import io
+
+
+def test_bad_field_types_and_lengths_are_row_errors(client):
+    good = dict(firstName='Ada', surname='Lovelace', organisation='School', artPacks='2')
+    rows = [
+        good,
+        dict(good, firstName={'a': 1}),
+        dict(good, organisation=['x']),
+        dict(good, postcode='x' * 51),
+        dict(good, agreeToPromotions={'yes': True}),
+        dict(good, artPacks={'n': 2}),
+        dict(good, phone=7700900123),
+    ]
+    response = client.post('/api/orders/bulk', json=rows)
+
+    assert response.status_code == 201
+    statuses = [r['status'] for r in response.json['results']]
+    assert statuses == ['created', 'error', 'error', 'error', 'error', 'error', 'created']
+    assert 'postcode' in response.json['results'][3]['error']
+    assert response.json['created'] == 2
+
+    order_id = response.json['results'][6]['order_id']
+    assert client.get(f'/api/orders/{order_id}').json['phone'] == '7700900123'
+
+
+def _upload_csv(client, text, encoding='utf-8-sig'):
+    return client.post('/api/orders/bulk', data={'file': (io.BytesIO(text.encode(encoding)), 'orders.csv')})
+
+
+def test_csv_upload_creates_orders_and_reports_bad_rows(client):
+    text = (
+        "firstName,surname,organisation,artPacks,freeSample,agreeToPromotions,postcode\n"
+        "Ada,Lovelace,First School,3,true,yes,AB1 2CD\n"
+        "Alan,Turing,Second School,many,false,no,AB1 2CD\n"
+        "Grace,Hopper,Third School,2,,maybe,AB1 2CD\n"
+        f"Joan,Clarke,Fourth School,1,no,,{'x' * 51}\n"
+        "Mary,Somerville,Fifth School,,0,1,\n"
+    )
+    response = _upload_csv(client, text)
+
+    assert response.status_code == 201
+    results = response.json['results']
+    assert [r['status'] for r in results] == ['created', 'error', 'error', 'error', 'created']
+    assert 'artPacks' in results[1]['error']
+    assert 'postcode' in results[3]['error']
+    assert (response.json['created'], response.json['failed']) == (2, 3)
+
+    first = client.get(f"/api/orders/{results[0]['order_id']}").json
+    assert (first['school_name'], first['art_packs'], first['free_sample'], first['agree_to_promotions']) == \
+        ('First School', 3, True, True)
+    last = client.get(f"/api/orders/{results[4]['order_id']}").json
+    assert (last['art_packs'], last['free_sample'], last['agree_to_promotions'], last['postcode']) == \
+        (0, False, True, '')
+
+
+def test_csv_upload_must_be_utf8_with_rows(client):
+    assert _upload_csv(client, "firstName\nZoë\n", encoding='latin-1').status_code == 400
+    assert _upload_csv(client, "firstName,surname\n").status_code == 400
@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy.dialects import mysql
+
+from SelfPortraitControlPlatform.app import db
+from SelfPortraitControlPlatform.app.models import Artwork, Invoice, Kit, Order, Task
+from SelfPortraitControlPlatform.tests.conftest import make_order
+
+
+def _etag(client, url='/api/orders'):
+    response = client.get(url)
+    assert response.status_code == 200
+    return response.headers['ETag']
+
+
+def test_unchanged_collection_is_a_304(client):
+    make_order(client)
+    response = client.get('/api/orders')
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+    again = client.get('/api/orders', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.headers['ETag'] == etag
+    # If-Modified-Since alone never short-circuits (deletes don't move it)
+    assert client.get('/api/orders', headers={'If-Modified-Since': response.headers['Last-Modified']}) \
+        .status_code == 200
+
+
+def test_update_changes_the_etag(client):
+    order_id = make_order(client)
+    etag = _etag(client)
+    response = client.patch(f'/api/orders/{order_id}/status', json={'status': 'Kit Prepared'})
+    assert response.status_code == 200
+    assert client.get('/api/orders', headers={'If-None-Match': etag}).status_code == 200
+    assert _etag(client) != etag
+
+
+def test_update_in_the_same_second_changes_the_etag(client):
+    first, second = make_order(client), make_order(client)
+    same_second = datetime.utcnow().replace(microsecond=0)
+    db.session.get(Order, first).updated_at = same_second.replace(microsecond=100)
+    db.session.get(Order, second).updated_at = same_second.replace(microsecond=200)
+    db.session.commit()
+    etag = _etag(client)
+
+    # No row added or removed, and the new max is in the same second as the old one
+    db.session.get(Order, first).updated_at = same_second.replace(microsecond=300)
+    db.session.commit()
+    assert _etag(client) != etag
+
+
+@pytest.mark.parametrize('model', [Order, Kit, Artwork, Invoice, Task])
+def test_updated_at_keeps_microseconds_on_mysql(model):
+    column_type = model.__table__.c.updated_at.type.dialect_impl(mysql.dialect())
+    assert column_type.compile(dialect=mysql.dialect()) == 'DATETIME(6)'
+
+
+def test_delete_changes_the_etag(client):
+    order_id = make_order(client)
+    for description in ('Call school', 'Chase invoice'):
+        assert client.post('/api/tasks', json={'description': description, 'order_id': order_id}) \
+            .status_code == 201
+    etag = _etag(client, '/api/tasks')
+    task_id = Task.query.first().id
+    assert client.delete(f'/api/tasks/{task_id}').status_code == 200
+    # max(updated_at) is unchanged; the row count moves the ETag
+    assert client.get('/api/tasks', headers={'If-None-Match': etag}).status_code == 200
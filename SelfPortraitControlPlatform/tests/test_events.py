@@ -0,0 +1,61 @@
+import queue
+
+from SelfPortraitControlPlatform.app.events import EventBroker
+
+
+def _drain(q):
+    events = []
+    while True:
+        try:
+            events.append(q.get_nowait())
+        except queue.Empty:
+            return events
+
+
+def test_publish_fans_out_to_every_subscriber():
+    broker = EventBroker()
+    subscribers = [broker.subscribe()[0] for _ in range(50)]
+    assert broker.subscriber_count == 50
+
+    broker.publish('order_status', {'order_id': 1, 'status': 'Kit Prepared'})
+    broker.publish('task_created', {'task_id': 7})
+
+    for q in subscribers:
+        assert [(event_type, data) for _, event_type, data in _drain(q)] == [
+            ('order_status', {'order_id': 1, 'status': 'Kit Prepared'}),
+            ('task_created', {'task_id': 7}),
+        ]
+
+    for q in subscribers:
+        broker.unsubscribe(q)
+    assert broker.subscriber_count == 0
+
+
+def test_reconnect_replays_events_after_last_event_id():
+    broker = EventBroker()
+    first = broker.publish('a', {})
+    broker.publish('b', {})
+    broker.publish('c', {})
+
+    _, replay = broker.subscribe(first)
+    assert [event_type for _, event_type, _ in replay] == ['b', 'c']
+
+
+def test_event_id_from_another_process_forces_resync():
+    broker, other_worker = EventBroker(), EventBroker()
+    broker.publish('a', {})
+    foreign_id = other_worker.publish('x', {})
+
+    _, replay = broker.subscribe(foreign_id)
+    assert replay is None
+    _, replay = broker.subscribe('not-an-id')
+    assert replay is None
+
+
+def test_stream_sends_resync_for_foreign_id():
+    broker = EventBroker()
+    stream = broker.stream('deadbeef-1')
+    assert next(stream).startswith('retry:')
+    assert f"id: {broker.nonce}-0\nevent: resync\n" in next(stream)
+    stream.close()
+    assert broker.subscriber_count == 0
@@ -0,0 +1,72 @@
+import csv
+import io
+import json
+
+from openpyxl import load_workbook
+
+from SelfPortraitControlPlatform.app import db, routes
+from SelfPortraitControlPlatform.app.models import Order
+from SelfPortraitControlPlatform.app.routes import EXPORT_COLUMNS
+from SelfPortraitControlPlatform.tests.conftest import make_order
+
+
+def _orders(client):
+    first = make_order(client, organisation='Alpha School', phone='0123')
+    second = make_order(client, organisation='Beta School')
+    db.session.get(Order, second).quantities = json.dumps({'A4': 30})
+    db.session.commit()
+    return first, second
+
+
+def _export(client, export_format, **params):
+    response = client.get('/api/orders/export', query_string=dict(params, format=export_format))
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'] == f'attachment; filename=orders_export.{export_format}'
+    return response
+
+
+def test_ndjson_export_has_one_object_per_order(client):
+    first, second = _orders(client)
+    response = _export(client, 'ndjson')
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [r['id'] for r in rows] == [first, second]
+    assert set(rows[0]) == set(EXPORT_COLUMNS)
+    assert rows[0]['school_name'] == 'Alpha School'
+    assert rows[0]['quantities'] == 'Unconfirmed'
+    assert rows[1]['quantities'] == {'A4': 30}
+    assert rows[0]['invoice_status'] == 'Ungenerated'
+
+
+def test_csv_export_has_a_header_and_a_row_per_order(client):
+    first, second = _orders(client)
+    response = _export(client, 'csv')
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == list(EXPORT_COLUMNS)
+    assert [int(r[0]) for r in rows[1:]] == [first, second]
+    record = dict(zip(rows[0], rows[1]))
+    assert (record['school_name'], record['phone']) == ('Alpha School', '0123')
+
+
+def test_xlsx_export_matches_the_csv(client):
+    first, second = _orders(client)
+    workbook = load_workbook(io.BytesIO(_export(client, 'xlsx').data), read_only=True)
+    rows = list(workbook['Orders'].values)
+    assert list(rows[0]) == list(EXPORT_COLUMNS)
+    assert [r[0] for r in rows[1:]] == [first, second]
+    assert rows[2][EXPORT_COLUMNS.index('school_name')] == 'Beta School'
+
+
+def test_export_applies_filters_and_rejects_bad_input(client):
+    _, second = _orders(client)
+    rows = _export(client, 'ndjson', school_name='Beta').get_data(as_text=True).splitlines()
+    assert [json.loads(r)['id'] for r in rows] == [second]
+    assert client.get('/api/orders/export?format=pdf').status_code == 400
+    assert client.get('/api/orders/export?free_sample=maybe').status_code == 400
+
+
+def test_export_reads_in_batches(client, monkeypatch):
+    monkeypatch.setattr(routes, 'EXPORT_BATCH_SIZE', 1)
+    ids = [make_order(client) for _ in range(3)]
+    rows = _export(client, 'ndjson').get_data(as_text=True).splitlines()
+    assert [json.loads(r)['id'] for r in rows] == ids
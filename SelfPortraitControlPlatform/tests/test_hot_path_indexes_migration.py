@@ -0,0 +1,52 @@
+import pytest
+import sqlalchemy as sa
+
+from SelfPortraitControlPlatform.tests.conftest import load_migration, run_migration
+
+
+@pytest.fixture
+def engine(tmp_path):
+    # The tables this migration indexes, as the previous revision left them
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'migration.db'}")
+    with engine.begin() as conn:
+        conn.execute(sa.text(
+            'CREATE TABLE "order" (id INTEGER PRIMARY KEY, status VARCHAR(50), created_at DATETIME, '
+            'portal_username VARCHAR(100), updated_at DATETIME)'))
+        conn.execute(sa.text(
+            'CREATE TABLE tasks (id INTEGER PRIMARY KEY, order_id INTEGER, task_type VARCHAR(50), '
+            'updated_at DATETIME)'))
+        conn.execute(sa.text('CREATE TABLE invoices (id INTEGER PRIMARY KEY, order_id INTEGER, updated_at DATETIME)'))
+        conn.execute(sa.text('CREATE TABLE artworks (id INTEGER PRIMARY KEY, order_id INTEGER, updated_at DATETIME)'))
+        conn.execute(sa.text('CREATE TABLE kits (id INTEGER PRIMARY KEY, order_id INTEGER, updated_at DATETIME)'))
+    yield engine
+    engine.dispose()
+
+
+def indexes(engine, table):
+    with engine.connect() as conn:
+        return {index['name']: index['unique'] for index in sa.inspect(conn).get_indexes(table)}
+
+
+def test_upgrade_adds_one_invoice_per_order_index(engine):
+    with engine.begin() as conn:
+        conn.execute(sa.text('INSERT INTO invoices (order_id) VALUES (1), (2)'))
+
+    run_migration(engine, load_migration('e37b5d0a6c91').upgrade)
+
+    assert indexes(engine, 'invoices')['ix_invoices_order_id']
+    assert 'ix_order_status' in indexes(engine, 'order')
+
+
+def test_upgrade_stops_before_any_index_if_an_order_has_two_invoices(engine):
+    with engine.begin() as conn:
+        conn.execute(sa.text('INSERT INTO invoices (order_id) VALUES (1), (2), (2), (3), (3), (3)'))
+
+    with pytest.raises(RuntimeError) as error:
+        run_migration(engine, load_migration('e37b5d0a6c91').upgrade)
+
+    message = str(error.value)
+    assert '2 order(s)' in message
+    assert 'order 2 (2 invoices), order 3 (3 invoices)' in message
+    assert 'order 1 ' not in message
+    assert indexes(engine, 'order') == {}
+    assert indexes(engine, 'invoices') == {}
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+from flask import jsonify
+
+from SelfPortraitControlPlatform.app import db
+from SelfPortraitControlPlatform.app.idempotency import idempotent
+from SelfPortraitControlPlatform.app.models import IdempotencyKey, Order
+
+ORDER = dict(firstName='Ada', surname='Lovelace', organisation='Test School',
+             artPacks='3', product='Self Portrait')
+
+
+def _post(client, key, **fields):
+    return client.post('/api/orders', json=dict(ORDER, **fields), headers={'Idempotency-Key': key})
+
+
+def test_retry_replays_the_stored_response(client):
+    first = _post(client, 'k1')
+    assert first.status_code == 201
+    assert 'Idempotent-Replayed' not in first.headers
+
+    retry = _post(client, 'k1')
+    assert retry.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_json() == first.get_json()
+    assert Order.query.count() == 1
+
+
+def test_same_key_with_a_different_body_is_rejected(client):
+    assert _post(client, 'k1').status_code == 201
+    assert _post(client, 'k1', organisation='Other School').status_code == 422
+    assert Order.query.count() == 1
+
+
+def test_retry_while_the_first_request_runs_is_a_conflict(client):
+    assert _post(client, 'k1').status_code == 201
+    record = IdempotencyKey.query.one()
+    # Back to "still running", as if the first response hadn't been stored yet
+    record.status_code = None
+    record.locked_until = datetime.utcnow() + timedelta(minutes=1)
+    db.session.commit()
+
+    response = _post(client, 'k1')
+    assert response.status_code == 409
+    assert Order.query.count() == 1
+
+
+def test_retry_takes_over_a_key_whose_request_died(client):
+    _post(client, 'k1')
+    record = IdempotencyKey.query.one()
+    # The worker was killed mid-request: placeholder left, lease run out
+    record.status_code = None
+    record.locked_until = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+    response = _post(client, 'k1')
+    assert response.status_code == 201
+    assert 'Idempotent-Replayed' not in response.headers
+    db.session.expire_all()
+    record = IdempotencyKey.query.one()
+    assert (record.status_code, record.locked_until) == (201, None)
+    assert _post(client, 'k1').headers['Idempotent-Replayed'] == 'true'
+
+
+def test_server_errors_are_not_stored(app):
+    calls = []
+
+    @idempotent
+    def flaky():
+        calls.append(1)
+        return jsonify({"error": "boom"}), 500 if len(calls) == 1 else 200
+
+    app.add_url_rule('/test/flaky', 'flaky', flaky, methods=['POST'])
+    client = app.test_client()
+
+    assert client.post('/test/flaky', headers={'Idempotency-Key': 'k1'}).status_code == 500
+    assert IdempotencyKey.query.count() == 0
+    retry = client.post('/test/flaky', headers={'Idempotency-Key': 'k1'})
+    assert retry.status_code == 200
+    assert 'Idempotent-Replayed' not in retry.headers
+    assert len(calls) == 2
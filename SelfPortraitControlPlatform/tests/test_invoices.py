@@ -0,0 +1,84 @@
+import hashlib
+import os
+
+from SelfPortraitControlPlatform.app import db
+from SelfPortraitControlPlatform.app.invoice_store import invoice_store
+from SelfPortraitControlPlatform.app.models import Invoice
+from SelfPortraitControlPlatform.tests.conftest import make_order
+
+
+def _invoice(order_id):
+    db.session.expire_all()
+    return Invoice.query.filter_by(order_id=order_id).one()
+
+
+def _stored_files():
+    return [name for _, _, files in os.walk(invoice_store.directory) for name in files]
+
+
+def _issue(client, order_id, status='Generated'):
+    invoice = _invoice(order_id)
+    response = client.patch(f'/api/invoices/{invoice.id}/status', json={'status': status})
+    assert response.status_code == 200
+    return _invoice(order_id)
+
+
+def test_pdf_is_stored_when_the_invoice_is_issued(client):
+    order_id = make_order(client)
+    assert _invoice(order_id).pdf_path is None
+
+    invoice = _issue(client, order_id)
+    assert invoice.issued_at is not None
+    with open(invoice_store.full_path(invoice.pdf_path), 'rb') as f:
+        assert hashlib.sha256(f.read()).hexdigest() == invoice.pdf_sha256
+
+
+def test_regenerating_unchanged_data_keeps_the_sha256(client):
+    invoice = _issue(client, make_order(client))
+    response = client.post(f'/api/invoices/{invoice.id}/regenerate', json={})
+    assert response.status_code == 200
+    assert response.get_json()['pdf_sha256'] == invoice.pdf_sha256
+    assert len(_stored_files()) == 1
+
+
+def test_stored_pdf_download_supports_etag_and_range(client):
+    invoice = _issue(client, make_order(client))
+    url = f'/api/invoices/{invoice.id}/download'
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.data[:5] == b'%PDF-'
+    assert response.headers['ETag'] == f'"{invoice.pdf_sha256}"'
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+
+    assert client.get(url, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+    partial = client.get(url, headers={'Range': 'bytes=0-9'})
+    assert partial.status_code == 206
+    assert partial.data == response.data[:10]
+
+
+def test_legacy_invoice_download_renders_without_storing(client):
+    order_id = make_order(client)
+    invoice = _invoice(order_id)
+    invoice.status = 'Generated'  # issued before PDFs were stored
+    db.session.commit()
+
+    response = client.get(f'/api/invoices/{invoice.id}/download')
+    assert response.status_code == 200
+    assert response.data[:5] == b'%PDF-'
+    assert _invoice(order_id).pdf_path is None
+    assert _stored_files() == []
+
+
+def test_legacy_invoices_are_backfilled_by_status_change_and_cli(app, client):
+    by_status, by_cli, draft = make_order(client), make_order(client), make_order(client)
+    for order_id in (by_status, by_cli):
+        _invoice(order_id).status = 'Generated'
+    db.session.commit()
+
+    assert _issue(client, by_status, 'Invoice Sent').pdf_path is not None
+
+    result = app.test_cli_runner().invoke(args=['store-invoice-pdfs'])
+    assert 'Stored 1 invoice PDF(s)' in result.output
+    assert invoice_store.has_pdf(_invoice(by_cli))
+    assert _invoice(draft).pdf_path is None
@@ -0,0 +1,95 @@
+import hashlib
+import os
+import time
+
+import pytest
+
+from SelfPortraitControlPlatform.app import db
+from SelfPortraitControlPlatform.app.blob_store import blob_store
+from SelfPortraitControlPlatform.app.janitor import JANITOR_SWEEP_GRACE_SECONDS, artwork_janitor
+from SelfPortraitControlPlatform.app.models import ArtworkFile, Order
+from SelfPortraitControlPlatform.tests.conftest import make_order
+
+OLD = time.time() - JANITOR_SWEEP_GRACE_SECONDS - 60
+
+
+@pytest.fixture
+def janitor(artwork_folder, monkeypatch):
+    monkeypatch.setattr(artwork_janitor, 'artwork_folder', str(artwork_folder))
+    return artwork_janitor
+
+
+def order_folder(artwork_folder, order_id, mtime=OLD):
+    folder = artwork_folder / str(order_id)
+    folder.mkdir(exist_ok=True)
+    (folder / 'scan.png').write_bytes(b'scan')
+    os.utime(folder, (mtime, mtime))
+    return folder
+
+
+def close(order_id):
+    db.session.get(Order, order_id).status = 'Closed'
+    db.session.commit()
+
+
+def blob(data, mtime=OLD):
+    sha256 = hashlib.sha256(data).hexdigest()
+    path = blob_store.path(sha256)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_sweep_removes_folders_of_gone_and_cleared_orders(client, artwork_folder, janitor):
+    closed = make_order(client)
+    close(closed)
+    gone = order_folder(artwork_folder, 999)
+    cleared = order_folder(artwork_folder, closed)
+
+    assert janitor.sweep() == 2
+    assert not gone.exists()
+    assert not cleared.exists()
+
+
+def test_sweep_leaves_folders_within_the_grace_period(client, artwork_folder, janitor):
+    closed = make_order(client)
+    close(closed)
+    recent = order_folder(artwork_folder, closed, mtime=time.time() - 60)
+    not_an_order = artwork_folder / 'misc'
+    not_an_order.mkdir()
+    os.utime(not_an_order, (OLD, OLD))
+
+    assert janitor.sweep() == 0
+    assert recent.exists()
+    assert not_an_order.exists()
+
+
+def test_sweep_leaves_folders_still_in_use(client, artwork_folder, janitor):
+    active = make_order(client)
+    with_upload = make_order(client)
+    with_legacy_file = make_order(client)
+    response = client.post(f'/api/orders/{with_upload}/artwork/uploads', json={'filename': 'big.tif', 'size': 10})
+    assert response.status_code == 201
+    db.session.add(ArtworkFile(order_id=with_legacy_file, path=f'{with_legacy_file}/scan.png'))
+    db.session.commit()
+    close(with_upload)
+    close(with_legacy_file)
+    folders = [order_folder(artwork_folder, order_id) for order_id in (active, with_upload, with_legacy_file)]
+
+    assert janitor.sweep() == 0
+    assert all(folder.exists() for folder in folders)
+
+
+def test_sweep_removes_unreferenced_blobs_and_stale_temp_files(client, artwork_folder, janitor):
+    orphan = blob(b'nobody points here')
+    recent = blob(b'just written', mtime=time.time())
+    stale_tmp = artwork_folder / 'blobs' / 'upload-1.tmp'
+    stale_tmp.write_bytes(b'half')
+    os.utime(stale_tmp, (OLD, OLD))
+
+    assert janitor.sweep() == 2
+    assert not os.path.exists(orphan)
+    assert not stale_tmp.exists()
+    assert os.path.exists(recent)
@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from SelfPortraitControlPlatform.app import db
+from SelfPortraitControlPlatform.app.models import Invoice
+from SelfPortraitControlPlatform.tests.conftest import make_order
+
+
+def _invoice_status(client, order_id):
+    orders = client.get('/api/orders').json['orders']
+    return next(o for o in orders if o['id'] == order_id)['invoice']['status']
+
+
+def test_listing_sees_invoice_change_made_without_invalidate(client):
+    order_id = make_order(client)
+    assert _invoice_status(client, order_id) == 'Ungenerated'  # now cached
+
+    # As if another worker committed it: this process's cache is never invalidated
+    invoice = Invoice.query.filter_by(order_id=order_id).one()
+    invoice.status = 'Invoice Paid'
+    db.session.commit()
+
+    assert _invoice_status(client, order_id) == 'Invoice Paid'
+
+
+def test_same_second_change_from_another_worker_is_not_served_stale(client):
+    order_id = make_order(client)
+    same_second = datetime.utcnow().replace(microsecond=0)
+    invoice = Invoice.query.filter_by(order_id=order_id).one()
+    invoice.updated_at = same_second.replace(microsecond=100)
+    db.session.commit()
+    assert _invoice_status(client, order_id) == 'Ungenerated'  # cached at this version
+
+    # Another worker changes the invoice within the same second
+    invoice.status = 'Invoice Sent'
+    invoice.updated_at = same_second.replace(microsecond=200)
+    db.session.commit()
+
+    assert _invoice_status(client, order_id) == 'Invoice Sent'
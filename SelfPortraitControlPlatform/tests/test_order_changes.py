@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+from SelfPortraitControlPlatform.app import db
+from SelfPortraitControlPlatform.app.models import Invoice, Order, Tombstone
+from SelfPortraitControlPlatform.app.routes import SYNC_TOKEN_OVERLAP, _decode_sync_token, _encode_sync_token
+from SelfPortraitControlPlatform.tests.conftest import make_order
+
+
+def _changes(client, since=None):
+    response = client.get('/api/orders/changes', query_string={'since': since} if since else {})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def _ids(rows):
+    return sorted(row['id'] for row in rows)
+
+
+def test_seed_without_since_returns_everything_and_no_tombstones(client):
+    order_ids = [make_order(client), make_order(client)]
+    invoice = Invoice.query.filter_by(order_id=order_ids[0]).one()
+    db.session.delete(invoice)
+    db.session.commit()
+
+    before = datetime.utcnow()
+    data = _changes(client)
+    assert _ids(data['orders']) == order_ids
+    assert [i['order_id'] for i in data['invoices']] == [order_ids[1]]
+    assert data['deleted'] == []
+    # The token is set back by the overlap window
+    token_time = _decode_sync_token(data['next_token'])
+    assert before - SYNC_TOKEN_OVERLAP - timedelta(seconds=1) <= token_time <= before - SYNC_TOKEN_OVERLAP + timedelta(seconds=5)
+
+
+def test_since_is_inclusive_and_skips_older_rows(client):
+    old, boundary, recent = make_order(client), make_order(client), make_order(client)
+    since = datetime.utcnow().replace(microsecond=0) - timedelta(hours=1)
+    db.session.get(Order, old).updated_at = since - timedelta(seconds=1)
+    db.session.get(Order, boundary).updated_at = since
+    db.session.commit()
+
+    data = _changes(client, _encode_sync_token(since))
+    assert _ids(data['orders']) == [boundary, recent]
+
+
+def test_row_committed_after_the_previous_sync_is_not_missed(client):
+    seed = _changes(client)
+    # Stamped (flushed) before that sync ran, but only committed now
+    order_id = make_order(client)
+    db.session.get(Order, order_id).updated_at = datetime.utcnow() - SYNC_TOKEN_OVERLAP / 2
+    db.session.commit()
+
+    data = _changes(client, seed['next_token'])
+    assert _ids(data['orders']) == [order_id]
+
+
+def test_deletes_come_back_as_tombstones(client):
+    order_id = make_order(client)
+    token = _changes(client)['next_token']
+    invoice = Invoice.query.filter_by(order_id=order_id).one()
+    invoice_id = invoice.id
+    db.session.delete(invoice)
+    db.session.commit()
+
+    assert Tombstone.query.count() == 1
+    data = _changes(client, token)
+    assert data['deleted'] == [{'type': 'invoice', 'id': invoice_id, 'order_id': order_id}]
+    assert data['invoices'] == []
+
+
+def test_malformed_token_is_rejected(client):
+    response = client.get('/api/orders/changes?since=not-a-token')
+    assert response.status_code == 400
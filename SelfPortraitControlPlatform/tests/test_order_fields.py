@@ -0,0 +1,50 @@
+from SelfPortraitControlPlatform.app.cache import order_cache
+from SelfPortraitControlPlatform.tests.conftest import make_order
+from SelfPortraitControlPlatform.tests.test_order_listing_queries import count_queries
+
+
+def test_projection_returns_only_the_requested_keys(client):
+    make_order(client)
+    data = client.get('/api/orders?fields=id,school_name,invoice.status,artworks.id').get_json()
+    order = data['orders'][0]
+    assert set(order) == {'id', 'school_name', 'invoice', 'artworks'}
+    assert order['school_name'] == 'Test School'
+    assert order['invoice'] == {'status': 'Ungenerated'}
+    assert all(set(a) == {'id'} for a in order['artworks'])
+
+
+def test_bare_child_name_selects_all_its_fields(client):
+    make_order(client)
+    order = client.get('/api/orders?fields=id,invoice').get_json()['orders'][0]
+    assert set(order['invoice']) == {'id', 'status', 'amount'}
+
+
+def test_unknown_fields_are_rejected(client):
+    for fields in ('nope', 'invoice.nope', 'status.id', 'artworks.files'):
+        response = client.get(f'/api/orders?fields={fields}')
+        assert response.status_code == 400
+        assert 'Unknown field' in response.get_json()['error']
+
+
+def test_children_load_only_the_requested_columns(client):
+    make_order(client)
+    order_cache.backend.clear()
+    with count_queries() as statements:
+        assert client.get('/api/orders?fields=id,invoice.status').status_code == 200
+    # (The ETag's count/max query touches every table; only row loads matter here)
+    invoice_selects = [s for s in statements if s.startswith('SELECT invoices.')]
+    assert invoice_selects
+    assert all('invoices.amount' not in s for s in invoice_selects)
+    assert not [s for s in statements if s.startswith('SELECT artworks.')]
+
+
+def test_single_order_supports_the_same_projection(client):
+    order_id = make_order(client)
+    full = client.get(f'/api/orders/{order_id}').get_json()
+    assert full['id'] == order_id and 'invoice' in full and 'email' in full
+
+    projected = client.get(f'/api/orders/{order_id}?fields=id,status,artworks.design_file_path')
+    assert projected.status_code == 200
+    assert set(projected.get_json()) == {'id', 'status', 'artworks'}
+    assert client.get(f'/api/orders/{order_id}?fields=bogus').status_code == 400
+    assert client.get('/api/orders/999999?fields=id').status_code == 404
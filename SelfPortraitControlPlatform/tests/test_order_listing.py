@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+from SelfPortraitControlPlatform.app import db, routes
+from SelfPortraitControlPlatform.app.models import Order
+from SelfPortraitControlPlatform.tests.conftest import make_order
+
+
+def _orders_with_created_at(client, stamps, **fields):
+    ids = []
+    for created_at in stamps:
+        order_id = make_order(client, **fields)
+        db.session.get(Order, order_id).created_at = created_at
+        ids.append(order_id)
+    db.session.commit()
+    return ids
+
+
+def _walk(client, **params):
+    ids, cursor, pages = [], None, 0
+    while True:
+        query = dict(params, **({'cursor': cursor} if cursor else {}))
+        response = client.get('/api/orders', query_string=query)
+        assert response.status_code == 200
+        data = response.get_json()
+        ids += [o['id'] for o in data['orders']]
+        pages += 1
+        cursor = data['next_cursor']
+        if cursor is None:
+            return ids, pages
+
+
+def test_cursor_walks_every_order_once_across_created_at_ties(client):
+    now = datetime(2026, 5, 1, 12, 0, 0)
+    # Three orders share a created_at, straddling page boundaries
+    ids = _orders_with_created_at(client, [now - timedelta(days=2), now, now, now, now - timedelta(days=1)])
+    expected = sorted(ids, key=lambda i: (db.session.get(Order, i).created_at, i), reverse=True)
+
+    walked, pages = _walk(client, limit=2)
+    assert walked == expected
+    assert pages == 3
+
+
+def test_orders_without_created_at_are_only_in_the_full_list(client):
+    dated = _orders_with_created_at(client, [datetime(2026, 5, 1)])
+    undated = _orders_with_created_at(client, [None])
+    assert _walk(client)[0] == dated
+    assert sorted(o['id'] for o in client.get('/api/orders?all=true').get_json()) == dated + undated
+
+
+def test_limit_is_capped_and_validated(client, monkeypatch):
+    monkeypatch.setattr(routes, 'ORDERS_MAX_PAGE_SIZE', 2)
+    _orders_with_created_at(client, [datetime(2026, 5, d) for d in (1, 2, 3)])
+    data = client.get('/api/orders?limit=1000').get_json()
+    assert len(data['orders']) == 2 and data['next_cursor']
+
+    assert client.get('/api/orders?limit=0').status_code == 400
+    assert client.get('/api/orders?limit=ten').status_code == 400
+    assert client.get('/api/orders?cursor=garbage!').status_code == 400
+
+
+def test_filters_apply_on_every_page(client):
+    stamps = [datetime(2026, 5, d) for d in range(1, 6)]
+    kit = _orders_with_created_at(client, stamps, product='Kit')
+    _orders_with_created_at(client, stamps, product='Self Portrait')
+
+    walked, _ = _walk(client, limit=2, product='Kit')
+    assert walked == list(reversed(kit))
+
+    walked, _ = _walk(client, limit=2, product='Kit', created_from='2026-05-02', created_to='2026-05-04')
+    assert walked == list(reversed(kit[1:4]))
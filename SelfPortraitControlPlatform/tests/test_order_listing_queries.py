@@ -0,0 +1,47 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from SelfPortraitControlPlatform.app import db
+from SelfPortraitControlPlatform.app.cache import order_cache
+from SelfPortraitControlPlatform.tests.conftest import make_order
+
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def _queries_for(client, url):
+    # Cold fragment cache, so every order's children are loaded
+    order_cache.backend.clear()
+    with count_queries() as statements:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(statements)
+
+
+@pytest.mark.parametrize('url', [
+    '/api/orders',
+    '/api/orders?all=true',
+    '/api/orders?fields=id,status,invoice.status,artworks.design_file_path',
+])
+def test_order_listing_query_count_does_not_grow_with_orders(client, url):
+    make_order(client)
+    few = _queries_for(client, url)
+
+    for i in range(25):
+        make_order(client, organisation=f'School {i}')
+    many = _queries_for(client, url)
+
+    assert many == few
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+
+from SelfPortraitControlPlatform.app import db
+from SelfPortraitControlPlatform.app.models import Order, OutboxMessage
+from SelfPortraitControlPlatform.app.outbox import (
+    OUTBOX_BACKOFF_BASE, OUTBOX_LEASE, OUTBOX_MAX_ATTEMPTS, enqueue, outbox_dispatcher,
+)
+from SelfPortraitControlPlatform.tests.conftest import make_order
+
+
+def _enqueue_card(client):
+    order_id = make_order(client)
+    message = enqueue('trello.create_card', order_id=order_id)
+    db.session.commit()
+    return order_id, message.id
+
+
+def _message(message_id):
+    db.session.expire_all()
+    return db.session.get(OutboxMessage, message_id)
+
+
+def _make_due(message_id):
+    # Stands in for waiting out the backoff / lease
+    OutboxMessage.query.filter_by(id=message_id).update(
+        {'next_attempt_at': datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+
+
+def test_failed_message_is_retried_with_exponential_backoff(client, trello):
+    stub = trello(fail_first=2)
+    order_id, message_id = _enqueue_card(client)
+
+    for attempt in (1, 2):
+        before = datetime.utcnow()
+        assert outbox_dispatcher.dispatch_due() == 1
+        message = _message(message_id)
+        assert (message.status, message.attempts) == ('pending', attempt)
+        assert message.last_error
+        expected_delay = timedelta(seconds=OUTBOX_BACKOFF_BASE * 2 ** (attempt - 1))
+        assert before + expected_delay <= message.next_attempt_at <= datetime.utcnow() + expected_delay
+        # Not due again until the backoff has passed
+        assert outbox_dispatcher.dispatch_due() == 0
+        _make_due(message_id)
+
+    assert outbox_dispatcher.dispatch_due() == 1
+    message = _message(message_id)
+    assert (message.status, message.attempts, message.last_error) == ('done', 3, None)
+    assert db.session.get(Order, order_id).trello_card_id == 'card3'
+    assert stub.calls == 3
+
+
+def test_stuck_claimed_message_is_reclaimed_after_its_lease(client, trello):
+    stub = trello()
+    order_id, message_id = _enqueue_card(client)
+
+    # Another dispatcher claims the message and dies before handling it
+    before = datetime.utcnow()
+    assert outbox_dispatcher._claim(message_id, 0)
+    # ...and nobody else can claim that same attempt
+    assert not outbox_dispatcher._claim(message_id, 0)
+    message = _message(message_id)
+    assert message.next_attempt_at >= before + OUTBOX_LEASE
+
+    # Hidden while the lease runs
+    assert outbox_dispatcher.dispatch_due() == 0
+    assert stub.calls == 0
+
+    _make_due(message_id)
+    assert outbox_dispatcher.dispatch_due() == 1
+    message = _message(message_id)
+    assert (message.status, message.attempts) == ('done', 2)
+    assert db.session.get(Order, order_id).trello_card_id == 'card1'
+    assert stub.calls == 1
+
+
+def test_message_is_dead_lettered_after_max_attempts(client, trello):
+    stub = trello(fail_first=1000)
+    order_id, message_id = _enqueue_card(client)
+
+    for _ in range(OUTBOX_MAX_ATTEMPTS):
+        assert outbox_dispatcher.dispatch_due() == 1
+        _make_due(message_id)
+
+    message = _message(message_id)
+    assert OUTBOX_MAX_ATTEMPTS == 8
+    assert (message.status, message.attempts) == ('dead', OUTBOX_MAX_ATTEMPTS)
+    assert message.last_error
+    assert stub.calls == OUTBOX_MAX_ATTEMPTS
+
+    # Dead messages are never picked up again
+    assert outbox_dispatcher.dispatch_due() == 0
+    assert stub.calls == OUTBOX_MAX_ATTEMPTS
+    assert db.session.get(Order, order_id).trello_card_id is None
@@ -0,0 +1,28 @@
+import os
+
+from SelfPortraitControlPlatform.app.pdf_cache import PDFCache
+
+
+def test_disk_eviction_stops_at_low_water_mark(tmp_path, monkeypatch):
+    cache = PDFCache(directory=str(tmp_path), max_bytes=1000, memory_max_bytes=0)
+    scans = []
+    disk_entries = cache._disk_entries
+    monkeypatch.setattr(cache, '_disk_entries', lambda: scans.append(1) or disk_entries())
+
+    for n in range(10):
+        cache.put(f'k{n}', b'x' * 100)
+        # Oldest first: keep the LRU order deterministic
+        os.utime(cache._path(f'k{n}'), (n, n))
+    assert scans == [] and cache.evictions == 0
+
+    cache.put('k10', b'x' * 100)
+    assert len(scans) == 1
+    assert cache.stats()['disk_bytes'] == 900
+    assert cache.evictions == 2
+    assert not os.path.exists(cache._path('k0')) and not os.path.exists(cache._path('k1'))
+    assert os.path.exists(cache._path('k10'))
+
+    # The next put fits under the limit: no rescan
+    cache.put('k11', b'x' * 100)
+    assert len(scans) == 1
+    assert cache.stats()['disk_bytes'] == 1000
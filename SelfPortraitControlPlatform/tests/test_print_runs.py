@@ -0,0 +1,31 @@
+from SelfPortraitControlPlatform.app import print_runs
+from SelfPortraitControlPlatform.app.print_runs import PrintRunPool, print_run_pool
+from SelfPortraitControlPlatform.tests.conftest import make_order
+
+
+def test_print_run_workers_are_capped_at_the_shared_pool_size(app, client, monkeypatch):
+    pool = PrintRunPool(max_workers=2)
+    monkeypatch.setattr(print_runs, 'print_run_pool', pool)
+    order_ids = [make_order(client) for _ in range(3)]
+
+    first = client.post('/api/print-runs', json={'order_ids': order_ids, 'documents': ['packing_slip'],
+                                                  'output': 'zip', 'workers': 1000})
+    assert first.status_code == 200
+    assert first.data[:2] == b'PK'
+    executor = pool._executor
+    assert executor._max_workers == 2
+    assert executor._mp_context.get_start_method() in print_runs.PRINT_RUN_START_METHODS
+
+    # A different workers value reuses the same pool
+    second = client.post('/api/print-runs', json={'order_ids': order_ids, 'documents': ['checklist'],
+                                                   'workers': 1})
+    assert second.status_code == 200
+    assert second.headers['Content-Type'] == 'application/pdf'
+    assert pool._executor is executor
+    executor.shutdown()
+
+
+def test_pool_size_comes_from_config(app):
+    assert print_run_pool.max_workers == (app.config['PRINT_RUN_WORKERS'] or print_runs.default_workers())
+    assert print_run_pool.workers_for(10 ** 6) == print_run_pool.max_workers
+    assert print_run_pool.workers_for(1) == 1
@@ -0,0 +1,102 @@
+import gzip
+import json
+
+import pytest
+
+from SelfPortraitControlPlatform.app import react_build as react_build_module
+from SelfPortraitControlPlatform.app.react_build import react_build
+
+INDEX = ('<!doctype html><html><head><title>Self Portrait</title></head><body>'
+         + '<div id="root"></div>' * 100 + '</body></html>').encode()
+BUNDLE = b'console.log("self portrait");\n' * 200
+
+
+@pytest.fixture
+def build(tmp_path, monkeypatch):
+    """
+    A small React build in tmp_path, indexed in place of the real one.
+    """
+    folder = tmp_path / 'build'
+    (folder / 'static' / 'js').mkdir(parents=True)
+    (folder / 'index.html').write_bytes(INDEX)
+    (folder / 'static' / 'js' / 'main.5e214187.js').write_bytes(BUNDLE)
+    (folder / 'favicon.ico').write_bytes(b'\0' * 64)
+    (folder / 'asset-manifest.json').write_text(json.dumps({
+        'files': {'main.js': '/static/js/main.5e214187.js', 'index.html': '/index.html'},
+    }))
+    monkeypatch.setattr(react_build, 'directory', react_build.directory)
+    monkeypatch.setattr(react_build, 'assets', react_build.assets)
+    react_build.load(str(folder))
+    return folder
+
+
+def test_testing_app_does_not_index_the_real_build(app):
+    assert react_build.get('index.html') is None
+
+
+def test_fingerprinted_files_are_immutable(client, app, build):
+    app.config['STATIC_IMMUTABLE_MAX_AGE'] = 600
+
+    response = client.get('/static/js/main.5e214187.js')
+    assert response.status_code == 200
+    assert response.mimetype in ('application/javascript', 'text/javascript')
+    assert response.cache_control.public
+    assert response.cache_control.max_age == 600
+    assert response.cache_control.immutable
+
+
+@pytest.mark.parametrize('path', ['', 'index.html', 'orders/12', 'favicon.ico'])
+def test_everything_else_is_revalidated(client, build, path):
+    response = client.get(f'/{path}')
+    assert response.status_code == 200
+    assert response.cache_control.no_cache
+    assert not response.cache_control.immutable
+    assert response.cache_control.max_age is None
+
+
+def test_index_html_revalidates_to_304(client, build):
+    response = client.get('/orders/12')
+    assert response.data == INDEX
+    etag = response.headers['ETag']
+
+    response = client.get('/', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+    (build / 'index.html').write_bytes(INDEX + b'<!-- new deploy -->')
+    react_build.load(str(build))
+    response = client.get('/', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+@pytest.mark.parametrize('accept_encoding, expected', [
+    ('gzip, deflate, br', 'br'),
+    ('gzip, deflate', 'gzip'),
+    ('br;q=0, gzip', 'gzip'),
+    ('identity', None),
+    ('', None),
+])
+def test_best_accepted_encoding_is_sent(client, build, accept_encoding, expected):
+    if expected == 'br' and react_build_module.brotli is None:
+        pytest.skip('brotli not installed')
+
+    response = client.get('/static/js/main.5e214187.js', headers={'Accept-Encoding': accept_encoding})
+    assert response.status_code == 200
+    assert response.content_encoding == expected
+    assert 'Accept-Encoding' in response.vary
+    if expected == 'br':
+        assert react_build_module.brotli.decompress(response.data) == BUNDLE
+    elif expected == 'gzip':
+        assert gzip.decompress(response.data) == BUNDLE
+    else:
+        assert response.data == BUNDLE
+    # Each encoding is its own representation
+    assert response.headers['ETag'].endswith(f'-{expected}"' if expected else '"')
+
+
+def test_small_files_are_not_compressed(client, build):
+    response = client.get('/favicon.ico', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.content_encoding is None
+    assert 'Accept-Encoding' not in response.vary
+    assert not (build / 'favicon.ico.gz').exists()
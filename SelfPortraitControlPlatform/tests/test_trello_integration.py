@@ -0,0 +1,52 @@
+import pytest
+import requests
+
+from SelfPortraitControlPlatform.app import trello_integration
+from SelfPortraitControlPlatform.app.models import Order
+
+
+@pytest.fixture(autouse=True)
+def no_leftover_rate_limit(monkeypatch):
+    monkeypatch.setattr(trello_integration, '_rate_limited_until', 0.0)
+
+
+def test_429_waits_for_retry_after_then_succeeds(trello):
+    stub = trello(fail_first=2, fail_status=429, fail_headers={'Retry-After': '0.2'})
+    card = trello_integration._send('POST', '/cards', {'name': 'x'})
+
+    assert card['id'] == 'card3'
+    assert stub.calls == 3
+    gaps = [b - a for a, b in zip(stub.call_times, stub.call_times[1:])]
+    assert all(gap >= 0.2 for gap in gaps)
+
+
+def test_429_without_retry_after_uses_the_default(trello, monkeypatch):
+    monkeypatch.setattr(trello_integration, 'TRELLO_DEFAULT_RETRY_AFTER', 0.1)
+    stub = trello(fail_first=1, fail_status=429)
+    trello_integration._send('POST', '/cards', {})
+    assert stub.call_times[1] - stub.call_times[0] >= 0.1
+
+
+def test_persistent_429_gives_up_after_the_retry_limit(trello, monkeypatch):
+    monkeypatch.setattr(trello_integration, 'TRELLO_MAX_RATE_LIMIT_RETRIES', 2)
+    stub = trello(fail_first=100, fail_status=429, fail_headers={'Retry-After': '0'})
+    with pytest.raises(requests.exceptions.HTTPError):
+        trello_integration._send('POST', '/cards', {})
+    assert stub.calls == 3
+
+
+def test_batch_workers_back_off_together(trello):
+    stub = trello(fail_first=1, fail_status=429, fail_headers={'Retry-After': '0.3'})
+    orders = [Order(id=n, school_name=f'School {n}', status='Kit Returned') for n in range(1, 5)]
+    cards = trello_integration.create_trello_cards(orders, max_workers=4)
+
+    assert all(card is not None for card in cards.values())
+    assert stub.calls == 5
+    # The rejected card was only re-sent once the Retry-After had passed
+    assert stub.call_times[-1] - stub.call_times[0] >= 0.3
+
+
+def test_other_http_errors_are_not_retried(trello):
+    stub = trello(fail_first=1, fail_status=500)
+    assert trello_integration.create_trello_card(Order(id=1, school_name='S', status='x')) is None
+    assert stub.calls == 1
@@ -0,0 +1,14 @@
+# gunicorn.conf.py -- picked up automatically when gunicorn is started from
+# this directory, e.g. `gunicorn SelfPortraitControlPlatform.run:app`.
+import os
+
+bind = os.getenv('GUNICORN_BIND', '127.0.0.1:5001')
+workers = int(os.getenv('GUNICORN_WORKERS', '2'))
+
+# Each /api/events (Server-Sent Events) connection holds a worker for as long
+# as the browser tab is open. With the default sync workers a few open tabs
+# would block every API call, so serve requests from a thread pool instead.
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '32'))
+# Streams send a keep-alive every 15s; don't let the worker timeout kill them
+timeout = 120
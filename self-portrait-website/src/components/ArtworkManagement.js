@@ -110,9 +110,9 @@ function ArtworkManagement() {
                       <div className="artwork-files-list">
                         {existingImages.map(filename => (
                           <div key={filename} className="artwork-file">
-                            <p className="artwork-file-info">File: {filename}</p>
+                            <p className="artwork-file-info">File: {filename.split('/').pop()}</p>
                             <img
-                              src={`/static/artwork/${filename}`}
+                              src={`/static/artwork/${filename}?size=thumb`}
                               alt={filename}
                             />
                             <button
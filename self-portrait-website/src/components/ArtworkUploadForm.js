@@ -2,6 +2,37 @@
 import React, { useState } from 'react';
 import axios from 'axios';
 
+const MAX_CHUNK_RETRIES = 5;
+
+// Sends one file through the chunked upload API, resuming from the server's
+// offset after a dropped connection instead of starting again.
+async function uploadFileInChunks(orderId, file, onProgress) {
+  const base = `/api/orders/${orderId}/artwork/uploads`;
+  const { data: upload } = await axios.post(base, { filename: file.name, size: file.size });
+  let offset = upload.offset;
+  let retries = 0;
+
+  while (offset < file.size) {
+    const chunk = file.slice(offset, offset + upload.chunk_size);
+    try {
+      const { data } = await axios.put(`${base}/${upload.upload_id}?offset=${offset}`, chunk, {
+        headers: { 'Content-Type': 'application/octet-stream' },
+      });
+      offset = data.offset;
+      retries = 0;
+    } catch (err) {
+      if (retries >= MAX_CHUNK_RETRIES) throw err;
+      retries += 1;
+      // Ask the server how much it actually has, then carry on from there
+      const { data } = await axios.get(`${base}/${upload.upload_id}`);
+      offset = data.offset;
+    }
+    if (onProgress) onProgress(offset, file.size);
+  }
+
+  await axios.post(`${base}/${upload.upload_id}/finalize`);
+}
+
 function ArtworkUploadForm({ orderId, onUploadComplete }) {
   // onUploadComplete is a callback we can call after success
 
@@ -18,13 +49,12 @@ function ArtworkUploadForm({ orderId, onUploadComplete }) {
       return;
     }
     try {
-      const formData = new FormData();
       for (let i = 0; i < selectedFiles.length; i++) {
-        formData.append('images', selectedFiles[i]);
+        const file = selectedFiles[i];
+        await uploadFileInChunks(orderId, file, (sent, total) => {
+          setFeedback(`Uploading ${file.name} (${i + 1}/${selectedFiles.length}): ${Math.floor((sent / total) * 100)}%`);
+        });
       }
-      await axios.post(`/api/orders/${orderId}/artwork/upload`, formData, {
-        headers: { 'Content-Type': 'multipart/form-data' },
-      });
       setFeedback('Images uploaded successfully!');
       // 1) If you want to simply re-fetch data from parent:
       if (onUploadComplete) {
@@ -4,7 +4,7 @@ import { useParams } from 'react-router-dom';
 
 // 1) GET all orders from the server, find the one with the matching ID
 async function fetchOrderById(orderId) {
-  const res = await fetch(`/api/orders`);
+  const res = await fetch(`/api/orders?all=true`);
   if (!res.ok) {
     throw new Error('Failed to fetch orders');
   }
@@ -171,7 +171,7 @@ function SchoolPortalActions() {
             images.map((filename, idx) => (
               <div key={idx} style={{ margin: '5px 0' }}>
                 <img
-                  src={`/static/artwork/${filename}`}
+                  src={`/static/artwork/${filename}?size=preview`}
                   alt={`Uploaded design file #${idx + 1}`}
                   style={{ maxWidth: '300px' }}
                 />
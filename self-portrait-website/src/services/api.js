@@ -8,8 +8,11 @@ export async function getTasks() {
   return response.data;
 }
 
+// GET /api/orders is paginated ({orders, next_cursor}); the staff pages work
+// on the full list, so ask for the unpaginated array (includes orders
+// without a created_at, which the paginated listing skips).
 export async function getAllOrders() {
-  const response = await axios.get(`${API_URL}/orders`);
+  const response = await axios.get(`${API_URL}/orders`, { params: { all: true } });
   return response.data;
 }
 